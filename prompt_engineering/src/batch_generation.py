@@ -0,0 +1,215 @@
+# Define the script's usage example
+USAGE_EXAMPLE = """
+Example usage:
+
+To pre-generate the lessons and quizzes listed in catalogue.jsonl into generated.jsonl:
+python src/batch_generation.py --input catalogue.jsonl --output generated.jsonl --concurrency 8 --requests_per_minute 60
+
+Each input line is a JSON object with the fields:
+- id (or request_id): unique id of the request, defaults to the line number
+- topic, familiarity, learning_mode ("Lesson" or "Quiz"), time_available
+- preferred_language, additional_instructions, expert (optional)
+
+Results are appended to the output file as they complete, one JSON object per line. Re-running the
+same command resumes the run: requests with a successful result in the output file are skipped.
+
+--max_retries retries a whole failed request. Every attempt already retries connection errors, timeouts
+and 429/5xx statuses through the model wrapper RetryPolicy (3 retries by default), so a request failing
+on transport errors is sent up to (max_retries + 1) x (RetryPolicy.max_retries + 1) times, 12 by default.
+"""
+
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, ".."))
+repo_dir = os.path.abspath(os.path.join(kit_dir, ".."))
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, TextIO
+
+from dotenv import load_dotenv
+
+from src.learning_prompts import build_learning_prompt
+from src.llm_management import LLMManager
+from utils.model_wrappers.http_pool import close_shared_async_sessions
+
+load_dotenv(os.path.join(repo_dir, ".env"))
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    """Spaces out request starts so no more than requests_per_minute are sent per minute"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def load_requests(input_path: str) -> List[Dict[str, Any]]:
+    """Reads the generation requests of a JSONL file, giving each one an id"""
+    requests = []
+    with open(input_path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            request["id"] = str(request.get("id", request.get("request_id", line_number)))
+            requests.append(request)
+    return requests
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """Returns the ids of the requests with a successful result in a previous run's output"""
+    completed_ids: Set[str] = set()
+    if not os.path.exists(output_path):
+        return completed_ids
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # a line truncated by an interrupted run, the request is generated again
+                continue
+            if result.get("completion") is not None:
+                completed_ids.add(result["id"])
+    return completed_ids
+
+
+async def generate(
+    llm_manager: LLMManager,
+    request: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    rate_limiter: AsyncRateLimiter,
+    output_file: TextIO,
+    max_retries: int,
+) -> bool:
+    """Generates the completion of a single request and appends the result to the output file"""
+    result = {"id": request["id"], "request": request, "completion": None, "error": None}
+    try:
+        prompt = build_learning_prompt(
+            request["learning_mode"],
+            request["topic"],
+            request["familiarity"],
+            request["time_available"],
+            preferred_language=request.get("preferred_language", ""),
+            additional_instructions=request.get("additional_instructions", ""),
+        )
+    except (KeyError, ValueError) as e:
+        # malformed requests are recorded as failed without being sent
+        prompt = None
+        result["error"] = f"Invalid request: {type(e).__name__}: {e}"
+
+    if prompt is not None:
+        expert = request.get("expert") or llm_manager.llm_info["select_expert"]
+        async with semaphore:
+            start_time = time.perf_counter()
+            for attempt in range(max_retries + 1):
+                await rate_limiter.wait()
+                try:
+                    result["completion"] = await llm_manager.ainvoke(prompt, model_expert=expert)
+                    result["error"] = None
+                    break
+                except Exception as e:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    if attempt < max_retries:
+                        logger.warning(f"Request {request['id']} failed (attempt {attempt + 1}), retrying: {e}")
+                        await asyncio.sleep(2**attempt)
+            result["elapsed"] = time.perf_counter() - start_time
+
+    output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+    output_file.flush()
+    if result["error"]:
+        logger.error(f"Request {request['id']} failed: {result['error']}")
+    else:
+        logger.info(f"Request {request['id']} generated in {result['elapsed']:.1f}s")
+    return result["error"] is None
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 4,
+    requests_per_minute: Optional[float] = None,
+    max_retries: int = 2,
+) -> int:
+    """Generates every pending request of the input file with bounded concurrency
+
+    Args:
+        input_path (str): JSONL file of generation requests
+        output_path (str): JSONL file results are appended to
+        concurrency (int, optional): maximum number of in flight requests. Defaults to 4.
+        requests_per_minute (float, optional): maximum request rate. Defaults to None, unlimited.
+        max_retries (int, optional): retries of a failed request. Defaults to 2. Each attempt also
+            retries transport errors through the wrapper RetryPolicy, so a request can be sent up to
+            (max_retries + 1) x (RetryPolicy.max_retries + 1) times.
+
+    Returns:
+        int: number of requests that failed
+    """
+    requests = load_requests(input_path)
+    completed_ids = load_completed_ids(output_path)
+    pending = [request for request in requests if request["id"] not in completed_ids]
+    logger.info(f"{len(requests)} requests, {len(requests) - len(pending)} already generated, {len(pending)} pending")
+
+    llm_manager = LLMManager()
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = AsyncRateLimiter(requests_per_minute)
+    try:
+        with open(output_path, "a", encoding="utf-8") as output_file:
+            outcomes = await asyncio.gather(
+                *(
+                    generate(llm_manager, request, semaphore, rate_limiter, output_file, max_retries)
+                    for request in pending
+                )
+            )
+    finally:
+        # the pooled connections are bound to this event loop, which ends with the batch
+        await close_shared_async_sessions()
+    failed = outcomes.count(False)
+    logger.info(f"Batch finished: {len(pending) - failed} generated, {failed} failed")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pre-generate lessons and quizzes from a JSONL file of requests",
+        epilog=USAGE_EXAMPLE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--input", type=str, required=True, help="Path to the input JSONL file of requests")
+    parser.add_argument("--output", type=str, required=True, help="Path to the output JSONL file of results")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum in flight requests (default: 4)")
+    parser.add_argument("--requests_per_minute", type=float, default=None, help="Rate limit (default: none)")
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=2,
+        help="Retries of a failed request, on top of the wrapper transport retries (default: 2)",
+    )
+    args = parser.parse_args()
+
+    failed = asyncio.run(
+        run_batch(args.input, args.output, args.concurrency, args.requests_per_minute, args.max_retries)
+    )
+    sys.exit(min(failed, 255))
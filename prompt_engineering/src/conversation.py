@@ -0,0 +1,105 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional, Tuple
+
+from src.prompt_budget import count_tokens, fit_to_budget, truncate_to_tokens
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s")
+
+
+@dataclass
+class ConversationTurn:
+    question: str
+    answer: str
+
+
+def summarize_turn(turn: ConversationTurn, max_tokens: int = 60) -> str:
+    """Extractive summary of a turn: the question and the first sentence of its answer"""
+    first_sentence = SENTENCE_END_PATTERN.split(turn.answer.strip(), maxsplit=1)[0]
+    words = first_sentence.split()
+    while words and count_tokens(" ".join(words)) > max_tokens:
+        words = words[: len(words) * 3 // 4]
+    return f"Q: {turn.question.strip()} A: {' '.join(words)}"
+
+
+class DoubtConversation:
+    """Bounded chat history used to answer learner doubts about a generated lesson or quiz.
+
+    The most recent turns are kept verbatim in a sliding window. Turns leaving the window
+    are folded into a running summary, one at a time, and the oldest summary lines are
+    dropped once it exceeds its token budget. Recent turns and summary share a history
+    token budget: the newest turns are charged first, truncating the answer of the turn
+    that overflows it, and the summary gets what is left. The generated content is
+    trimmed to the passages most relevant to each question, so the prompt size stays
+    bounded however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        generated_content: str,
+        window_turns: int = 3,
+        summary_max_tokens: int = 300,
+        content_max_tokens: int = 1500,
+        history_max_tokens: int = 1200,
+        summarize_fn: Optional[Callable[[ConversationTurn], str]] = None,
+    ):
+        self.generated_content = generated_content
+        self.window_turns = window_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.content_max_tokens = content_max_tokens
+        self.history_max_tokens = history_max_tokens
+        self.summarize_fn = summarize_fn or summarize_turn
+        self.recent_turns: Deque[ConversationTurn] = deque()
+        self.summary_lines: List[str] = []
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Appends a question and its answer, folding the turn leaving the window into the summary"""
+        self.recent_turns.append(ConversationTurn(question, answer))
+        if len(self.recent_turns) > self.window_turns:
+            self.summary_lines.append(self.summarize_fn(self.recent_turns.popleft()))
+            while len(self.summary_lines) > 1 and count_tokens("\n".join(self.summary_lines)) > self.summary_max_tokens:
+                self.summary_lines.pop(0)
+
+    def _fit_history(self) -> Tuple[List[str], List[str]]:
+        """Returns the summary lines and the recent turns, newest first charged, that fit the history budget"""
+        remaining = self.history_max_tokens
+        recent_turns: List[str] = []
+        for turn in reversed(self.recent_turns):
+            turn_text = f"Learner: {turn.question}\nAssistant: {turn.answer}\n"
+            turn_tokens = count_tokens(turn_text)
+            if turn_tokens > remaining:
+                header = f"Learner: {truncate_to_tokens(turn.question, remaining // 2)}\nAssistant: "
+                answer = truncate_to_tokens(turn.answer, remaining - count_tokens(header) - 1)
+                if answer:
+                    recent_turns.insert(0, f"{header}{answer}...\n")
+                remaining = 0
+                break
+            recent_turns.insert(0, turn_text)
+            remaining -= turn_tokens
+
+        summary_lines: List[str] = []
+        summary_budget = min(remaining, self.summary_max_tokens)
+        for line in reversed(self.summary_lines):
+            line_tokens = count_tokens(line)
+            if line_tokens > summary_budget:
+                break
+            summary_lines.insert(0, line)
+            summary_budget -= line_tokens
+        return summary_lines, recent_turns
+
+    def build_prompt(self, question: str) -> str:
+        """Builds the prompt answering a new question grounded in the content and the conversation so far"""
+        content, _ = fit_to_budget(self.generated_content, query=question, max_tokens=self.content_max_tokens)
+        prompt = (
+            "As an AI assistant, answer the learner's question based on the previous content "
+            "and the conversation so far.\n\n"
+            f"Previous content:\n{content}\n\n"
+        )
+        summary_lines, recent_turns = self._fit_history()
+        if summary_lines:
+            prompt += "Summary of the earlier conversation:\n" + "\n".join(summary_lines) + "\n\n"
+        if recent_turns:
+            prompt += "Recent conversation:\n" + "".join(recent_turns) + "\n"
+        prompt += f"Question: '{question}'"
+        return prompt
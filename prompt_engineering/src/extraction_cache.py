@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """Persistent, content-addressed cache of extracted text.
+
+    Entries are keyed by the SHA-256 of the source bytes (a whole PDF file or a single
+    embedded image stream) and stored as one text file each under ``cache_dir``. A hit
+    refreshes the file mtime, and once the cache grows past ``max_bytes`` the entries
+    with the oldest mtime are evicted first, giving a size-bounded LRU that is shared
+    by every process pointing at the same directory. Each process only knows its own
+    writes, so the size is read again from disk once a process wrote 5% of ``max_bytes``,
+    which keeps the cache bounded when worker processes write to it too.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+        # bytes written by this process since the size was last read from disk
+        self._written_since_scan = 0
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """Returns the SHA-256 hex digest used as cache key for some source bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, kind, key[:2], f"{key}.txt")
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        """Lists (path, size, mtime) of every cached entry"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, kind: str, key: str) -> Optional[str]:
+        """Returns the cached text of a key, or None on a miss
+
+        Args:
+            kind (str): entry namespace, e.g. "file" or "image"
+            key (str): SHA-256 digest of the source bytes
+        """
+        path = self._path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return text
+
+    def put(self, kind: str, key: str, text: str) -> None:
+        """Stores the text extracted from the source bytes with the given digest
+
+        Args:
+            kind (str): entry namespace, e.g. "file" or "image"
+            key (str): SHA-256 digest of the source bytes
+            text (str): extracted text
+        """
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous_size = os.path.getsize(path)
+        except FileNotFoundError:
+            previous_size = 0
+        # write to a temporary file first so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+        # an overwritten entry only grows the cache by its change of size
+        written = os.path.getsize(path) - previous_size
+        self._size += written
+        self._written_since_scan += max(0, written)
+        if self._written_since_scan > self.max_bytes * 0.05:
+            self._size = sum(size for _, size, _ in self._entries())
+            self._written_since_scan = 0
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until the cache is back under 90% of its size bound"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        self._written_since_scan = 0
+        target_size = int(self.max_bytes * 0.9)
+        evicted = 0
+        for path, size, _ in entries:
+            if self._size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} extraction cache entries, cache size is now {self._size} bytes")
@@ -0,0 +1,54 @@
+from typing import Optional
+
+LESSON_PROMPT = "As an experienced educator, explain the reasoning behind the key concepts of '{topic}' to a {familiarity} level learner. Structure the explanation to ensure clarity within {time_available} minutes. Contextualize the content with real-world examples and guide the learner through the topic using relatable storytelling. Keep the learner motivated by highlighting practical applications. Finally, evaluate the learning process by recommending 2-3 free, high-quality online courses and relevant YouTube lectures with their links. Also suggest 1-2 projects for hands-on practice. Incorporate {additional_instructions} to further enhance the experience."
+
+QUIZ_PROMPT = "As an experienced educator, assess the learner’s understanding of '{topic}' with a quiz designed for a {familiarity} level learner. Include multiple-choice, true/false, and short-answer questions. Provide detailed instructions and context for each question. Evaluate the learner's progress by giving immediate feedback on correct and incorrect answers. Ensure the quiz fits within {time_available} minutes, and integrate {additional_instructions} to make the assessment more tailored and effective."
+
+LEARNING_MODE_PROMPTS = {
+    "Lesson": LESSON_PROMPT,
+    "Quiz": QUIZ_PROMPT,
+}
+
+
+def build_learning_prompt(
+    learning_mode: str,
+    topic: str,
+    familiarity: str,
+    time_available: int,
+    preferred_language: Optional[str] = "",
+    additional_instructions: Optional[str] = "",
+    reference_text: Optional[str] = "",
+) -> str:
+    """Builds the lesson or quiz prompt from the learner preferences
+
+    Args:
+        learning_mode (str): "Lesson" or "Quiz"
+        topic (str): topic or subject to learn
+        familiarity (str): "Beginner", "Intermediate" or "Advanced"
+        time_available (int): minutes available
+        preferred_language (str, optional): language of the response. Defaults to "".
+        additional_instructions (str, optional): free text instructions. Defaults to "".
+        reference_text (str, optional): cleaned reference material to include. Defaults to "".
+
+    Returns:
+        str: prompt to send to the model
+    """
+    if learning_mode not in LEARNING_MODE_PROMPTS:
+        raise ValueError(f"Invalid learning mode: {learning_mode}, only {list(LEARNING_MODE_PROMPTS)} are supported.")
+    prompt = LEARNING_MODE_PROMPTS[learning_mode].format(
+        topic=topic,
+        familiarity=familiarity,
+        time_available=time_available,
+        additional_instructions=additional_instructions,
+    )
+
+    if preferred_language:
+        prompt += f" Use {preferred_language} language in the response."
+
+    if additional_instructions:
+        prompt += f" Additionally, {additional_instructions}"
+
+    if reference_text:
+        prompt += f" Reference the following additional material: {reference_text}"
+
+    return prompt
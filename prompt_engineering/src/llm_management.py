@@ -1,64 +1,385 @@
 
+import copy                                                 # for handing out private copies of the config
 import os                                                   # for using env variables
+import asyncio                                              # for racing experts
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 kit_dir = os.path.abspath(os.path.join(current_dir, ".."))
 repo_dir = os.path.abspath(os.path.join(kit_dir, ".."))
 
+import threading                                            # for guarding the shared client registry
+import time                                                 # for generation timings
 import yaml                                                 # for loading prompt example config file
-from dataclasses import dataclass
-from typing import Tuple                                    # for type hint
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple  # for type hint
 from langchain_core.language_models.llms import LLM
-from langchain.prompts import PromptTemplate, load_prompt   # for creating and loading prompting yaml files
+from langchain.prompts import PromptTemplate                 # for creating prompting yaml files
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.http_pool import close_shared_async_sessions
+from src.prompt_registry import PROMPT_REGISTRY, PROMPTS_DIR
+
+logger = logging.getLogger(__name__)
 
 # define config path
 CONFIG_PATH = os.path.join(kit_dir,'config.yaml')
 
+# parsed config file and the mtime it was read at, shared by every LLMManager in this process
+_config_cache: Dict[str, Any] = {"mtime": None, "config": None}
+_config_lock = threading.Lock()
+
+
+def load_config(config_path: str = CONFIG_PATH) -> dict:
+    """Returns a copy of the parsed config file, only reading it again when its mtime changes
+
+    A deep copy is returned so callers keeping or editing parts of it never alter the shared cache.
+    """
+    mtime = os.stat(config_path).st_mtime
+    with _config_lock:
+        if _config_cache["mtime"] != mtime:
+            with open(config_path, 'r', encoding='utf-8') as file:
+                _config_cache["config"] = yaml.safe_load(file)
+            _config_cache["mtime"] = mtime
+        return copy.deepcopy(_config_cache["config"])
+
+
+class LLMClientRegistry:
+    """Process-wide, thread-safe registry of langchain LLM clients.
+
+    Clients are keyed by the API type, the expert and the sampling parameters, so every
+    Streamlit session (and every rerun) asking for the same configuration shares one
+    client instance, and with it the client's keep-alive HTTP connection pool, instead
+    of building a new pydantic model and a new connection for each generation.
+    """
+
+    def __init__(self):
+        self._clients: Dict[tuple, LLM] = {}
+        self._in_use: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.leases = 0
+        self.peak_in_use = 0
+
+    @staticmethod
+    def make_key(api: str, model_expert: str, **sampling_params: Any) -> tuple:
+        """Builds the registry key for an API, expert and set of sampling parameters"""
+        return (api, model_expert, tuple(sorted(sampling_params.items())))
+
+    def get(self, api: str, model_expert: str, **sampling_params: Any) -> LLM:
+        """Returns the shared client for the given configuration, creating it on first use
+
+        Args:
+            api (str): llm api type, "sncloud" or "sambastudio"
+            model_expert (str): model expert to use
+            sampling_params: remaining keyword arguments passed to APIGateway.load_llm
+
+        Returns:
+            LLM: langchain llm shared by every caller using the same configuration
+        """
+        key = self.make_key(api, model_expert, **sampling_params)
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is not None:
+                self.hits += 1
+                return llm
+            self.misses += 1
+            llm = APIGateway.load_llm(type=api, select_expert=model_expert, **sampling_params)
+            self._clients[key] = llm
+            return llm
+
+    @contextmanager
+    def lease(self, api: str, model_expert: str, **sampling_params: Any) -> Iterator[LLM]:
+        """Context manager yielding a shared client while tracking how many callers are using it"""
+        llm = self.get(api, model_expert, **sampling_params)
+        key = self.make_key(api, model_expert, **sampling_params)
+        with self._lock:
+            self.leases += 1
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            self.peak_in_use = max(self.peak_in_use, sum(self._in_use.values()))
+        try:
+            yield llm
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss and pool-usage counters of the registry"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "leases": self.leases,
+                "in_use": sum(self._in_use.values()),
+                "peak_in_use": self.peak_in_use,
+            }
+
+    def clear(self) -> None:
+        """Drops every cached client and resets the counters"""
+        with self._lock:
+            self._clients.clear()
+            self._in_use.clear()
+            self.hits = self.misses = self.leases = self.peak_in_use = 0
+
+
+# shared by every LLMManager (and so every Streamlit session) in this process
+LLM_CLIENT_REGISTRY = LLMClientRegistry()
+
+
+@dataclass
+class GenerationStats:
+    """Timings of a single streamed generation"""
+
+    start_time: float = field(default_factory=time.perf_counter)
+    first_token_time: float = 0.0
+    end_time: float = 0.0
+    # streamed events, usually but not always one token each, the stream does not report its token count
+    chunks: int = 0
+
+    @property
+    def time_to_first_token(self) -> float:
+        """Seconds between the request and the first streamed token"""
+        return self.first_token_time - self.start_time if self.first_token_time else 0.0
+
+    @property
+    def total_time(self) -> float:
+        """Seconds between the request and the last streamed token"""
+        return self.end_time - self.start_time if self.end_time else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        """Decoding throughput in streamed chunks, measured from the first to the last chunk"""
+        decode_time = self.end_time - self.first_token_time
+        if not self.first_token_time or decode_time <= 0:
+            return 0.0
+        return self.chunks / decode_time
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "chunks": self.chunks,
+            "chunks_per_second": self.chunks_per_second,
+        }
+
+
 @dataclass(init=False)
 class LLMManager:
     """A class to manage the configuration, setup, and interaction with various LLMs."""
     
     def __init__(self):
         """Gets model information and prompt use cases from config file"""
-        llm_info, model_info, prompt_use_cases = self._get_config_info()
+        (
+            llm_info, model_info, prompt_use_cases, reference_info, response_cache_info, doubts_info
+        ) = self._get_config_info()
 
         self.llm_info = llm_info
         self.model_info = model_info
         self.prompt_use_cases = prompt_use_cases
+        self.reference_info = reference_info
+        self.response_cache_info = response_cache_info
+        self.doubts_info = doubts_info
 
-    def _get_config_info(self) -> Tuple[str, dict, list]:
-        """Loads json config file
+    def _get_config_info(self) -> Tuple[str, dict, list, dict, dict, dict]:
+        """Loads json config file, cached in memory until the file changes
         """
         
         # Read config file
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
+        config = load_config()
         model_info = config["models"]
         llm_info = config["llm"]
         prompt_use_cases = config["use_cases"]
+        reference_info = config.get("reference_material", {})
+        response_cache_info = config.get("response_cache", {})
+        doubts_info = config.get("doubts", {})
         
-        return llm_info, model_info, prompt_use_cases   
+        return llm_info, model_info, prompt_use_cases, reference_info, response_cache_info, doubts_info
+
+    def _llm_params(self, streaming: bool = False) -> Dict[str, Any]:
+        """Sampling parameters from the config used to build (and key) llm clients"""
+        return {
+            "streaming": streaming,
+            "coe": self.llm_info["coe"],
+            "max_tokens_to_generate": self.llm_info["max_tokens_to_generate"],
+            "temperature": self.llm_info["temperature"],
+        }
+
+    def set_llm(self, model_expert: str, streaming: bool = False) -> LLM:
+        """Gets the shared langchain llm for the configured api and given expert
+        Args:
+            model_expert (str): model expert to use
+            streaming (bool): whether the llm should stream tokens. Defaults to False.
+        Returns:
+            langchain llm, reused across calls and sessions with the same configuration
+        """
+        return LLM_CLIENT_REGISTRY.get(self.llm_info["api"], model_expert, **self._llm_params(streaming))
+
+    def invoke(self, prompt: str, model_expert: str) -> str:
+        """Invokes the shared llm for the given expert, tracking its usage in the client registry
+        Args:
+            prompt (str): prompt to send to the model
+            model_expert (str): model expert to use
+        Returns:
+            str: completion text
+        """
+        with LLM_CLIENT_REGISTRY.lease(self.llm_info["api"], model_expert, **self._llm_params()) as llm:
+            return llm.invoke(prompt)
+
+    async def ainvoke(self, prompt: str, model_expert: str) -> str:
+        """Asynchronously invokes the shared llm for the given expert, tracking its usage in the client registry
+        Args:
+            prompt (str): prompt to send to the model
+            model_expert (str): model expert to use
+        Returns:
+            str: completion text
+        """
+        with LLM_CLIENT_REGISTRY.lease(self.llm_info["api"], model_expert, **self._llm_params()) as llm:
+            return await llm.ainvoke(prompt)
+
+    def stream(self, prompt: str, model_expert: str, stats: Optional[GenerationStats] = None) -> Iterator[str]:
+        """Streams the completion of the shared streaming llm for the given expert
+        Args:
+            prompt (str): prompt to send to the model
+            model_expert (str): model expert to use
+            stats (GenerationStats, optional): filled with time to first token and throughput
+                while the completion is consumed. Defaults to None.
+        Yields:
+            str: completion text chunks as they arrive
+        """
+        if stats is None:
+            stats = GenerationStats()
+        stats.start_time = time.perf_counter()
+        with LLM_CLIENT_REGISTRY.lease(self.llm_info["api"], model_expert, **self._llm_params(True)) as llm:
+            for chunk in llm.stream(prompt):
+                if not chunk:
+                    continue
+                if not stats.first_token_time:
+                    stats.first_token_time = time.perf_counter()
+                stats.chunks += 1
+                yield chunk
+        stats.end_time = time.perf_counter()
+
+    async def _arace_worker(self, prompt: str, model_expert: str) -> str:
+        """Streams the completion of one racing expert, cancelled as soon as the race is decided"""
+        with LLM_CLIENT_REGISTRY.lease(self.llm_info["api"], model_expert, **self._llm_params(True)) as llm:
+            chunks = []
+            async for chunk in llm.astream(prompt):
+                chunks.append(chunk)
+        return "".join(chunks)
+
+    async def arace(
+        self,
+        prompt: str,
+        model_experts: Optional[List[str]] = None,
+        latency_slo: Optional[float] = None,
+        grace_period: Optional[float] = None,
+    ) -> Tuple[str, str]:
+        """Sends the same prompt to several experts concurrently and keeps a single answer
+
+        The first expert of the list is the preferred one. Its answer is returned as soon as it
+        completes. If another expert completes first, the preferred one still wins if it
+        completes within the grace period, otherwise the first complete answer is returned.
+        Losing streams are cancelled, which closes their response even while a read is stalled.
 
-    def set_llm(self, model_expert: str) -> LLM:
-        """Sets a langchain embedding model
         Args:
-            llm_info (dict):
-            coe_flag (bool):
-            model_expert (str):
+            prompt (str): prompt to send to the models
+            model_experts (List[str], optional): experts to race, preferred first.
+                Defaults to the race_experts config key, or the select_expert one.
+            latency_slo (float, optional): seconds to wait for a complete answer.
+                Defaults to the race_latency_slo_s config key.
+            grace_period (float, optional): seconds the preferred expert is given after another one completes.
+                Defaults to the race_grace_period_s config key.
+
         Returns:
-            langchain embedding model
+            Tuple[str, str]: expert that produced the answer, and the completion text
+
+        Raises:
+            TimeoutError: if no expert completes within the latency SLO
+            RuntimeError: if every expert failed
+        """
+        model_experts = model_experts or self.llm_info.get("race_experts") or [self.llm_info["select_expert"]]
+        latency_slo = latency_slo if latency_slo is not None else self.llm_info.get("race_latency_slo_s", 60)
+        grace_period = grace_period if grace_period is not None else self.llm_info.get("race_grace_period_s", 0)
+        preferred_expert = model_experts[0]
+
+        tasks = {
+            asyncio.ensure_future(self._arace_worker(prompt, model_expert)): model_expert
+            for model_expert in model_experts
+        }
+        pending = set(tasks)
+        start_time = time.perf_counter()
+        deadline = grace_deadline = start_time + latency_slo
+        first_answer: Optional[Tuple[str, str]] = None
+        errors: Dict[str, BaseException] = {}
+        try:
+            while pending:
+                timeout = deadline - time.perf_counter()
+                if first_answer is not None:
+                    timeout = min(timeout, grace_deadline - time.perf_counter())
+                if timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                # the preferred expert is looked at first when several experts complete at once
+                for task in sorted(done, key=lambda task: tasks[task] != preferred_expert):
+                    model_expert = tasks[task]
+                    error = task.exception()
+                    if error is not None:
+                        logger.warning(f"Expert {model_expert} failed in race: {error}")
+                        errors[model_expert] = error
+                        if model_expert == preferred_expert and first_answer is not None:
+                            return first_answer
+                        continue
+                    logger.info(f"Expert {model_expert} completed in {time.perf_counter() - start_time:.2f}s")
+                    if model_expert == preferred_expert:
+                        return model_expert, task.result()
+                    if first_answer is None:
+                        first_answer = (model_expert, task.result())
+                        grace_deadline = time.perf_counter() + grace_period
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if first_answer is not None:
+            return first_answer
+        if len(errors) == len(model_experts):
+            raise RuntimeError(f"Every racing expert failed: {errors}")
+        raise TimeoutError(f"No expert out of {model_experts} completed within {latency_slo}s")
+
+    def race(
+        self,
+        prompt: str,
+        model_experts: Optional[List[str]] = None,
+        latency_slo: Optional[float] = None,
+        grace_period: Optional[float] = None,
+    ) -> Tuple[str, str]:
+        """Runs `arace` in its own event loop, for callers without a running one, e.g. the Streamlit app
+
+        Args and Returns are the ones of `arace`.
+
+        Raises:
+            TimeoutError: if no expert completes within the latency SLO
+            RuntimeError: if every expert failed
         """
-        llm = APIGateway.load_llm(
-            type=self.llm_info["api"],
-            streaming=False,
-            coe=self.llm_info["coe"],
-            max_tokens_to_generate=self.llm_info["max_tokens_to_generate"],
-            temperature=self.llm_info["temperature"],
-            select_expert=model_expert
-        )
-        return llm
+
+        async def run_race() -> Tuple[str, str]:
+            try:
+                return await self.arace(prompt, model_experts, latency_slo, grace_period)
+            finally:
+                # the pooled connections are bound to the event loop, which ends with the race
+                await close_shared_async_sessions()
+
+        return asyncio.run(run_race())
+
+    @staticmethod
+    def get_client_stats() -> Dict[str, Any]:
+        """Returns hit/miss and pool-usage counters of the shared llm client registry"""
+        return LLM_CLIENT_REGISTRY.stats()
 
 
     def get_prompt_template(self, model: str, prompt_use_case: str) -> str:
@@ -72,9 +393,9 @@ class LLMManager:
             str: prompt template associated to the model and use case selected
         """
         
-        # Load prompt from the corresponding yaml file
+        # Get the compiled prompt of the corresponding yaml file from the in-memory registry
         prompt_file_name = f"{model.lower()}-prompt_engineering-{prompt_use_case.lower().replace(' ','_')}_usecase.yaml"
-        prompt = load_prompt(f'./prompts/{prompt_file_name}')
+        prompt = PROMPT_REGISTRY.get(prompt_file_name)
         
         return prompt.template
 
@@ -113,4 +434,4 @@ class LLMManager:
             for model_key, prommpt_template in usecase_value.items():
                 prompt_file_name = f"{model_key.lower().replace(' ','_')}-prompt_engineering-{usecase_key.lower().replace(' ','_')}_usecase"
                 prompt = PromptTemplate.from_template(prommpt_template)
-                prompt.save(f"./prompts/{prompt_file_name}.yaml")
\ No newline at end of file
+                prompt.save(os.path.join(PROMPTS_DIR, f"{prompt_file_name}.yaml"))
\ No newline at end of file
@@ -0,0 +1,234 @@
+import io
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from src.extraction_cache import ExtractionCache
+
+# fitz (PyMuPDF), pytesseract and PIL are imported inside the functions using them, so importing
+# this module (and the app) does not load the PDF and OCR stacks until a PDF is actually uploaded
+if TYPE_CHECKING:
+    import fitz
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageExtraction:
+    """Text and OCR output of a single PDF page"""
+
+    file_index: int
+    page_num: int
+    text: str
+    image_text: str
+    elapsed: float
+    # False when the page or one of its images failed, so the file text is incomplete and not cached
+    complete: bool = True
+
+
+# relative cost of an OCR'd image against the text extraction of a page, and the least work worth a worker
+OCR_PAGE_COST = 50
+MIN_WORK_PER_WORKER = 100
+
+# per worker process state, set by _init_worker
+_worker_pdf_blobs: List[bytes] = []
+_worker_documents: Dict[int, "fitz.Document"] = {}
+_worker_cache: Optional[ExtractionCache] = None
+
+
+def _init_worker(pdf_blobs: List[bytes], cache: Optional[ExtractionCache] = None) -> None:
+    """Keeps the raw PDF bytes in the worker so tasks only need to carry (file, page) indices"""
+    global _worker_pdf_blobs, _worker_documents, _worker_cache
+    _worker_pdf_blobs = pdf_blobs
+    _worker_documents = {}
+    _worker_cache = cache
+
+
+def _release_worker_state() -> None:
+    """Closes the open documents and drops the PDF bytes, once the calling process is done extracting"""
+    global _worker_pdf_blobs, _worker_documents, _worker_cache
+    for doc in _worker_documents.values():
+        doc.close()
+    _worker_pdf_blobs = []
+    _worker_documents = {}
+    _worker_cache = None
+
+
+def _get_document(file_index: int) -> "fitz.Document":
+    """Opens each PDF once per worker process and reuses it for the following pages"""
+    import fitz  # PyMuPDF
+
+    doc = _worker_documents.get(file_index)
+    if doc is None:
+        doc = fitz.open(stream=_worker_pdf_blobs[file_index], filetype="pdf")
+        _worker_documents[file_index] = doc
+    return doc
+
+
+def _ocr_image(image_bytes: bytes) -> str:
+    """Runs OCR over an image stream, serving repeated images from the extraction cache"""
+    import pytesseract
+    from PIL import Image
+
+    key = ExtractionCache.digest(image_bytes) if _worker_cache else None
+    if key:
+        cached_text = _worker_cache.get("image", key)
+        if cached_text is not None:
+            return cached_text
+    image_text = pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)))
+    if key:
+        _worker_cache.put("image", key, image_text)
+    return image_text
+
+
+def _extract_page(file_index: int, page_num: int, ocr_xrefs: Tuple[int, ...]) -> PageExtraction:
+    """Extracts the text of a page and runs OCR over the given embedded images"""
+    import pytesseract
+
+    start_time = time.perf_counter()
+    text = ""
+    image_text = ""
+    try:
+        doc = _get_document(file_index)
+        page = doc.load_page(page_num)
+        text = page.get_text()
+    except Exception as e:
+        # a corrupt page only loses its own text, the other pages of the upload are still extracted
+        logger.error(f"Error extracting page {page_num} of file {file_index}: {e}")
+        return PageExtraction(file_index, page_num, text, image_text, time.perf_counter() - start_time, False)
+
+    complete = True
+    for xref in ocr_xrefs:
+        try:
+            image_text += _ocr_image(doc.extract_image(xref)["image"])
+        except pytesseract.TesseractNotFoundError as e:
+            logger.error(f"Tesseract not found: {e}")
+            complete = False
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            complete = False
+
+    return PageExtraction(file_index, page_num, text, image_text, time.perf_counter() - start_time, complete)
+
+
+def _plan_page_tasks(pdf_blobs: List[bytes]) -> List[Tuple[int, int, Tuple[int, ...]]]:
+    """Lists one (file, page, image xrefs) task per page.
+
+    Images reused across pages of a document (logos, headers) share a single xref, so
+    each xref is only assigned to the first page it appears on and is OCR'd once.
+    Files that can not be opened are logged and skipped.
+    """
+    import fitz  # PyMuPDF
+
+    tasks = []
+    for file_index, pdf_blob in enumerate(pdf_blobs):
+        try:
+            with fitz.open(stream=pdf_blob, filetype="pdf") as doc:
+                seen_xrefs = set()
+                for page_num in range(len(doc)):
+                    ocr_xrefs = []
+                    for img in doc.get_page_images(page_num, full=True):
+                        if img[0] not in seen_xrefs:
+                            seen_xrefs.add(img[0])
+                            ocr_xrefs.append(img[0])
+                    tasks.append((file_index, page_num, tuple(ocr_xrefs)))
+        except Exception as e:
+            logger.error(f"Error extracting PDF content from file {file_index}: {e}")
+    return tasks
+
+
+def extract_pdf_pages(
+    pdf_blobs: List[bytes], max_workers: Optional[int] = None, cache: Optional[ExtractionCache] = None
+) -> List[PageExtraction]:
+    """Extracts text and OCR output of every page of every PDF, in parallel across pages and files
+
+    Args:
+        pdf_blobs (List[bytes]): raw bytes of the PDF files
+        max_workers (int, optional): max number of worker processes. Defaults to the number of cores.
+            Fewer workers are started for small PDFs, which are extracted in the calling process.
+        cache (ExtractionCache, optional): cache for OCR output of embedded images. Defaults to None.
+
+    Returns:
+        List[PageExtraction]: page extractions, ordered by file and page number
+    """
+    tasks = _plan_page_tasks(pdf_blobs)
+    if not tasks:
+        return []
+
+    # starting worker processes costs more than it saves on small PDFs, which are extracted serially
+    work = sum(1 + OCR_PAGE_COST * len(ocr_xrefs) for _, _, ocr_xrefs in tasks)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks), math.ceil(work / MIN_WORK_PER_WORKER))
+    if max_workers == 1:
+        _init_worker(pdf_blobs, cache)
+        try:
+            pages = [_extract_page(*task) for task in tasks]
+        finally:
+            _release_worker_state()
+    else:
+        # spawned rather than forked workers, the parent (e.g. the streamlit server) runs threads that are not fork safe
+        with ProcessPoolExecutor(
+            max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(pdf_blobs, cache),
+        ) as executor:
+            # chunk the page tasks so each worker round trip carries several pages
+            chunksize = max(1, len(tasks) // (max_workers * 4))
+            pages = list(executor.map(_extract_page, *zip(*tasks), chunksize=chunksize))
+
+    for page in pages:
+        logger.debug(f"File {page.file_index} page {page.page_num} extracted in {page.elapsed:.3f}s")
+    return pages
+
+
+def combine_page_extractions(pages: List[PageExtraction]) -> Dict[int, str]:
+    """Joins page extractions into one text per file, the page text followed by the OCR text"""
+    texts: Dict[int, str] = {}
+    image_texts: Dict[int, str] = {}
+    for page in pages:
+        texts[page.file_index] = texts.get(page.file_index, "") + page.text
+        image_texts[page.file_index] = image_texts.get(page.file_index, "") + page.image_text
+    return {file_index: texts[file_index] + " " + image_texts[file_index] for file_index in texts}
+
+
+def extract_pdf_content(
+    pdf_blobs: List[bytes], max_workers: Optional[int] = None, cache: Optional[ExtractionCache] = None
+) -> Tuple[str, List[PageExtraction]]:
+    """Extracts the text of several PDF files, skipping extraction entirely for files already in the cache
+
+    Args:
+        pdf_blobs (List[bytes]): raw bytes of the PDF files
+        max_workers (int, optional): number of worker processes. Defaults to the number of cores.
+        cache (ExtractionCache, optional): cache of whole-file and per-image extractions. Defaults to None.
+
+    Returns:
+        Tuple[str, List[PageExtraction]]: combined text of all files, and the page extractions of the
+            files that were not served from the cache
+    """
+    file_texts: Dict[int, str] = {}
+    file_keys = [ExtractionCache.digest(pdf_blob) for pdf_blob in pdf_blobs] if cache else []
+    for file_index, key in enumerate(file_keys):
+        cached_text = cache.get("file", key)
+        if cached_text is not None:
+            file_texts[file_index] = cached_text
+
+    missing = [file_index for file_index in range(len(pdf_blobs)) if file_index not in file_texts]
+    pages = extract_pdf_pages([pdf_blobs[file_index] for file_index in missing], max_workers, cache)
+    # files with a failed page or image are not cached, so their extraction is retried on the next upload
+    incomplete = {page.file_index for page in pages if not page.complete}
+    for position, file_text in combine_page_extractions(pages).items():
+        file_index = missing[position]
+        file_texts[file_index] = file_text
+        if cache and position not in incomplete:
+            cache.put("file", file_keys[file_index], file_text)
+    for page in pages:
+        page.file_index = missing[page.file_index]
+
+    if cache:
+        logger.info(f"{len(pdf_blobs) - len(missing)} of {len(pdf_blobs)} PDF files served from the extraction cache")
+    return "".join(file_texts[file_index] for file_index in sorted(file_texts)), pages
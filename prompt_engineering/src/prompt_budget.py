@@ -0,0 +1,168 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# word pieces and single punctuation marks, a close approximation of BPE token boundaries
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+TERM_PATTERN = re.compile(r"\w+")
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+@dataclass
+class BudgetReport:
+    """Outcome of fitting reference material into a token budget"""
+
+    total_tokens: int
+    kept_tokens: int
+    total_passages: int
+    kept_passages: int
+
+    @property
+    def dropped_tokens(self) -> int:
+        return self.total_tokens - self.kept_tokens
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the number of model tokens of a text.
+
+    Every word or punctuation mark counts as one token, plus one more token for every
+    further 5 characters of long words, which BPE vocabularies split into pieces.
+    """
+    return sum(1 + (len(piece) - 1) // 5 for piece in TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keeps the leading words of a text that fit in max_tokens tokens"""
+    kept: List[str] = []
+    kept_tokens = 0
+    for word in text.split():
+        kept_tokens += count_tokens(word)
+        if kept_tokens > max_tokens:
+            break
+        kept.append(word)
+    return " ".join(kept)
+
+
+def split_word(word: str, max_tokens: int) -> List[str]:
+    """Cuts a word longer than max_tokens tokens (a URL, OCR garbage) into parts of at most max_tokens tokens"""
+    pieces: List[str] = []
+    for piece in TOKEN_PATTERN.findall(word):
+        # a single word piece costs a token per 5 characters
+        pieces.extend(piece[i : i + 5 * max_tokens] for i in range(0, len(piece), 5 * max_tokens))
+    parts: List[str] = []
+    part = ""
+    part_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if part and part_tokens + piece_tokens > max_tokens:
+            parts.append(part)
+            part, part_tokens = "", 0
+        part += piece
+        part_tokens += piece_tokens
+    if part:
+        parts.append(part)
+    return parts
+
+
+def split_sentences(text: str, max_tokens: int) -> List[str]:
+    """Splits a text into sentences, cutting sentences longer than max_tokens into windows of words"""
+    sentences: List[str] = []
+    for sentence in SENTENCE_SPLIT_PATTERN.split(text):
+        if count_tokens(sentence) <= max_tokens:
+            sentences.append(sentence)
+            continue
+        # unpunctuated text (transcripts, OCR output, tables) would otherwise be a single oversized passage
+        window: List[str] = []
+        window_tokens = 0
+        for word in sentence.split():
+            for part in split_word(word, max_tokens) if count_tokens(word) > max_tokens else [word]:
+                part_tokens = count_tokens(part)
+                if window and window_tokens + part_tokens > max_tokens:
+                    sentences.append(" ".join(window))
+                    window, window_tokens = [], 0
+                window.append(part)
+                window_tokens += part_tokens
+        if window:
+            sentences.append(" ".join(window))
+    return sentences
+
+
+def split_passages(text: str, passage_tokens: int) -> List[str]:
+    """Groups consecutive sentences into passages of about passage_tokens tokens"""
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in split_sentences(text, passage_tokens):
+        sentence_tokens = count_tokens(sentence)
+        if current and current_tokens + sentence_tokens > passage_tokens:
+            passages.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += sentence_tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(query: str, passages: List[str]) -> List[float]:
+    """Scores every passage against the query with Okapi BM25"""
+    query_terms = set(TERM_PATTERN.findall(query.lower()))
+    passage_terms = [Counter(TERM_PATTERN.findall(passage.lower())) for passage in passages]
+    if not query_terms or not passages:
+        return [0.0] * len(passages)
+
+    average_length = sum(sum(terms.values()) for terms in passage_terms) / len(passages) or 1.0
+    document_frequency = Counter(term for terms in passage_terms for term in query_terms if term in terms)
+    scores = []
+    for terms in passage_terms:
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(terms.values()) / average_length)
+        score = 0.0
+        for term in query_terms:
+            frequency = terms.get(term, 0)
+            if frequency:
+                df = document_frequency[term]
+                idf = math.log(1 + (len(passages) - df + 0.5) / (df + 0.5))
+                score += idf * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+        scores.append(score)
+    return scores
+
+
+def fit_to_budget(text: str, query: str, max_tokens: int, passage_tokens: int = 200) -> Tuple[str, BudgetReport]:
+    """Keeps the passages of a text most relevant to a query that fit in a token budget
+
+    Args:
+        text (str): reference material to compress
+        query (str): text the passages are ranked against, e.g. the lesson topic
+        max_tokens (int): token budget for the returned text
+        passage_tokens (int, optional): approximate size of the ranked passages. Defaults to 200.
+
+    Returns:
+        Tuple[str, BudgetReport]: selected passages in their original order, and a report
+            of how many tokens and passages were kept
+    """
+    # passages larger than the whole budget could never be kept
+    passage_tokens = max(1, min(passage_tokens, max_tokens))
+    passages = split_passages(text, passage_tokens) if text else []
+    passage_token_counts = [count_tokens(passage) for passage in passages]
+    total_tokens = sum(passage_token_counts)
+    if total_tokens <= max_tokens:
+        return text, BudgetReport(total_tokens, total_tokens, len(passages), len(passages))
+
+    scores = bm25_scores(query, passages)
+    # most relevant first, earlier passages first on ties
+    ranking = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    selected = []
+    kept_tokens = 0
+    for i in ranking:
+        if kept_tokens + passage_token_counts[i] <= max_tokens:
+            selected.append(i)
+            kept_tokens += passage_token_counts[i]
+
+    compressed_text = " ".join(passages[i] for i in sorted(selected))
+    return compressed_text, BudgetReport(total_tokens, kept_tokens, len(passages), len(selected))
@@ -0,0 +1,64 @@
+import glob
+import logging
+import os
+import threading
+from typing import Dict, Tuple
+
+from langchain.prompts import PromptTemplate, load_prompt
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, ".."))
+
+PROMPTS_DIR = os.path.join(kit_dir, "prompts")
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTemplateRegistry:
+    """In-memory registry of the prompt templates stored as yaml files in a directory.
+
+    Every yaml file is loaded and parsed into a langchain PromptTemplate once, when the
+    registry is created. Files that fail to load are logged and skipped there, so a
+    malformed prompt only fails the lookups of that prompt, not the import of the app.
+    Lookups are served from memory after a single os.stat call that compares the file
+    mtime with the one seen at load time, so edited files are reloaded and new files
+    picked up without restarting the app.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._templates: Dict[str, Tuple[float, PromptTemplate]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        for path in sorted(glob.glob(os.path.join(prompts_dir, "*.yaml"))):
+            try:
+                self.get(os.path.basename(path))
+            except Exception as e:
+                logger.error(f"Skipping invalid prompt template {path}: {e}")
+
+    def get(self, file_name: str) -> PromptTemplate:
+        """Returns the compiled template of a prompt yaml file, reloading it if the file changed
+
+        Args:
+            file_name (str): yaml file name inside the prompts directory
+
+        Returns:
+            PromptTemplate: compiled prompt template
+        """
+        path = os.path.join(self.prompts_dir, file_name)
+        mtime = os.stat(path).st_mtime
+        cached = self._templates.get(file_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            cached = self._templates.get(file_name)
+            if cached is None or cached[0] != mtime:
+                logger.debug(f"Loading prompt template {path}")
+                cached = (mtime, load_prompt(path))
+                self._templates[file_name] = cached
+                self.loads += 1
+        return cached[1]
+
+
+# shared by every LLMManager in this process
+PROMPT_REGISTRY = PromptTemplateRegistry()
@@ -0,0 +1,149 @@
+import math
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+EMBEDDING_DIMENSIONS = 1024
+NGRAM_SIZE = 3
+# words keep the symbols of names like C++, C#, F# or .NET, which set them apart from C, F or NET
+WORD_PATTERN = re.compile(r"[\w+#.]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+GUARD_WORD_PATTERN = re.compile(r"[\w+#.']+")
+# words flipping the meaning of an instruction while barely moving its embedding
+NEGATION_WORDS = frozenset(
+    {"no", "not", "never", "none", "nor", "without", "avoid", "exclude", "excluding", "except", "only", "cannot"}
+)
+
+
+def normalize_cache_key(text: str) -> str:
+    """Normalises a cache key by lowercasing it and collapsing whitespace, keeping every symbol"""
+    return WHITESPACE_PATTERN.sub(" ", text.lower()).strip()
+
+
+def guard_tokens(text: str) -> Tuple[str, ...]:
+    """Returns the numbers and negation words of a text, in order
+
+    Two requests only share a cached completion when these match exactly: "5 questions" and
+    "50 questions", or "avoid formulas" and "include formulas", are close in any embedding space
+    but ask for different answers.
+    """
+    tokens = []
+    for word in GUARD_WORD_PATTERN.findall(text.lower()):
+        word = word.rstrip(".")
+        if any(char.isdigit() for char in word) or word in NEGATION_WORDS or word.endswith("n't"):
+            tokens.append(word)
+    return tuple(tokens)
+
+
+def hashed_ngram_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Embeds a text as an L2 normalised bag of hashed character trigrams.
+
+    Texts differing only in a few words or in word order stay close in this space, which is
+    what the response cache needs, without loading an embedding model in the app process.
+    """
+    vector = [0.0] * dimensions
+    for word in WORD_PATTERN.findall(text.lower()):
+        # a sentence final dot is not part of the word, unlike the leading dot of .net
+        word = word.rstrip(".")
+        if not word:
+            continue
+        padded_word = f" {word} "
+        for i in range(max(1, len(padded_word) - NGRAM_SIZE + 1)):
+            ngram = padded_word[i : i + NGRAM_SIZE]
+            vector[zlib.crc32(ngram.encode("utf-8")) % dimensions] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+@dataclass
+class CacheEntry:
+    namespace: str
+    text: str
+    guard: Tuple[str, ...]
+    vector: List[float]
+    completion: str
+    created_at: float
+    last_used_at: float
+
+
+class SemanticResponseCache:
+    """In-memory cache of completions looked up by embedding similarity.
+
+    Requests are split in an exact part, the namespace (e.g. topic, learning mode,
+    familiarity, language and reference material digest), and a free text part that is
+    embedded. A lookup returns the completion of the most similar entry of the same
+    namespace when its cosine similarity reaches the threshold, or when its text is the
+    same, which also covers empty texts. Similar texts only match when their numbers and
+    negation words are the same, see `guard_tokens`. Entries expire after ttl_seconds and the
+    least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]] = hashed_ngram_embedding,
+        similarity_threshold: float = 0.9,
+        ttl_seconds: float = 24 * 60 * 60,
+        max_entries: int = 1000,
+    ):
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: List[CacheEntry] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _similarity(a: List[float], b: List[float]) -> float:
+        """Cosine similarity of two L2 normalised vectors"""
+        return sum(x * y for x, y in zip(a, b))
+
+    def lookup(self, namespace: str, text: str) -> Optional[str]:
+        """Returns the cached completion of the most similar request, or None on a miss
+
+        Args:
+            namespace (str): exact part of the request, only entries with the same namespace match
+            text (str): free text part of the request, matched by similarity
+        """
+        vector = self.embed_fn(text)
+        guard = guard_tokens(text)
+        now = time.time()
+        with self._lock:
+            self._entries = [entry for entry in self._entries if now - entry.created_at < self.ttl_seconds]
+            best_entry, best_similarity = None, self.similarity_threshold
+            for entry in self._entries:
+                if entry.namespace == namespace and entry.guard == guard:
+                    similarity = 1.0 if entry.text == text else self._similarity(vector, entry.vector)
+                    if similarity >= best_similarity:
+                        best_entry, best_similarity = entry, similarity
+            if best_entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            best_entry.last_used_at = now
+            return best_entry.completion
+
+    def store(self, namespace: str, text: str, completion: str) -> None:
+        """Caches the completion of a request
+
+        Args:
+            namespace (str): exact part of the request
+            text (str): free text part of the request
+            completion (str): completion to serve for similar requests
+        """
+        vector = self.embed_fn(text)
+        now = time.time()
+        with self._lock:
+            self._entries.append(CacheEntry(namespace, text, guard_tokens(text), vector, completion, now, now))
+            if len(self._entries) > self.max_entries:
+                self._entries.sort(key=lambda entry: entry.last_used_at)
+                del self._entries[: len(self._entries) - self.max_entries]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the number of cached entries"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,21 @@
+import re
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# ASCII bytes removed by clean_text: everything except letters, digits, whitespace and . , ! ?
+DROPPED_ASCII_BYTES = bytes(
+    code for code in range(128) if not (chr(code).isalnum() or chr(code).isspace() or chr(code) in ".,!?")
+)
+
+
+def clean_text(text: str) -> str:
+    """Clean extracted text.
+
+    Lowercases the text, collapses whitespace runs into a single space and keeps only ASCII
+    letters, digits and basic punctuation. Whitespace is collapsed in one regex pass over the
+    unicode text, then non-ASCII characters and disallowed punctuation are dropped by the
+    ASCII codec and a single bytes.translate call, which run in C without building
+    intermediate strings per rule.
+    """
+    text = WHITESPACE_PATTERN.sub(" ", text.lower())
+    return text.encode("ascii", "ignore").translate(None, DROPPED_ASCII_BYTES).decode("ascii").strip()
@@ -1,11 +1,8 @@
 import os
 import sys
+import hashlib
+import json
 import logging
-import re
-import io
-from PIL import Image
-import pytesseract
-import fitz  # PyMuPDF
 
 # Setting up directories and paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,7 +14,14 @@ sys.path.append(repo_dir)
 
 import streamlit as st
 from dotenv import load_dotenv
-from src.llm_management import LLMManager
+from src.learning_prompts import build_learning_prompt
+from src.llm_management import GenerationStats, LLMManager
+from src.conversation import DoubtConversation
+from src.extraction_cache import ExtractionCache
+from src.pdf_extraction import extract_pdf_content as extract_pdf_text
+from src.prompt_budget import fit_to_budget
+from src.response_cache import SemanticResponseCache, normalize_cache_key
+from src.text_processing import clean_text
 
 # Load environment variables
 load_dotenv(os.path.join(repo_dir, '.env'))
@@ -28,53 +32,41 @@ logging.info("App started at: http://localhost:8501")
 
 
 @st.cache_data
-def call_api(llm_manager: LLMManager, prompt: str, llm_expert: str) -> str:
-    """Calls the API endpoint with the prompt and returns the completion text."""
-    llm = llm_manager.set_llm(model_expert=llm_expert)
-    completion_text = llm.invoke(prompt)
+def call_api(_llm_manager: LLMManager, prompt: str, llm_expert: str) -> str:
+    """Calls the API endpoint with the prompt and returns the completion text.
+
+    The llm manager argument is prefixed with an underscore so Streamlit keys the cache on the
+    prompt and expert only, instead of hashing the whole manager on every call.
+    """
+    completion_text = _llm_manager.invoke(prompt, model_expert=llm_expert)
+    logging.info(f"LLM client registry: {_llm_manager.get_client_stats()}")
     return completion_text
 
 
-def extract_pdf_content(pdf_files):
-    """Extract text and images from PDF files."""
-    combined_text = ""
-    for pdf_file in pdf_files:
-        try:
-            doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-            text = ""
-            image_text = ""
-
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-
-                images = page.get_images(full=True)
-                for img in images:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    try:
-                        image_text += pytesseract.image_to_string(image)
-                    except pytesseract.TesseractNotFoundError as e:
-                        logging.error(f"Tesseract not found: {e}")
-                    except Exception as e:
-                        logging.error(f"Error processing image: {e}")
-
-            combined_text += text + " " + image_text
-        except Exception as e:
-            logging.error(f"Error extracting PDF content: {e}")
-    return combined_text
+@st.cache_resource
+def get_response_cache(similarity_threshold: float, ttl_seconds: int, max_entries: int) -> SemanticResponseCache:
+    """Returns the semantic cache of generated lessons and quizzes shared by every session."""
+    return SemanticResponseCache(
+        similarity_threshold=similarity_threshold, ttl_seconds=ttl_seconds, max_entries=max_entries
+    )
+
+
+@st.cache_resource
+def get_extraction_cache(cache_dir: str, max_mb: int) -> ExtractionCache:
+    """Returns the on-disk extraction cache shared by every session."""
+    return ExtractionCache(os.path.join(kit_dir, cache_dir), max_bytes=max_mb * 1024 * 1024)
 
 
-def clean_text(text):
-    """Clean extracted text."""
-    text = text.lower()
-    text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with a single space
-    text = re.sub(r'[^\x00-\x7F]+', '', text)  # Remove non-ASCII characters
-    text = re.sub(r'[^a-zA-Z0-9\s.,!?]', '', text)  # Keep only letters, numbers, and basic punctuation
-    return text.strip()
+def extract_pdf_content(pdf_files, reference_info):
+    """Extract text and images from PDF files, processing pages in parallel and reusing cached extractions."""
+    cache = get_extraction_cache(reference_info["extraction_cache_dir"], reference_info["extraction_cache_max_mb"])
+    pdf_blobs = [pdf_file.read() for pdf_file in pdf_files]
+    combined_text, pages = extract_pdf_text(pdf_blobs, reference_info.get("extraction_max_workers"), cache)
+    if pages:
+        slowest_page = max(pages, key=lambda page: page.elapsed)
+        logging.info(f"Extracted {len(pages)} pages, slowest page {slowest_page.page_num} of file "
+                     f"{slowest_page.file_index} took {slowest_page.elapsed:.2f}s")
+    return combined_text
 
 
 def main():
@@ -254,38 +246,93 @@ def main():
             st.error("Please fill out all required fields.")
 
     # Generate content based on the user's selections
+    streamed_this_run = False
     if st.session_state.generate_content:
-        if learning_mode == "Lesson":
-            prompt = f"As an experienced educator, explain the reasoning behind the key concepts of '{topic}' to a {familiarity} level learner. Structure the explanation to ensure clarity within {st.session_state.time_available} minutes. Contextualize the content with real-world examples and guide the learner through the topic using relatable storytelling. Keep the learner motivated by highlighting practical applications. Finally, evaluate the learning process by recommending 2-3 free, high-quality online courses and relevant YouTube lectures with their links. Also suggest 1-2 projects for hands-on practice. Incorporate {additional_instructions} to further enhance the experience."
-
-        elif learning_mode == "Quiz":
-            prompt = f"As an experienced educator, assess the learner’s understanding of '{topic}' with a quiz designed for a {familiarity} level learner. Include multiple-choice, true/false, and short-answer questions. Provide detailed instructions and context for each question. Evaluate the learner's progress by giving immediate feedback on correct and incorrect answers. Ensure the quiz fits within {st.session_state.time_available} minutes, and integrate {additional_instructions} to make the assessment more tailored and effective."
-
-        if preferred_language:
-            prompt += f" Use {preferred_language} language in the response."
-
-        if additional_instructions:
-            prompt += f" Additionally, {additional_instructions}"
-
         # Handle uploaded PDF content
+        reference_text = ""
         if uploaded_files:
-            extracted_text = extract_pdf_content(uploaded_files)
+            extracted_text = extract_pdf_content(uploaded_files, llm_manager.reference_info)
             clean_extracted_text = clean_text(extracted_text)
-            prompt += f" Reference the following additional material: {clean_extracted_text}"
-
-        # Call the API using the prompt
-        response = call_api(llm_manager, prompt, llm_info["select_expert"])
-
-        # Store the generated content in session state
-        st.session_state.generated_content = response
+            reference_info = llm_manager.reference_info
+            reference_text, budget_report = fit_to_budget(
+                clean_extracted_text,
+                query=topic,
+                max_tokens=reference_info["max_prompt_tokens"],
+                passage_tokens=reference_info["passage_tokens"],
+            )
+            logging.info(f"Reference material budget: {budget_report}")
+            if budget_report.dropped_tokens:
+                st.info(f"Reference material trimmed to the {budget_report.kept_passages} passages most relevant to "
+                        f"'{topic}' ({budget_report.dropped_tokens} of {budget_report.total_tokens} tokens dropped).")
+
+        prompt = build_learning_prompt(
+            learning_mode,
+            topic,
+            familiarity,
+            st.session_state.time_available,
+            preferred_language=preferred_language,
+            additional_instructions=additional_instructions,
+            reference_text=reference_text,
+        )
+
+        # Requests for the same topic only differing in the wording of the instructions share a cache entry
+        response_cache = get_response_cache(**llm_manager.response_cache_info)
+        cache_namespace = json.dumps([
+            normalize_cache_key(topic),
+            learning_mode,
+            familiarity,
+            st.session_state.time_available,
+            clean_text(preferred_language),
+            hashlib.sha256(reference_text.encode()).hexdigest() if reference_text else None,
+            llm_info["select_expert"],
+        ])
+        cache_text = normalize_cache_key(additional_instructions)
+        response = response_cache.lookup(cache_namespace, cache_text)
+
+        if response is not None:
+            logging.info(f"Response cache hit: {response_cache.stats()}")
+            st.session_state.generated_content = response
+            st.session_state.generation_stats = None
+        elif llm_info.get("race_experts"):
+            # Race the configured experts and keep the preferred answer if it arrives in time
+            try:
+                with st.spinner("Generating content..."):
+                    model_expert, response = llm_manager.race(prompt)
+                logging.info(f"Content generated by racing expert {model_expert}")
+                response_cache.store(cache_namespace, cache_text, response)
+            except (TimeoutError, RuntimeError) as e:
+                # no racing expert answered in time, the single expert path below streams the answer instead
+                logging.warning(f"Racing experts failed, falling back to {llm_info['select_expert']}: {e}")
+                response = None
+            else:
+                st.session_state.generated_content = response
+                st.session_state.generation_stats = None
+
+        if response is None:
+            # Stream the completion into the page as tokens arrive
+            st.markdown("### Generated Content")
+            stats = GenerationStats()
+            response = st.write_stream(llm_manager.stream(prompt, llm_info["select_expert"], stats))
+            streamed_this_run = True
+            logging.info(f"Generation stats: {stats.as_dict()}")
+            response_cache.store(cache_namespace, cache_text, response)
+
+            # Store the generated content and its timings in session state
+            st.session_state.generated_content = response
+            st.session_state.generation_stats = stats.as_dict()
 
         # Reset content generation flag
         st.session_state.generate_content = False
 
     # Display the generated content if it exists
     if st.session_state.generated_content:
-        st.markdown("### Generated Content")
-        st.write(st.session_state.generated_content)
+        if not streamed_this_run:
+            st.markdown("### Generated Content")
+            st.write(st.session_state.generated_content)
+        if st.session_state.get("generation_stats"):
+            generation_stats = st.session_state.generation_stats
+            st.caption(f"First token in {generation_stats['time_to_first_token']:.2f}s · "
+                       f"{generation_stats['chunks_per_second']:.1f} chunks/s")
 
         # After content generation, allow the user to input doubts
         st.markdown("### Have doubts? Ask your question below:")
@@ -294,9 +341,16 @@ def main():
         # Button to submit the doubt
         if st.button("Submit Doubt"):
             if user_doubt:
+                # Conversation grounded in the generated content, reset whenever new content is generated
+                conversation = st.session_state.get("conversation")
+                if conversation is None or conversation.generated_content != st.session_state.generated_content:
+                    conversation = DoubtConversation(st.session_state.generated_content, **llm_manager.doubts_info)
+                    st.session_state.conversation = conversation
+
                 # Prompt for model to answer the user's doubt
-                doubt_prompt = f"As an AI assistant, answer this question based on the previous content: '{user_doubt}'"
+                doubt_prompt = conversation.build_prompt(user_doubt)
                 doubt_response = call_api(llm_manager, doubt_prompt, llm_info["select_expert"])
+                conversation.add_turn(user_doubt, doubt_response)
 
                 # Store the question and answer in session state
                 st.session_state.questions.append(user_doubt)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Clean Text Benchmark Script
+
+This script compares the single-pass `clean_text` normaliser against the previous
+four-sweep regex implementation on a large synthetic corpus of extracted PDF text.
+
+Test cases:
+    test_same_output: checks both implementations return identical text
+    test_throughput: times both implementations and checks the single-pass one is not slower
+
+Usage:
+    python tests/clean_text_benchmark.py [--size_mb 20] [--repeats 3]
+
+Returns:
+    0 if all tests pass, or a positive integer representing the number of failed tests.
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+import unittest
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+from src.text_processing import clean_text
+
+SIZE_MB = 20
+REPEATS = 3
+SEED = 42
+
+# fragments typical of PDF and OCR output: mixed case, ligatures, accents, bullets, odd whitespace
+FRAGMENTS = [
+    'The Quick brown fox', 'jumps over', 'the lazy dog.', 'Photosynthesis', 'ﬁnancial', 'café', 'naïve',
+    '•', '—', '“quoted”', '(see p. 12)', '#hashtag', 'e-mail: a@b.com', 'İstanbul', 'Kelvin K',
+    ' ', ' ', '\t', '\n\n', '   ', '100%', '3.14', 'Q&A?', '¡Hola!', '日本語', 'Ελληνικά',
+]
+
+
+def legacy_clean_text(text: str) -> str:
+    """Previous implementation of clean_text, four regex sweeps over the whole text"""
+    text = text.lower()
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\x00-\x7F]+', '', text)
+    text = re.sub(r'[^a-zA-Z0-9\s.,!?]', '', text)
+    return text.strip()
+
+
+def build_corpus(size_mb: int, seed: int = SEED) -> str:
+    """Builds a synthetic corpus of roughly size_mb megabytes"""
+    rng = random.Random(seed)
+    target_size = size_mb * 1024 * 1024
+    parts = []
+    size = 0
+    while size < target_size:
+        fragment = rng.choice(FRAGMENTS)
+        parts.append(fragment)
+        parts.append(' ' if rng.random() < 0.8 else '')
+        size += len(fragment) + 1
+    return ''.join(parts)
+
+
+def best_time(function, text: str, repeats: int) -> float:
+    """Returns the best wall time out of several runs"""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+class CleanTextBenchmark(unittest.TestCase):
+    size_mb = SIZE_MB
+    repeats = REPEATS
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.corpus = build_corpus(cls.size_mb)
+
+    def test_same_output(self) -> None:
+        self.assertEqual(clean_text(self.corpus), legacy_clean_text(self.corpus))
+        for fragment in FRAGMENTS:
+            self.assertEqual(clean_text(fragment), legacy_clean_text(fragment), f'Mismatch for {fragment!r}')
+
+    def test_throughput(self) -> None:
+        legacy_time = best_time(legacy_clean_text, self.corpus, self.repeats)
+        single_pass_time = best_time(clean_text, self.corpus, self.repeats)
+        logger.info(
+            f'{self.size_mb} MB corpus: four-sweep {legacy_time:.3f}s, single-pass {single_pass_time:.3f}s '
+            f'({legacy_time / single_pass_time:.1f}x)'
+        )
+        self.assertLessEqual(single_pass_time, legacy_time, 'The single-pass normaliser should not be slower')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark clean_text against the four-sweep implementation')
+    parser.add_argument('--size_mb', type=int, default=SIZE_MB, help=f'corpus size in MB (default: {SIZE_MB})')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help=f'timed runs per function (default: {REPEATS})')
+    args = parser.parse_args()
+    CleanTextBenchmark.size_mb = args.size_mb
+    CleanTextBenchmark.repeats = args.repeats
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(CleanTextBenchmark)
+    test_result = unittest.TextTestRunner().run(suite)
+    return len(test_result.failures) + len(test_result.errors)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
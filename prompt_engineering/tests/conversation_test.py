@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Doubt Conversation Test Script
+
+This script tests the bounded chat history of the Prompt Engineering kit using unittest.
+
+Test cases:
+    test_summarize_turn: checks a turn is summarized by its question and the first sentence of its answer
+    test_recent_turns_are_kept_verbatim: checks the turns of the window are in the prompt as they were
+    test_turns_leaving_the_window_are_summarized: checks older turns are only in the prompt as summary lines
+    test_summary_keeps_its_budget: checks the oldest summary lines are dropped beyond the summary budget
+    test_history_budget_truncates_oldest_recent_turn: checks the newest turns are kept first within the history budget
+    test_content_is_trimmed_to_the_question: checks only the content relevant to the question fits its budget
+
+Usage:
+    python tests/conversation_test.py
+"""
+
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+from prompt_engineering.src.conversation import ConversationTurn, DoubtConversation, summarize_turn
+from prompt_engineering.src.prompt_budget import count_tokens
+
+CONTENT = (
+    'Photosynthesis turns light into chemical energy. '
+    'Chlorophyll absorbs the light used by photosynthesis. '
+    'The french revolution began in 1789. '
+    'Napoleon rose to power after the revolution.'
+)
+
+
+class DoubtConversationTestCase(unittest.TestCase):
+    def test_summarize_turn(self) -> None:
+        turn = ConversationTurn(' What is chlorophyll? ', 'A green pigment. It absorbs light.')
+        self.assertEqual(summarize_turn(turn), 'Q: What is chlorophyll? A: A green pigment.')
+        long_turn = ConversationTurn('Why?', ' '.join(['because'] * 100))
+        self.assertLessEqual(count_tokens(summarize_turn(long_turn, max_tokens=20)), 20 + count_tokens('Q: Why? A:'))
+
+    def test_recent_turns_are_kept_verbatim(self) -> None:
+        conversation = DoubtConversation(CONTENT, window_turns=2)
+        conversation.add_turn('What is chlorophyll?', 'A green pigment.')
+        conversation.add_turn('Where is it?', 'In the chloroplasts.')
+        prompt = conversation.build_prompt('Why is it green?')
+        self.assertIn('Learner: What is chlorophyll?\nAssistant: A green pigment.\n', prompt)
+        self.assertIn('Learner: Where is it?\nAssistant: In the chloroplasts.\n', prompt)
+        self.assertNotIn('Summary of the earlier conversation', prompt)
+        self.assertTrue(prompt.endswith("Question: 'Why is it green?'"))
+
+    def test_turns_leaving_the_window_are_summarized(self) -> None:
+        conversation = DoubtConversation(CONTENT, window_turns=2)
+        for i in range(4):
+            conversation.add_turn(f'Question {i}?', f'Answer {i}. More details {i}.')
+        self.assertEqual(len(conversation.recent_turns), 2)
+        self.assertEqual(conversation.summary_lines, ['Q: Question 0? A: Answer 0.', 'Q: Question 1? A: Answer 1.'])
+        prompt = conversation.build_prompt('Question 4?')
+        self.assertIn('Summary of the earlier conversation:\nQ: Question 0? A: Answer 0.\n', prompt)
+        self.assertNotIn('More details 0', prompt)
+        self.assertIn('Assistant: Answer 3. More details 3.', prompt)
+
+    def test_summary_keeps_its_budget(self) -> None:
+        conversation = DoubtConversation(CONTENT, window_turns=1, summary_max_tokens=30)
+        for i in range(20):
+            conversation.add_turn(f'Question {i}?', f'Answer {i}.')
+        self.assertLessEqual(count_tokens('\n'.join(conversation.summary_lines)), 30)
+        self.assertEqual(conversation.summary_lines[-1], 'Q: Question 18? A: Answer 18.')
+
+    def test_history_budget_truncates_oldest_recent_turn(self) -> None:
+        conversation = DoubtConversation(CONTENT, window_turns=3, history_max_tokens=60)
+        conversation.add_turn('First question?', ' '.join(['old'] * 50))
+        conversation.add_turn('Second question?', ' '.join(['new'] * 30))
+        summary_lines, recent_turns = conversation._fit_history()
+        self.assertEqual(summary_lines, [])
+        self.assertEqual(len(recent_turns), 2)
+        self.assertTrue(recent_turns[0].startswith('Learner: First question?\nAssistant: old'))
+        self.assertTrue(recent_turns[0].endswith('...\n'))
+        self.assertEqual(recent_turns[1], f"Learner: Second question?\nAssistant: {' '.join(['new'] * 30)}\n")
+        self.assertLessEqual(count_tokens(''.join(recent_turns)), 60 + count_tokens('...'))
+
+    def test_content_is_trimmed_to_the_question(self) -> None:
+        conversation = DoubtConversation(CONTENT, content_max_tokens=25)
+        prompt = conversation.build_prompt('What does chlorophyll absorb?')
+        self.assertIn('Chlorophyll absorbs the light used by photosynthesis.', prompt)
+        self.assertNotIn('Napoleon', prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Import Time Benchmark Script
+
+This script measures the cold import time of the QuiZenius Streamlit app module in fresh
+interpreters and checks that the PDF/OCR and local embedding stacks are not loaded at startup.
+
+Test cases:
+    test_heavy_modules_not_imported: checks fitz, pytesseract and the sentence transformers stack are lazy
+    test_import_time_budget: checks the median cold import time is within the startup budget
+
+Usage:
+    python tests/import_time_benchmark.py [--budget_s 4.0] [--runs 5]
+
+Returns:
+    0 if all tests pass, or a positive integer representing the number of failed tests.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import unittest
+from typing import Any, Dict
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
+app_dir = os.path.join(kit_dir, 'streamlit')
+
+BUDGET_S = 4.0
+RUNS = 5
+
+# modules that must only be loaded on first use
+LAZY_MODULES = ['fitz', 'pytesseract', 'sentence_transformers', 'InstructorEmbedding', 'torch']
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+start_time = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start_time
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import() -> Dict[str, Any]:
+    """Imports the app module in a fresh interpreter and returns its import time and loaded lazy modules"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT], cwd=kit_dir, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class ImportTimeBenchmark(unittest.TestCase):
+    budget_s = BUDGET_S
+    runs = RUNS
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.measurements = [measure_import() for _ in range(cls.runs)]
+
+    def test_heavy_modules_not_imported(self) -> None:
+        for measurement in self.measurements:
+            self.assertEqual(measurement['loaded'], [], 'Heavy modules should be imported on first use only')
+
+    def test_import_time_budget(self) -> None:
+        timings = [measurement['elapsed'] for measurement in self.measurements]
+        median_time = statistics.median(timings)
+        logger.info(f'App import time over {self.runs} runs: median {median_time:.2f}s, max {max(timings):.2f}s')
+        self.assertLessEqual(median_time, self.budget_s, f'App import should take less than {self.budget_s}s')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the cold import time of the QuiZenius app')
+    parser.add_argument('--budget_s', type=float, default=BUDGET_S, help=f'startup budget (default: {BUDGET_S}s)')
+    parser.add_argument('--runs', type=int, default=RUNS, help=f'fresh interpreters to time (default: {RUNS})')
+    args = parser.parse_args()
+    ImportTimeBenchmark.budget_s = args.budget_s
+    ImportTimeBenchmark.runs = args.runs
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(ImportTimeBenchmark)
+    test_result = unittest.TextTestRunner().run(suite)
+    return len(test_result.failures) + len(test_result.errors)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Prompt Budget Test Script
+
+This script tests how the Prompt Engineering kit fits reference material into a token budget using unittest.
+
+Test cases:
+    test_count_tokens: checks words, punctuation and long words are counted
+    test_bm25_ranks_relevant_passages_first: checks passages mentioning the query score higher
+    test_text_within_budget_is_kept: checks a text that fits is returned unchanged
+    test_most_relevant_passages_are_kept_in_order: checks the kept passages are the relevant ones, in text order
+    test_unpunctuated_text_is_split: checks text without sentence ends is cut into passages that fit
+    test_long_single_word_is_cut: checks a word larger than the budget is cut by characters
+    test_truncate_to_tokens: checks leading words are kept within the budget
+
+Usage:
+    python tests/prompt_budget_test.py
+"""
+
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+from prompt_engineering.src.prompt_budget import (
+    bm25_scores,
+    count_tokens,
+    fit_to_budget,
+    split_word,
+    truncate_to_tokens,
+)
+
+REFERENCE = (
+    'The french revolution began in 1789. '
+    'Photosynthesis turns light into chemical energy. '
+    'Chlorophyll absorbs the light used by photosynthesis. '
+    'Napoleon rose to power after the revolution. '
+    'Plants release oxygen as a product of photosynthesis.'
+)
+
+
+class PromptBudgetTestCase(unittest.TestCase):
+    def test_count_tokens(self) -> None:
+        self.assertEqual(count_tokens('light energy.'), 4)
+        self.assertEqual(count_tokens('photosynthesis'), 3)
+        self.assertEqual(count_tokens(''), 0)
+
+    def test_bm25_ranks_relevant_passages_first(self) -> None:
+        passages = ['the revolution began in 1789', 'photosynthesis needs light', 'light and photosynthesis in plants']
+        scores = bm25_scores('photosynthesis light', passages)
+        self.assertEqual(scores[0], 0.0)
+        self.assertGreater(scores[1], 0.0)
+        self.assertGreater(scores[2], 0.0)
+        self.assertEqual(bm25_scores('', passages), [0.0, 0.0, 0.0])
+
+    def test_text_within_budget_is_kept(self) -> None:
+        text, report = fit_to_budget(REFERENCE, 'photosynthesis', max_tokens=1000)
+        self.assertEqual(text, REFERENCE)
+        self.assertEqual(report.kept_tokens, report.total_tokens)
+        self.assertEqual(report.dropped_tokens, 0)
+
+    def test_most_relevant_passages_are_kept_in_order(self) -> None:
+        text, report = fit_to_budget(REFERENCE, 'photosynthesis light', max_tokens=25, passage_tokens=15)
+        self.assertLessEqual(count_tokens(text), 25)
+        self.assertEqual(report.kept_tokens, 24)
+        self.assertNotIn('revolution', text)
+        self.assertLess(text.index('Photosynthesis turns'), text.index('Chlorophyll'))
+        self.assertEqual(report.total_passages, 5)
+        self.assertEqual(report.kept_passages, 2)
+
+    def test_unpunctuated_text_is_split(self) -> None:
+        transcript = ' '.join(['and then the teacher explained photosynthesis'] * 50)
+        text, report = fit_to_budget(transcript, 'photosynthesis', max_tokens=40, passage_tokens=200)
+        self.assertGreater(report.kept_tokens, 0)
+        self.assertLessEqual(count_tokens(text), 40)
+
+    def test_long_single_word_is_cut(self) -> None:
+        garbage = 'x' * 400
+        parts = split_word(garbage, 10)
+        self.assertEqual(''.join(parts), garbage)
+        self.assertTrue(all(count_tokens(part) <= 10 for part in parts))
+        text, report = fit_to_budget(garbage, 'photosynthesis', max_tokens=10)
+        self.assertEqual(report.kept_tokens, 10)
+        self.assertEqual(text, 'x' * 50)
+        url = 'https://example.com/' + 'a' * 120
+        text, report = fit_to_budget(url, 'example', max_tokens=5)
+        self.assertGreater(report.kept_tokens, 0)
+        self.assertLessEqual(count_tokens(text), 5)
+
+    def test_truncate_to_tokens(self) -> None:
+        self.assertEqual(truncate_to_tokens('one two three four', 2), 'one two')
+        self.assertEqual(truncate_to_tokens('one two', 10), 'one two')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Response Cache Test Script
+
+This script tests the semantic response cache of the Prompt Engineering kit using unittest.
+
+Test cases:
+    test_exact_and_similar_requests_hit: checks repeated and reworded requests are served from the cache
+    test_namespaces_do_not_mix: checks entries are only served to requests of the same namespace
+    test_different_numbers_miss: checks requests asking for a different number of items miss
+    test_opposite_instructions_miss: checks requests negating an instruction miss
+    test_guard_tokens: checks the numbers and negation words a hit requires to match
+    test_entries_expire: checks entries are not served once their ttl has passed
+    test_least_recently_used_entries_are_evicted: checks the cache keeps its most recently used entries
+
+Usage:
+    python tests/response_cache_test.py
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
+repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+from prompt_engineering.src import response_cache
+from prompt_engineering.src.response_cache import SemanticResponseCache, guard_tokens, normalize_cache_key
+
+NAMESPACE = 'photosynthesis|quiz|beginner|english'
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = SemanticResponseCache(similarity_threshold=0.9)
+
+    def assert_miss(self, stored: str, requested: str) -> None:
+        self.cache.store(NAMESPACE, normalize_cache_key(stored), 'cached answer')
+        self.assertIsNone(self.cache.lookup(NAMESPACE, normalize_cache_key(requested)))
+
+    def test_exact_and_similar_requests_hit(self) -> None:
+        self.cache.store(NAMESPACE, normalize_cache_key('Make a quiz with 5 questions on photosynthesis'), 'quiz')
+        reworded = normalize_cache_key('make a  QUIZ with 5 questions on photosynthesis')
+        self.assertEqual(self.cache.lookup(NAMESPACE, reworded), 'quiz')
+        self.assertEqual(self.cache.lookup(NAMESPACE, 'make a quiz on photosynthesis with 5 questions'), 'quiz')
+        self.cache.store(NAMESPACE, '', 'no instructions')
+        self.assertEqual(self.cache.lookup(NAMESPACE, ''), 'no instructions')
+        self.assertEqual(self.cache.stats(), {'entries': 2, 'hits': 3, 'misses': 0})
+
+    def test_namespaces_do_not_mix(self) -> None:
+        self.cache.store(NAMESPACE, 'make a quiz', 'quiz')
+        self.assertIsNone(self.cache.lookup('photosynthesis|quiz|advanced|english', 'make a quiz'))
+
+    def test_different_numbers_miss(self) -> None:
+        self.assert_miss(
+            'quiz me on photosynthesis with 5 questions, explain each answer in detail and keep the language simple',
+            'quiz me on photosynthesis with 50 questions, explain each answer in detail and keep the language simple',
+        )
+
+    def test_opposite_instructions_miss(self) -> None:
+        self.assert_miss(
+            'explain photosynthesis step by step for a beginner, avoid formulas and use everyday examples',
+            'explain photosynthesis step by step for a beginner, include formulas and use everyday examples',
+        )
+        self.assert_miss(
+            'build a practice quiz on photosynthesis for a beginner without true/false questions',
+            'build a practice quiz on photosynthesis for a beginner with only true/false questions',
+        )
+        self.assert_miss(
+            "explain each step, don't skip the light reactions", 'explain each step, skip the light reactions'
+        )
+
+    def test_guard_tokens(self) -> None:
+        self.assertEqual(guard_tokens('Give 5 questions, not 10.'), ('5', 'not', '10'))
+        self.assertEqual(guard_tokens("Don't use C++ 20 features"), ("don't", '20'))
+        self.assertEqual(guard_tokens('Explain the topic simply'), ())
+
+    def test_entries_expire(self) -> None:
+        cache = SemanticResponseCache(ttl_seconds=60)
+        with mock.patch.object(response_cache.time, 'time', return_value=1000.0):
+            cache.store(NAMESPACE, 'make a quiz', 'quiz')
+        with mock.patch.object(response_cache.time, 'time', return_value=1059.0):
+            self.assertEqual(cache.lookup(NAMESPACE, 'make a quiz'), 'quiz')
+        with mock.patch.object(response_cache.time, 'time', return_value=1060.0):
+            self.assertIsNone(cache.lookup(NAMESPACE, 'make a quiz'))
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        cache = SemanticResponseCache(max_entries=2)
+        with mock.patch.object(response_cache.time, 'time', return_value=1000.0):
+            cache.store('first', '', 'first answer')
+        with mock.patch.object(response_cache.time, 'time', return_value=1001.0):
+            cache.store('second', '', 'second answer')
+        with mock.patch.object(response_cache.time, 'time', return_value=1002.0):
+            self.assertEqual(cache.lookup('first', ''), 'first answer')
+        with mock.patch.object(response_cache.time, 'time', return_value=1003.0):
+            cache.store('third', '', 'third answer')
+            self.assertEqual(cache.lookup('first', ''), 'first answer')
+            self.assertIsNone(cache.lookup('second', ''))
+            self.assertEqual(cache.lookup('third', ''), 'third answer')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,6 @@ import os
 import sys
 from typing import Optional
 
-from langchain_community.embeddings import HuggingFaceInstructEmbeddings
-from langchain_community.llms.sambanova import SambaStudio
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models.llms import LLM
 
@@ -15,7 +13,7 @@ sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
 from utils.model_wrappers.langchain_embeddings import SambaStudioEmbeddings
-from utils.model_wrappers.langchain_llms import SambaNovaCloud
+from utils.model_wrappers.langchain_llms import SambaNovaCloud, SambaStudio
 
 EMBEDDING_MODEL = 'intfloat/e5-large-v2'
 NORMALIZE_EMBEDDINGS = True
@@ -43,11 +41,15 @@ class APIGateway:
         sambastudio_embeddings_project_id: Optional[str] = None,
         sambastudio_embeddings_endpoint_id: Optional[str] = None,
         sambastudio_embeddings_api_key: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 1_000_000,
+        cpu_threads: Optional[int] = None,
     ) -> Embeddings:
         """Loads a langchain embedding model given a type and parameters
         Args:
-            type (str): wether to use sambastudio embedding model or in local cpu model
-            batch_size (int, optional): batch size for sambastudio model. Defaults to None.
+            type (str): wether to use sambastudio embedding model, a local cpu model, or the local cpu model
+                quantized to int8 ('cpu_fast'), faster at the cost of a small loss of accuracy
+            batch_size (int, optional): batch size for sambastudio and cpu_fast models. Defaults to None.
             coe (bool, optional): whether to use coe model. Defaults to False. only for sambastudio models
             select_expert (str, optional): expert model to be used when coe selected. Defaults to None.
                 only for sambastudio models.
@@ -56,6 +58,10 @@ class APIGateway:
             sambastudio_embeddings_project_id (str, optional): project id for sambastudio model. Defaults to None.
             sambastudio_embeddings_endpoint_id (str, optional): endpoint id for sambastudio model. Defaults to None.
             sambastudio_embeddings_api_key (str, optional): api key for sambastudio model. Defaults to None.
+            cache_dir (str, optional): directory of a persistent cache of the computed embeddings, so texts
+                already embedded by the same model are never sent to it again. Defaults to None, no cache.
+            cache_max_entries (int, optional): max number of cached embeddings. Defaults to 1,000,000.
+            cpu_threads (int, optional): intra-op threads of the cpu_fast model. Defaults to None, one per core.
         Returns:
             langchain embedding model
         """
@@ -80,7 +86,19 @@ class APIGateway:
                 if batch_size is None:
                     batch_size = 32
                 embeddings = SambaStudioEmbeddings(**envs, batch_size=batch_size)
+            model_id = '/'.join(
+                (
+                    'sambastudio',
+                    embeddings.sambastudio_embeddings_base_url,
+                    embeddings.sambastudio_embeddings_project_id,
+                    embeddings.sambastudio_embeddings_endpoint_id,
+                    str(select_expert if coe else ''),
+                )
+            )
         elif type == 'cpu':
+            # imported here so the sentence transformers stack is only loaded when a local model is used
+            from langchain_community.embeddings import HuggingFaceInstructEmbeddings
+
             encode_kwargs = {'normalize_embeddings': NORMALIZE_EMBEDDINGS}
             embedding_model = EMBEDDING_MODEL
             embeddings = HuggingFaceInstructEmbeddings(
@@ -89,9 +107,35 @@ class APIGateway:
                 query_instruction='Represent this sentence for searching relevant passages: ',
                 encode_kwargs=encode_kwargs,
             )
+            model_id = f'cpu/{embedding_model}/normalized={NORMALIZE_EMBEDDINGS}'
+        elif type == 'cpu_fast':
+            # imported here so torch and transformers are only loaded when a local model is used
+            from utils.model_wrappers.cpu_embeddings import QuantizedCPUEmbeddings
+
+            embedding_model = EMBEDDING_MODEL
+            embeddings = QuantizedCPUEmbeddings(
+                model_name=embedding_model,
+                embed_instruction='',  # no instruction is needed for candidate passages
+                query_instruction='Represent this sentence for searching relevant passages: ',
+                normalize_embeddings=NORMALIZE_EMBEDDINGS,
+                intra_op_threads=cpu_threads,
+                batch_size=batch_size or 32,
+            )
+            # int8 vectors differ slightly from the cpu model ones, so they never share cache entries
+            model_id = f'cpu_fast/{embedding_model}/int8/normalized={NORMALIZE_EMBEDDINGS}'
         else:
             raise ValueError(f'{type} is not a valid embedding model type')
 
+        if cache_dir is not None:
+            from utils.model_wrappers.embedding_cache import CachedEmbeddings
+
+            embeddings = CachedEmbeddings(
+                embeddings,
+                model_id=model_id,
+                cache_path=os.path.join(cache_dir, 'embeddings.sqlite'),
+                max_entries=cache_max_entries,
+            )
+
         return embeddings
 
     @staticmethod
@@ -0,0 +1,75 @@
+# Define the script's usage example
+USAGE_EXAMPLE = """
+Example usage:
+
+To compare 200 SambaNovaCloud calls with and without connection reuse against a local stub SSE server:
+python connection_reuse_benchmark.py --calls 200 --tokens 100
+
+Optional arguments:
+- --calls: number of sequential calls per mode (default: 100)
+- --tokens: number of streamed tokens per call (default: 50)
+- --threads: number of threads issuing calls concurrently (default: 1)
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(benchmarks_dir, '..', '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(benchmarks_dir)
+sys.path.append(repo_dir)
+
+from stub_sse_server import StubSSEServer, build_chat_completion_stream
+
+from utils.model_wrappers.langchain_llms import SambaNovaCloud
+
+
+def run_calls(llm: SambaNovaCloud, calls: int, threads: int) -> List[float]:
+    """Invokes the llm several times and returns the latency of every call"""
+
+    def timed_call(_: int) -> float:
+        start_time = time.perf_counter()
+        llm.invoke('benchmark prompt')
+        return time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(timed_call, range(calls)))
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark SambaNovaCloud per-call latency with and without connection reuse',
+        epilog=USAGE_EXAMPLE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--calls', type=int, default=100, help='calls per mode (default: 100)')
+    parser.add_argument('--tokens', type=int, default=50, help='streamed tokens per call (default: 50)')
+    parser.add_argument('--threads', type=int, default=1, help='concurrent calling threads (default: 1)')
+    args = parser.parse_args()
+
+    with StubSSEServer(build_chat_completion_stream(args.tokens)) as server:
+        for keep_alive in (False, True):
+            llm = SambaNovaCloud(sambanova_url=server.url, sambanova_api_key='benchmark', keep_alive=keep_alive)
+            # warm up, so the reuse mode starts with an open connection as in a long running app
+            llm.invoke('warm up')
+            connections_before = server.connections
+            stats = summarize(run_calls(llm, args.calls, args.threads))
+            print(
+                f"keep_alive={keep_alive}: mean {stats['mean_ms']:.2f} ms, p50 {stats['p50_ms']:.2f} ms, "
+                f"p95 {stats['p95_ms']:.2f} ms, {server.connections - connections_before} new connections"
+            )
@@ -0,0 +1,111 @@
+# Define the script's usage example
+USAGE_EXAMPLE = """
+Example usage:
+
+To compare the cpu and cpu_fast embedding backends on a synthetic corpus of 512 passages:
+python cpu_embeddings_benchmark.py --passages 512 --threads 8
+
+To compare them on your own corpus, one passage per line:
+python cpu_embeddings_benchmark.py --corpus-file passages.txt --queries 50 --k 10
+
+Optional arguments:
+- --passages: number of passages of the synthetic corpus (default: 512)
+- --corpus-file: text file with one passage per line to embed instead of the synthetic corpus
+- --queries: number of passages whose first half is used as a query (default: 50)
+- --k: number of retrieved passages the recall is computed on (default: 10)
+- --batch-size: batch size of the cpu_fast backend (default: 32)
+- --threads: intra-op threads of the cpu_fast backend (default: one per core)
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(benchmarks_dir, '..', '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(repo_dir)
+
+import numpy as np
+
+from utils.model_wrappers.api_gateway import APIGateway
+
+TOPICS = ['photosynthesis', 'compound interest', 'the french revolution', 'neural networks', 'plate tectonics']
+CLAUSES = [
+    'is usually introduced with a worked example',
+    'can be explained step by step to beginners',
+    'was studied in depth during the last century',
+    'relies on a few key definitions learners often confuse',
+    'is assessed with short quizzes at the end of each module',
+    'connects to several other subjects of the curriculum',
+]
+
+
+def build_corpus(passages: int, seed: int = 0) -> List[str]:
+    """Builds passages of varying lengths, so the benchmark exercises padding"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(passages):
+        topic = rng.choice(TOPICS)
+        sentences = [f'Passage {i}: {topic} {rng.choice(CLAUSES)}.' for _ in range(rng.randint(1, 12))]
+        corpus.append(' '.join(sentences))
+    return corpus
+
+
+def time_embedding(embeddings, corpus: List[str]) -> Tuple[np.ndarray, float]:
+    """Embeds the corpus and returns the vectors and the elapsed seconds"""
+    start_time = time.perf_counter()
+    vectors = embeddings.embed_documents(corpus)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start_time
+
+
+def top_k(queries: np.ndarray, passages: np.ndarray, k: int) -> np.ndarray:
+    """Returns the indices of the k passages with the highest inner product with each query"""
+    return np.argsort(-(queries @ passages.T), axis=1)[:, :k]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark throughput and retrieval agreement of the cpu_fast embedding backend against cpu',
+        epilog=USAGE_EXAMPLE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--passages', type=int, default=512, help='passages of the synthetic corpus (default: 512)')
+    parser.add_argument('--corpus-file', type=str, default=None, help='text file with one passage per line')
+    parser.add_argument('--queries', type=int, default=50, help='passages used as queries (default: 50)')
+    parser.add_argument('--k', type=int, default=10, help='retrieved passages of the recall (default: 10)')
+    parser.add_argument('--batch-size', type=int, default=32, help='batch size of cpu_fast (default: 32)')
+    parser.add_argument('--threads', type=int, default=None, help='intra-op threads of cpu_fast')
+    args = parser.parse_args()
+
+    if args.corpus_file:
+        with open(args.corpus_file) as corpus_file:
+            corpus = [line.strip() for line in corpus_file if line.strip()]
+    else:
+        corpus = build_corpus(args.passages)
+    query_passages = random.Random(1).sample(corpus, min(args.queries, len(corpus)))
+    queries = [passage[: len(passage) // 2] for passage in query_passages]
+    print(f'{len(corpus)} passages, {len(queries)} queries')
+
+    results = {}
+    for name, kwargs in (
+        ('cpu', {}),
+        ('cpu_fast', {'batch_size': args.batch_size, 'cpu_threads': args.threads}),
+    ):
+        embeddings = APIGateway.load_embedding_model(type=name, **kwargs)
+        # warm up, so the timed run does not include one-off allocations
+        embeddings.embed_documents(corpus[: min(8, len(corpus))])
+        passage_vectors, elapsed = time_embedding(embeddings, corpus)
+        query_vectors = np.asarray([embeddings.embed_query(query) for query in queries], dtype=np.float32)
+        results[name] = (passage_vectors, query_vectors)
+        print(f'{name}: {len(corpus)} passages in {elapsed:.2f}s, {len(corpus) / elapsed:.1f} passages/s')
+
+    # recall@k of the cpu_fast retrieval against the cpu one taken as ground truth
+    reference = top_k(results['cpu'][1], results['cpu'][0], args.k)
+    candidate = top_k(results['cpu_fast'][1], results['cpu_fast'][0], args.k)
+    recall = np.mean([len(set(r) & set(c)) / args.k for r, c in zip(reference, candidate)])
+    similarity = np.mean(np.sum(results['cpu'][0] * results['cpu_fast'][0], axis=1))
+    print(f'cpu_fast recall@{args.k} against cpu: {recall:.3f}, mean cosine similarity of passages: {similarity:.4f}')
@@ -0,0 +1,118 @@
+# Define the script's usage example
+USAGE_EXAMPLE = """
+Example usage:
+
+To measure the SSE parsing throughput on a 10k-event chat completion stream read in 4 KiB chunks:
+python sse_parser_benchmark.py --events 10000 --chunk-size 4096
+
+To replay a recorded stream, e.g. saved with `curl -N ... > stream.sse`:
+python sse_parser_benchmark.py --stream-file stream.sse
+
+Optional arguments:
+- --events: number of content events of the synthetic stream (default: 10000)
+- --chunk-size: bytes per network read fed to the parsers (default: 4096)
+- --repeats: number of timed runs per parser, the best one is reported (default: 5)
+- --stream-file: recorded SSE body to parse instead of the synthetic stream
+
+The sseclient baseline is only run when sseclient-py is installed, the wrappers no longer depend on it:
+pip install sseclient-py==1.8.0
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Iterator, List
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(benchmarks_dir, '..', '..'))
+repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
+sys.path.append(benchmarks_dir)
+sys.path.append(repo_dir)
+
+from stub_sse_server import build_chat_completion_stream
+
+from utils.model_wrappers.sse_parser import SSEParser, iter_sse_events, loads_json, orjson
+
+
+def split_chunks(body: bytes, chunk_size: int) -> List[bytes]:
+    """Splits a stream body in the chunks a client would read from the network"""
+    return [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+def extract_tokens(events: Iterator, loads: Callable) -> int:
+    """Decodes every event as the SambaNovaCloud wrapper does and returns the number of content tokens"""
+    tokens = 0
+    for event in events:
+        if event.data != '[DONE]':
+            data = loads(event.data)
+            if data.get('usage') is None and data['choices'][0]['finish_reason'] is None:
+                tokens += 1
+    return tokens
+
+
+def run_sseclient(chunks: List[bytes]) -> int:
+    import sseclient
+
+    return extract_tokens(sseclient.SSEClient(iter(chunks)).events(), json.loads)
+
+
+def run_sse_parser(chunks: List[bytes]) -> int:
+    return extract_tokens(iter_sse_events(chunks), loads_json)
+
+
+def time_best(fn: Callable[[List[bytes]], int], chunks: List[bytes], repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark server sent events parsing throughput of the streaming wrappers',
+        epilog=USAGE_EXAMPLE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--events', type=int, default=10000, help='content events of the stream (default: 10000)')
+    parser.add_argument('--chunk-size', type=int, default=4096, help='bytes per network read (default: 4096)')
+    parser.add_argument('--repeats', type=int, default=5, help='timed runs per parser (default: 5)')
+    parser.add_argument('--stream-file', type=str, default=None, help='recorded SSE body to parse')
+    args = parser.parse_args()
+
+    if args.stream_file:
+        with open(args.stream_file, 'rb') as stream_file:
+            body = stream_file.read()
+    else:
+        body = build_chat_completion_stream(args.events)
+    chunks = split_chunks(body, args.chunk_size)
+    print(f'stream of {len(body) / 1e6:.2f} MB in {len(chunks)} chunks, json decoder: {"orjson" if orjson else "json"}')
+
+    runs = {'sse_parser': run_sse_parser}
+    try:
+        import sseclient  # noqa: F401
+
+        runs['sseclient'] = run_sseclient
+    except ImportError:
+        print('sseclient-py is not installed, skipping the baseline')
+
+    for name, fn in runs.items():
+        tokens = fn(chunks)
+        elapsed = time_best(fn, chunks, args.repeats)
+        print(
+            f'{name}: {tokens} tokens in {elapsed * 1000:.1f} ms, {tokens / elapsed:,.0f} events/s, '
+            f'{len(body) / elapsed / 1e6:.1f} MB/s'
+        )
+
+    # parse only, without json decoding, to report the per chunk cost of the parser itself
+    sse_parser = SSEParser()
+    for _ in iter_sse_events(chunks, sse_parser):
+        pass
+    stats = sse_parser.stats
+    print(
+        f'sse_parser per chunk: mean {stats.mean_chunk_parse_seconds * 1e6:.1f} us, '
+        f'max {stats.max_chunk_parse_seconds * 1e6:.1f} us, {stats.events_per_second:,.0f} events/s parse only'
+    )
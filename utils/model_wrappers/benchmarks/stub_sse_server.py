@@ -0,0 +1,96 @@
+"""Local stub of the SambaNova Cloud chat completions endpoint streaming server sent events."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+
+def build_chat_completion_stream(num_tokens: int, token: str = 'token ', include_usage: bool = True) -> bytes:
+    """
+    Build the raw server sent events body of a streamed chat completion.
+
+    :param int num_tokens: number of content events
+    :param str token: text of every content event
+    :param bool include_usage: whether to append the final usage event
+    :returns: the SSE body
+    :rtype: bytes
+    """
+    events = []
+    for i in range(num_tokens):
+        chunk = {
+            'id': 'stub',
+            'object': 'chat.completion.chunk',
+            'model': 'stub-model',
+            'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+        }
+        events.append(f'data: {json.dumps(chunk)}\n\n')
+    events.append(
+        'data: '
+        + json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': None})
+        + '\n\n'
+    )
+    if include_usage:
+        usage = {
+            'prompt_tokens': 10,
+            'completion_tokens': num_tokens,
+            'total_tokens': 10 + num_tokens,
+            'time_to_first_token': 0.01,
+            'total_latency': 0.1,
+            'completion_tokens_per_sec': num_tokens / 0.1,
+        }
+        events.append(f'data: {json.dumps({"choices": [], "usage": usage})}\n\n')
+    events.append('data: [DONE]\n\n')
+    return ''.join(events).encode('utf-8')
+
+
+class StubSSEServer:
+    """
+    Threaded HTTP/1.1 server answering every POST with the same SSE body.
+
+    Connections are kept alive between requests, and the number of accepted TCP
+    connections is counted so benchmarks can check whether clients reuse them.
+    """
+
+    def __init__(self, body: bytes, host: str = '127.0.0.1', port: int = 0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self) -> None:
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.body = body
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1/chat/completions'
+
+    def __enter__(self) -> 'StubSSEServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,131 @@
+"""Int8 quantized local CPU embeddings."""
+
+import logging
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class QuantizedCPUEmbeddings(Embeddings):
+    """
+    Local embedding model running int8 dynamically quantized on CPU.
+
+    Produces the same embeddings as `HuggingFaceInstructEmbeddings` for the same model up
+    to quantization error: the instruction is prepended to every text and, as INSTRUCTOR
+    does, the instruction tokens are left out of the mean pooling.
+
+    The linear layers of the model are quantized to int8 with dynamic activation
+    quantization, the intra-op thread pool size can be set, and texts are sorted by
+    token length before batching so every batch is padded to similar lengths.
+
+    Example:
+        .. code-block:: python
+
+            embeddings = QuantizedCPUEmbeddings(
+                model_name='intfloat/e5-large-v2',
+                query_instruction='Represent this sentence for searching relevant passages: ',
+                intra_op_threads=8,
+            )
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        embed_instruction: str = '',
+        query_instruction: str = '',
+        normalize_embeddings: bool = True,
+        quantize: bool = True,
+        intra_op_threads: Optional[int] = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+    ):
+        """
+        :param str model_name: Hugging Face model name or path
+        :param str embed_instruction: instruction prepended to documents
+        :param str query_instruction: instruction prepended to queries
+        :param bool normalize_embeddings: whether to L2 normalize the embeddings
+        :param bool quantize: whether to quantize the linear layers to int8, False runs the model in fp32
+        :param int intra_op_threads: torch intra-op threads, defaults to the torch default (number of cores)
+        :param int batch_size: number of texts per forward pass
+        :param int max_length: max number of tokens per text, longer texts are truncated
+        """
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                'could not import torch or transformers library'
+                'Please install them with `pip install torch transformers`.'
+            )
+        self.model_name = model_name
+        self.embed_instruction = embed_instruction
+        self.query_instruction = query_instruction
+        self.normalize_embeddings = normalize_embeddings
+        self.batch_size = batch_size
+        self.max_length = max_length
+        if intra_op_threads:
+            # process wide setting, shared with any other torch model of the process
+            torch.set_num_threads(intra_op_threads)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model: Any = model
+        logger.info(f'Loaded {model_name} on cpu, quantized={quantize}, threads={torch.get_num_threads()}')
+
+    def _encode(self, texts: List[str], instruction: str) -> List[List[float]]:
+        """Embeds texts prepended with an instruction, in batches of texts of similar token lengths"""
+        import torch
+
+        if not texts:
+            return []
+        # the leading special token and the instruction tokens are masked out of the pooling
+        num_context_tokens = 1 + len(self.tokenizer(instruction, add_special_tokens=False)['input_ids'])
+        encodings = self.tokenizer(
+            [instruction + text for text in texts], truncation=True, max_length=self.max_length
+        )['input_ids']
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i]))
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_indices = order[start : start + self.batch_size]
+                batch = self.tokenizer.pad(
+                    {'input_ids': [encodings[i] for i in batch_indices]}, return_tensors='pt'
+                )
+                hidden_states = self.model(**batch).last_hidden_state
+                pooling_mask = batch['attention_mask'].clone()
+                pooling_mask[:, :num_context_tokens] = 0
+                # texts made only of the instruction fall back to pooling over every token
+                empty = pooling_mask.sum(dim=1) == 0
+                pooling_mask[empty] = batch['attention_mask'][empty]
+                pooling_mask = pooling_mask.unsqueeze(-1).to(hidden_states.dtype)
+                pooled = (hidden_states * pooling_mask).sum(dim=1) / pooling_mask.sum(dim=1)
+                if self.normalize_embeddings:
+                    pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+                for i, embedding in zip(batch_indices, pooled.tolist()):
+                    embeddings[i] = embedding
+        return embeddings  # type: ignore[return-value]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns a list of embeddings for the given texts.
+        Args:
+            texts (`List[str]`): List of texts to encode
+
+        Returns:
+            `List[List[float]]`: List of embeddings for the given texts
+        """
+        return self._encode(texts, self.embed_instruction)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Returns the embedding of a query.
+        Args:
+            text (`str`): query to encode
+
+        Returns:
+            `List[float]`: embedding of the query
+        """
+        return self._encode([text], self.query_instruction)[0]
@@ -0,0 +1,222 @@
+"""Persistent cache of the embeddings computed by any langchain Embeddings model."""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# seconds a last use time is good for, hits of entries used more recently than that are served without a write
+LAST_USED_RESOLUTION = 600
+
+
+def _round_to_float32(vector: List[float]) -> List[float]:
+    """Round a vector to float32 precision, so fresh and cached results of a text are identical"""
+    return array('f', vector).tolist()
+
+
+class EmbeddingStore:
+    """
+    SQLite store of float32 embedding vectors with LRU eviction.
+
+    Vectors are stored as raw float32 blobs keyed by a digest. Hits refresh the last use
+    time of their entries when it is older than `LAST_USED_RESOLUTION`, so repeated hits
+    are plain reads, and once the store holds more than `max_entries` vectors the
+    least recently used ones are evicted down to 90% of the bound. The database runs in
+    WAL mode, so several processes can share the same cache file.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000):
+        """
+        :param str path: path of the SQLite database file
+        :param int max_entries: max number of cached vectors
+        """
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+            self._size = self._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Return the cached vectors of some keys.
+
+        :param keys: keys to look up
+        :returns: dict of the keys found to their vector
+        :rtype: dict
+        """
+        found: Dict[str, List[float]] = {}
+        stale_keys: List[str] = []
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock, self._connection:
+            # stay under the SQLite limit of bound parameters per statement
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i : i + 500]
+                rows = self._connection.execute(
+                    f'SELECT key, vector, last_used FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk,
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                    if now - (last_used or 0) > LAST_USED_RESOLUTION:
+                        stale_keys.append(key)
+            if stale_keys:
+                self._connection.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE key = ?', [(now, key) for key in stale_keys]
+                )
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """
+        Store vectors, evicting the least recently used ones beyond max_entries.
+
+        :param items: dict of key to vector
+        """
+        if not items:
+            return
+        now = time.time()
+        keys = list(items)
+        with self._lock, self._connection:
+            # replaced keys, e.g. written meanwhile by another process, do not grow the store
+            existing = 0
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                existing += self._connection.execute(
+                    f'SELECT COUNT(*) FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchone()[0]
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)',
+                [(key, array('f', vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._size += len(items) - existing
+            if self._size > self.max_entries:
+                # other processes may have written to the same file, so count again before evicting
+                self._size = self._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+                excess = self._size - int(self.max_entries * 0.9)
+                if excess > 0:
+                    self._connection.execute(
+                        'DELETE FROM embeddings WHERE key IN '
+                        '(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)',
+                        (excess,),
+                    )
+                    self._size -= excess
+                    logger.info(f'Evicted {excess} embedding cache entries')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings model wrapper serving already computed vectors from an EmbeddingStore.
+
+    Entries are keyed by (model id, instruction, text hash), so unchanged chunks of a
+    re-ingested corpus and repeated queries are only sent to the model once, while
+    models or instructions never share vectors. Only the cache misses of a call are
+    embedded, in a single call to the wrapped model.
+
+    Example:
+        .. code-block:: python
+
+            embeddings = CachedEmbeddings(
+                SambaStudioEmbeddings(batch_size=32),
+                model_id='sambastudio/e5-large-v2',
+                cache_path='data/embedding_cache/embeddings.sqlite',
+            )
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_id: str,
+        cache_path: str,
+        max_entries: int = 1_000_000,
+        document_instruction: Optional[str] = None,
+        query_instruction: Optional[str] = None,
+    ):
+        """
+        :param Embeddings embeddings: the model computing the cache misses
+        :param str model_id: identifier of the model and its settings, part of every key
+        :param str cache_path: path of the SQLite cache file
+        :param int max_entries: max number of cached vectors
+        :param str document_instruction: instruction prepended to documents by the model,
+            defaults to its `embed_instruction` attribute if any
+        :param str query_instruction: instruction prepended to queries by the model,
+            defaults to its `query_instruction` attribute if any
+        """
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.store = EmbeddingStore(cache_path, max_entries)
+        self.document_instruction = (
+            document_instruction if document_instruction is not None else getattr(embeddings, 'embed_instruction', '')
+        )
+        self.query_instruction = (
+            query_instruction if query_instruction is not None else getattr(embeddings, 'query_instruction', '')
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, instruction: str, text: str) -> str:
+        """Return the cache key of a text embedded with an instruction"""
+        return hashlib.sha256('\0'.join((self.model_id, instruction, text)).encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns the embeddings of the texts, computing only the ones not cached yet.
+        Args:
+            texts (`List[str]`): List of texts to encode
+
+        Returns:
+            `List[List[float]]`: List of embeddings for the given texts
+        """
+        keys = [self._key(self.document_instruction, text) for text in texts]
+        cached = self.store.get_many(keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = {
+                key: _round_to_float32(embedding)
+                for key, embedding in zip(missing, self.embeddings.embed_documents(list(missing.values())))
+            }
+            self.store.put_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Returns the embedding of a query, computing it only if not cached yet.
+        Args:
+            text (`str`): query to encode
+
+        Returns:
+            `List[float]`: embedding of the query
+        """
+        key = self._key(self.query_instruction, text)
+        cached = self.store.get_many([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        embedding = _round_to_float32(self.embeddings.embed_query(text))
+        self.store.put_many({key: embedding})
+        return embedding
@@ -0,0 +1,161 @@
+"""Local embedding models sharded across a pool of worker processes."""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# per worker process model, set by _init_worker
+_worker_embeddings: Optional[Embeddings] = None
+
+
+def _init_worker(embedding_type: str, batch_size: Optional[int], threads_per_worker: int) -> None:
+    """Loads a copy of the model in the worker, limited to its share of the cores"""
+    global _worker_embeddings
+    import torch
+
+    from utils.model_wrappers.api_gateway import APIGateway
+
+    torch.set_num_threads(threads_per_worker)
+    if embedding_type == 'cpu_fast':
+        _worker_embeddings = APIGateway.load_embedding_model(
+            type=embedding_type, batch_size=batch_size, cpu_threads=threads_per_worker
+        )
+    else:
+        _worker_embeddings = APIGateway.load_embedding_model(type=embedding_type)
+
+
+def _embed_shard(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class LocalEmbeddingPool(Embeddings):
+    """
+    Local embedding model running across several worker processes.
+
+    Documents are split in shards of `shard_size` texts embedded by a pool of worker
+    processes, each loading its own copy of the model and running `threads_per_worker`
+    intra-op threads, and the vectors are streamed back in the order of the texts.
+    The pool is started on the first call and kept until `close`. Queries are embedded
+    by a model loaded in the calling process on the first query, so a vector store
+    built with the pool can still be searched once the pool is closed.
+
+    Example:
+        .. code-block:: python
+
+            with LocalEmbeddingPool('cpu', workers=8, threads_per_worker=4) as embeddings:
+                vectors = embeddings.embed_documents(texts)
+    """
+
+    def __init__(
+        self,
+        embedding_type: str = 'cpu',
+        workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        shard_size: int = 64,
+        batch_size: Optional[int] = None,
+    ):
+        """
+        :param str embedding_type: local embedding model type of APIGateway.load_embedding_model, cpu or cpu_fast
+        :param int workers: number of worker processes, defaults to the number of cores over threads_per_worker
+        :param int threads_per_worker: intra-op threads of each worker, defaults to the number of cores over workers
+        :param int shard_size: number of texts sent to a worker at once
+        :param int batch_size: batch size of the cpu_fast model of each worker
+        """
+        if embedding_type not in ('cpu', 'cpu_fast'):
+            raise ValueError(f'{embedding_type} is not a local embedding model type')
+        cpu_count = os.cpu_count() or 1
+        if workers is None:
+            workers = max(1, cpu_count // (threads_per_worker or 4))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, cpu_count // workers)
+        self.embedding_type = embedding_type
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._query_embeddings: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawned rather than forked workers, torch thread pools of the parent are not fork safe
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.embedding_type, self.batch_size, self.threads_per_worker),
+                )
+                logger.info(
+                    f'Started {self.workers} {self.embedding_type} embedding workers '
+                    f'with {self.threads_per_worker} threads each'
+                )
+            return self._executor
+
+    def iter_embed_documents(self, texts: List[str]) -> Iterator[List[List[float]]]:
+        """
+        Embed texts across the workers, yielding the vectors of each shard in order.
+
+        :param texts: texts to embed
+        :returns: iterator over the vectors of consecutive shards of the texts
+        """
+        if not texts:
+            return
+        shards = [texts[i : i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        start_time = time.perf_counter()
+        embedded = 0
+        for vectors in self._get_executor().map(_embed_shard, shards):
+            embedded += len(vectors)
+            logger.debug(f'Embedded {embedded}/{len(texts)} texts')
+            yield vectors
+        elapsed = time.perf_counter() - start_time
+        logger.info(f'Embedded {len(texts)} texts in {elapsed:.1f}s, {len(texts) / elapsed:.1f} texts/s')
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns a list of embeddings for the given texts.
+        Args:
+            texts (`List[str]`): List of texts to encode
+
+        Returns:
+            `List[List[float]]`: List of embeddings for the given texts
+        """
+        return [vector for vectors in self.iter_embed_documents(texts) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Returns the embedding of a query.
+        Args:
+            text (`str`): query to encode
+
+        Returns:
+            `List[float]`: embedding of the query
+        """
+        with self._lock:
+            if self._query_embeddings is None:
+                from utils.model_wrappers.api_gateway import APIGateway
+
+                self._query_embeddings = APIGateway.load_embedding_model(
+                    type=self.embedding_type, batch_size=self.batch_size
+                )
+        return self._query_embeddings.embed_query(text)
+
+    def close(self) -> None:
+        """Shut the worker processes down, they are started again on the next documents"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self) -> 'LocalEmbeddingPool':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
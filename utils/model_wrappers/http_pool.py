@@ -0,0 +1,79 @@
+"""Shared HTTP connection pools for the Sambanova model wrappers."""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_sessions: Dict[Tuple[int, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_shared_session(pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Return the process-wide requests session for a pool configuration.
+
+    The session keeps up to `pool_maxsize` keep-alive connections per host and is
+    shared by every wrapper instance and thread using the same configuration, so
+    consecutive calls skip the TCP and TLS handshakes.
+
+    :param int pool_connections: number of hosts to keep connection pools for
+    :param int pool_maxsize: number of connections kept alive per host
+    :returns: the shared session
+    :rtype: requests.Session
+    """
+    key = (pool_connections, pool_maxsize)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[key] = session
+    return session
+
+
+# aiohttp sessions are bound to the event loop they were created in, so they are kept per loop
+_async_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, Any]]' = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_session(limit: int = 100) -> Any:
+    """
+    Return the aiohttp session shared by every coroutine of the running event loop.
+
+    The session keeps a pool of up to `limit` keep-alive connections, so a single
+    process can drive hundreds of concurrent generations over a bounded number of
+    connections and without a thread per request.
+
+    Sessions are closed by `close_shared_async_sessions`, which should be awaited before
+    the event loop ends, e.g. at the end of the coroutine given to `asyncio.run`.
+
+    :param int limit: maximum number of simultaneous connections
+    :returns: the shared session
+    :rtype: aiohttp.ClientSession
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('could not import aiohttp library' 'Please install it with `pip install aiohttp`.')
+    loop = asyncio.get_running_loop()
+    sessions = _async_sessions.setdefault(loop, {})
+    session = sessions.get(limit)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit))
+        sessions[limit] = session
+    return session
+
+
+async def close_shared_async_sessions() -> None:
+    """Close the aiohttp sessions of the running event loop and release their connections"""
+    sessions = _async_sessions.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        if not session.closed:
+            await session.close()
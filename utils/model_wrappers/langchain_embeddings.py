@@ -1,13 +1,24 @@
 """Langchain Wrapper around Sambanova embedding APIs."""
 
 import json
-from typing import Dict, Generator, List, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 
 import requests
 from langchain_core.embeddings import Embeddings
-from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.pydantic_v1 import BaseModel, PrivateAttr
 from langchain_core.utils import get_from_dict_or_env, pre_init
 
+from utils.model_wrappers.http_pool import get_shared_session
+from utils.model_wrappers.microbatcher import QueryMicrobatcher
+from utils.model_wrappers.rate_limiter import estimate_tokens, get_rate_limiter
+from utils.model_wrappers.resilience import RetryPolicy, request_with_retries
+
+if TYPE_CHECKING:
+    import numpy as np
+
 
 class SambaStudioEmbeddings(BaseModel, Embeddings):
     """SambaNova embedding models.
@@ -66,6 +77,45 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
     batch_size: int = 32
     """Batch size for the embedding models"""
 
+    max_retries: int = 3
+    """max number of retries of a call failing with a connection error, a timeout, a 429 or a 5xx status"""
+
+    connect_timeout: float = 10.0
+    """seconds to wait for a connection to be established"""
+
+    read_timeout: float = 120.0
+    """seconds to wait for response bytes before failing"""
+
+    requests_per_minute: Optional[float] = None
+    """client side max requests per minute of the api key, shared by every wrapper and process using it"""
+
+    tokens_per_minute: Optional[float] = None
+    """client side max estimated tokens per minute of the api key"""
+
+    max_concurrency: int = 4
+    """max number of batches embed_documents keeps in flight at the same time"""
+
+    adaptive_batch_size: bool = False
+    """whether embed_documents adapts the batch size to the observed batch latency"""
+
+    target_batch_latency: float = 2.0
+    """seconds per batch the adaptive batch size aims at"""
+
+    max_batch_size: int = 512
+    """upper bound of the adaptive batch size, which never grows past batch_size either"""
+
+    query_microbatch_window: float = 0.005
+    """max seconds concurrent embed_query calls wait for each other to be sent in a single request, 0 to disable"""
+
+    query_microbatch_max_size: int = 32
+    """max number of queries coalesced in a single request, bounded by batch_size"""
+
+    query_cache_size: int = 1024
+    """number of recent query embeddings kept in memory, 0 to disable"""
+
+    _query_batcher: Optional[QueryMicrobatcher] = PrivateAttr(default=None)
+    _query_batcher_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
     @pre_init
     def validate_environment(cls, values: Dict) -> Dict:
         """Validate that api key and python package exists in environment."""
@@ -109,6 +159,30 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
         tuning_params = json.dumps(tuning_params_dict)
         return tuning_params
 
+    def _get_retry_policy(self) -> RetryPolicy:
+        """
+        Get the timeouts and retries policy of the calls to the endpoint
+
+        Returns:
+            The retry policy.
+        """
+        return RetryPolicy(
+            max_retries=self.max_retries, connect_timeout=self.connect_timeout, read_timeout=self.read_timeout
+        )
+
+    def _acquire_rate_limit(self, texts: List[str]) -> None:
+        """
+        Wait for the rate limiter of the api key, if any, to allow a call embedding the texts
+
+        Args:
+            texts (List[str]): texts embedded by the call
+        """
+        rate_limiter = get_rate_limiter(
+            self.sambastudio_embeddings_api_key, self.requests_per_minute, self.tokens_per_minute
+        )
+        if rate_limiter:
+            rate_limiter.acquire(sum(estimate_tokens(text) for text in texts))
+
     def _get_full_url(self, path: str) -> str:
         """
         Return the full API URL for a given path.
@@ -119,114 +193,230 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
         """
         return f'{self.sambastudio_embeddings_base_url}/{self.sambastudio_embeddings_base_uri}/{path}'  # noqa: E501
 
-    def _iterate_over_batches(self, texts: List[str], batch_size: int) -> Generator:
-        """Generator for creating batches in the embed documents method
+    def _embed_batch(
+        self, http_session: requests.Session, url: str, batch: List[str], params: Dict, retry_policy: RetryPolicy
+    ) -> List[List[float]]:
+        """Sends a single embedding request for a batch of texts
+        Args:
+            http_session (requests.Session): session sending the request
+            url (str): endpoint url
+            batch (List[str]): texts to embed
+            params (Dict): tuning params of the request
+            retry_policy (RetryPolicy): timeouts and retries of the request
+        Returns:
+            List[List[float]]: embeddings of the texts, in the same order
+        """
+        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
+            data = {'inputs': batch, 'params': params}
+            response_key = 'data'
+        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
+            items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)]
+            data = {'items': items, 'params': params}
+            response_key = 'items'
+        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
+            data = {'instances': batch, 'params': params}
+            response_key = 'predictions'
+        else:
+            raise ValueError(
+                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
+            )
+
+        self._acquire_rate_limit(batch)
+        response = request_with_retries(
+            http_session,
+            'POST',
+            url,
+            retry_policy,
+            headers={'key': self.sambastudio_embeddings_api_key},
+            json=data,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(
+                f'Sambanova /complete call failed with status code '
+                f'{response.status_code}.\n Details: {response.text}'
+            )
+        try:
+            embedding = response.json()[response_key]
+        except KeyError:
+            raise KeyError(
+                f"'{response_key}' not found in endpoint response",
+                response.json(),
+            )
+        if response_key == 'items':
+            embedding = [item['value'] for item in embedding]
+        return embedding
+
+    def _next_batch_size(self, batch_size: int, batch_len: int, latency: float) -> int:
+        """Adapts the batch size to the latency of the last batch, aiming at target_batch_latency seconds
         Args:
-            texts (List[str]): list of strings to embed
-            batch_size (int, optional): batch size to be used for the embedding model.
-            Will depend on the RDU endpoint used.
-        Yields:
-            List[str]: list (batch) of strings of size batch size
+            batch_size (int): current batch size
+            batch_len (int): number of texts of the last batch
+            latency (float): seconds the last batch took
+        Returns:
+            int: batch size of the next batches
         """
-        for i in range(0, len(texts), batch_size):
-            yield texts[i : i + batch_size]
+        if latency > self.target_batch_latency:
+            return max(1, batch_size // 2)
+        # batch_size is the largest batch the endpoint accepts, 1 for CoE endpoints
+        upper_bound = min(self.max_batch_size, self.batch_size)
+        # only grow when the batch was full, a short last batch says nothing about larger ones
+        if batch_len == batch_size and batch_size < upper_bound and latency < self.target_batch_latency / 2:
+            return min(upper_bound, batch_size * 2)
+        return batch_size
+
+    def _dispatch_batches(
+        self,
+        texts: List[str],
+        batch_size: int,
+        on_batch: Callable[[int, List[List[float]]], None],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """Embeds texts in batches, keeping up to max_concurrency batches in flight
+
+        With adaptive_batch_size the size of the next batches is halved or doubled, up to
+        batch_size, depending on the latency of the completed ones.
 
-    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        Args:
+            texts (List[str]): texts to embed
+            batch_size (int): initial batch size
+            on_batch (Callable[[int, List[List[float]]], None]): called in the calling thread, in completion
+                order, with the offset of every completed batch in texts and its embeddings
+            progress_callback (Callable[[int, int], None], optional): called with the number of embedded
+                texts and the total number of texts every time a batch completes
+        """
+        max_concurrency = max(1, self.max_concurrency)
+        http_session = get_shared_session(pool_maxsize=max(10, max_concurrency))
+        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
+        params = json.loads(self._get_tuning_params())
+        retry_policy = self._get_retry_policy()
+
+        def timed_embed_batch(batch: List[str]) -> Tuple[List[List[float]], float]:
+            start_time = time.perf_counter()
+            embedding = self._embed_batch(http_session, url, batch, params, retry_policy)
+            return embedding, time.perf_counter() - start_time
+
+        embedded = 0
+        offset = 0
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            in_flight: Dict[Future, Tuple[int, int]] = {}
+            while offset < len(texts) or in_flight:
+                # keep max_concurrency batches in flight, sized with the latest batch size
+                while offset < len(texts) and len(in_flight) < max_concurrency:
+                    batch = texts[offset : offset + batch_size]
+                    in_flight[executor.submit(timed_embed_batch, batch)] = (offset, batch_size)
+                    offset += len(batch)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_offset, submitted_batch_size = in_flight.pop(future)
+                    embedding, latency = future.result()
+                    on_batch(batch_offset, embedding)
+                    embedded += len(embedding)
+                    if self.adaptive_batch_size:
+                        batch_size = self._next_batch_size(submitted_batch_size, len(embedding), latency)
+                    if progress_callback:
+                        progress_callback(embedded, len(texts))
+
+    def embed_documents(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
         """Returns a list of embeddings for the given sentences.
+
+        Up to max_concurrency batches are in flight at the same time, and their results are
+        reassembled in the order of the texts. With adaptive_batch_size the size of the next
+        batches is halved or doubled depending on the latency of the completed ones.
+
         Args:
             texts (`List[str]`): List of texts to encode
             batch_size (`int`): Batch size for the encoding
+            progress_callback (`Callable[[int, int], None]`, optional): called with the number of
+                embedded texts and the total number of texts every time a batch completes
 
         Returns:
             `List[np.ndarray]` or `List[tensor]`: List of embeddings
             for the given sentences
         """
-        if batch_size is None:
-            batch_size = self.batch_size
-        http_session = requests.Session()
-        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
-        params = json.loads(self._get_tuning_params())
-        embeddings = []
-
-        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'inputs': batch, 'params': params}
-                response = http_session.post(
-                    url,
-                    headers={'key': self.sambastudio_embeddings_api_key},
-                    json=data,
-                )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    embedding = response.json()['data']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'data' not found in endpoint response",
-                        response.json(),
-                    )
+        results: Dict[int, List[List[float]]] = {}
+        self._dispatch_batches(texts, batch_size or self.batch_size, results.__setitem__, progress_callback)
+        return [embedding for batch_offset in sorted(results) for embedding in results[batch_offset]]
+
+    def embed_documents_array(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        out: Optional['np.ndarray'] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> 'np.ndarray':
+        """Returns the embeddings of the given texts as a contiguous float32 matrix.
+
+        Every batch is copied into the matrix as soon as it completes, so no list of Python
+        floats is kept for the whole corpus. Pass a preallocated array, e.g. a numpy.memmap,
+        as out to write the embeddings straight into it.
 
-        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)]
-                data = {'items': items, 'params': params}
-                response = http_session.post(
-                    url,
-                    headers={'key': self.sambastudio_embeddings_api_key},
-                    json=data,
-                )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    embedding = [item['value'] for item in response.json()['items']]
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'items' not found in endpoint response",
-                        response.json(),
-                    )
+        Args:
+            texts (`List[str]`): List of texts to encode
+            batch_size (`int`): Batch size for the encoding
+            out (`np.ndarray`, optional): float32 array of shape (len(texts), dimensions) the
+                embeddings are written into. Defaults to None, a new array is allocated.
+            progress_callback (`Callable[[int, int], None]`, optional): called with the number of
+                embedded texts and the total number of texts every time a batch completes
 
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'instances': batch, 'params': params}
-                response = http_session.post(
-                    url,
-                    headers={'key': self.sambastudio_embeddings_api_key},
-                    json=data,
+        Returns:
+            `np.ndarray`: float32 array of shape (len(texts), dimensions), out if given
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('could not import numpy library' 'Please install it with `pip install numpy`.')
+        if out is not None and (out.dtype != np.float32 or out.ndim != 2 or out.shape[0] != len(texts)):
+            raise ValueError(f'out must be a float32 array of shape ({len(texts)}, dimensions), got {out.shape}')
+        matrix = out
+
+        def write_batch(offset: int, embedding: List[List[float]]) -> None:
+            nonlocal matrix
+            batch = np.asarray(embedding, dtype=np.float32)
+            if matrix is None:
+                # the dimensions are only known once the first batch is back
+                matrix = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            matrix[offset : offset + len(batch)] = batch
+
+        self._dispatch_batches(texts, batch_size or self.batch_size, write_batch, progress_callback)
+        if matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return matrix
+
+    def get_query_batcher(self) -> QueryMicrobatcher:
+        """Returns the microbatcher coalescing concurrent embed_query calls, created on first use
+        Returns:
+            QueryMicrobatcher: the microbatcher, its stats() give the queueing delay and batch size histograms
+        """
+        with self._query_batcher_lock:
+            if self._query_batcher is None:
+                url = self._get_full_url(
+                    f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}'
                 )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    if params.get('select_expert'):
-                        embedding = response.json()['predictions']
-                    else:
-                        embedding = response.json()['predictions']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'predictions' not found in endpoint response",
-                        response.json(),
-                    )
+                params = json.loads(self._get_tuning_params())
+                retry_policy = self._get_retry_policy()
 
-        else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
+                def embed_batch(texts: List[str]) -> List[List[float]]:
+                    return self._embed_batch(get_shared_session(), url, texts, params, retry_policy)
 
-        return embeddings
+                self._query_batcher = QueryMicrobatcher(
+                    embed_batch,
+                    window=self.query_microbatch_window,
+                    max_batch_size=max(1, min(self.query_microbatch_max_size, self.batch_size)),
+                    cache_size=self.query_cache_size,
+                )
+            return self._query_batcher
 
     def embed_query(self, text: str) -> List[float]:
         """Returns a list of embeddings for the given sentences.
+
+        Concurrent calls within query_microbatch_window seconds are sent as a single batched
+        request, and recent queries are served from an in-memory LRU.
+
         Args:
             sentences (`List[str]`): List of sentences to encode
 
@@ -234,76 +424,4 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
             `List[np.ndarray]` or `List[tensor]`: List of embeddings
             for the given sentences
         """
-        http_session = requests.Session()
-        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
-        params = json.loads(self._get_tuning_params())
-
-        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            data = {'inputs': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['data'][0]
-            except KeyError:
-                raise KeyError(
-                    "'data' not found in endpoint response",
-                    response.json(),
-                )
-
-        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'items': [{'id': 'item0', 'value': text}], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['items'][0]['value']
-            except KeyError:
-                raise KeyError(
-                    "'items' not found in endpoint response",
-                    response.json(),
-                )
-
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'instances': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                if params.get('select_expert'):
-                    embedding = response.json()['predictions'][0]
-                else:
-                    embedding = response.json()['predictions'][0]
-            except KeyError:
-                raise KeyError(
-                    "'predictions' not found in endpoint response",
-                    response.json(),
-                )
-
-        else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
-
-        return embedding
+        return self.get_query_batcher().embed(text)
@@ -1,15 +1,35 @@
 """Langchain Wrapper around Sambanova LLM APIs."""
 
+import asyncio
 import json
-from typing import Any, Dict, Generator, Iterator, List, Optional, Union
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Generator, Iterator, List, Optional, Union
 
 import requests
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.llms import LLM
-from langchain_core.outputs import GenerationChunk
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
 from langchain_core.pydantic_v1 import Extra
 from langchain_core.utils import get_from_dict_or_env, pre_init
 
+from utils.model_wrappers.http_pool import get_shared_async_session, get_shared_session
+from utils.model_wrappers.rate_limiter import TokenBucketRateLimiter, estimate_tokens, get_rate_limiter
+from utils.model_wrappers.resilience import RetryPolicy, arequest_with_retries, request_with_retries
+from utils.model_wrappers.sse_parser import ParseStats, SSEParser, aiter_sse_events, iter_sse_events, loads_json
+from utils.model_wrappers.usage_metrics import USAGE_METRICS, CallMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def _log_parse_stats(stats: ParseStats) -> None:
+    """Log the time spent parsing a consumed server sent events stream"""
+    logger.debug(
+        f'Parsed {stats.events} events from {stats.chunks} chunks in {stats.parse_seconds * 1000:.2f} ms, '
+        f'max {stats.max_chunk_parse_seconds * 1e6:.1f} us per chunk'
+    )
+
 
 class SSEndpointHandler:
     """
@@ -18,15 +38,25 @@ class SSEndpointHandler:
     :param str host_url: Base URL of the DaaS API service
     """
 
-    def __init__(self, host_url: str, api_base_uri: str):
+    def __init__(
+        self,
+        host_url: str,
+        api_base_uri: str,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    ):
         """
         Initialize the SSEndpointHandler.
 
         :param str host_url: Base URL of the DaaS API service
         :param str api_base_uri: Base URI of the DaaS API service
+        :param RetryPolicy retry_policy: timeouts and retries of the calls, defaults to RetryPolicy()
+        :param TokenBucketRateLimiter rate_limiter: rate limiter consulted before every call, defaults to None
         """
         self.host_url = host_url
         self.api_base_uri = api_base_uri
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
         self.http_session = requests.Session()
 
     def _process_response(self, response: requests.Response) -> Dict:
@@ -61,15 +91,9 @@ class SSEndpointHandler:
     ) -> Generator[Dict, None, None]:
         """Process the streaming response"""
         if 'api/predict/nlp' in self.api_base_uri:
-            try:
-                import sseclient
-            except ImportError:
-                raise ImportError(
-                    'could not import sseclient library' 'Please install it with `pip install sseclient-py`.'
-                )
-            client = sseclient.SSEClient(response)
             close_conn = False
-            for event in client.events():
+            parser = SSEParser()
+            for event in iter_sse_events(response.iter_content(chunk_size=None), parser):
                 if event.event == 'error_event':
                     close_conn = True
                 chunk = {
@@ -78,12 +102,15 @@ class SSEndpointHandler:
                     'status_code': response.status_code,
                 }
                 yield chunk
+            _log_parse_stats(parser.stats)
             if close_conn:
-                client.close()
+                response.close()
         elif 'api/v2/predict/generic' in self.api_base_uri or 'api/predict/generic' in self.api_base_uri:
             try:
                 for line in response.iter_lines():
-                    chunk = json.loads(line)
+                    if not line:
+                        continue
+                    chunk = loads_json(line)
                     if 'status_code' not in chunk:
                         chunk['status_code'] = response.status_code
                     yield chunk
@@ -102,48 +129,92 @@ class SSEndpointHandler:
         """
         return f'{self.host_url}/{self.api_base_uri}/{path}'
 
-    def nlp_predict(
-        self,
-        project: str,
-        endpoint: str,
-        key: str,
-        input: Union[List[str], str],
-        params: Optional[str] = '',
-        stream: bool = False,
-    ) -> Dict:
+    def _get_payload(self, input: Union[List[str], str], params: Optional[str] = '', stream: bool = False) -> Dict:
         """
-        NLP predict using inline input string.
+        Build the request payload for the endpoint uri.
 
-        :param str project: Project ID in which the endpoint exists
-        :param str endpoint: Endpoint ID
-        :param str key: API Key
-        :param str input_str: Input string
+        :param str input: Input string or list of input strings
         :param str params: Input params string
-        :returns: Prediction results
+        :param bool stream: whether the payload is for a streaming request
+        :returns: the request payload
         :type: dict
         """
-        if isinstance(input, str):
-            input = [input]
         if 'api/predict/nlp' in self.api_base_uri:
+            if isinstance(input, str):
+                input = [input]
             if params:
                 data = {'inputs': input, 'params': json.loads(params)}
             else:
                 data = {'inputs': input}
         elif 'api/v2/predict/generic' in self.api_base_uri:
+            if isinstance(input, str):
+                input = [input]
             items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(input)]
             if params:
                 data = {'items': items, 'params': json.loads(params)}
             else:
                 data = {'items': items}
         elif 'api/predict/generic' in self.api_base_uri:
+            if stream:
+                # the streaming generic api takes a single instance
+                if isinstance(input, list):
+                    input = input[0]
+                instances_key = 'instance'
+            else:
+                if isinstance(input, str):
+                    input = [input]
+                instances_key = 'instances'
             if params:
-                data = {'instances': input, 'params': json.loads(params)}
+                data = {instances_key: input, 'params': json.loads(params)}
             else:
-                data = {'instances': input}
+                data = {instances_key: input}
         else:
             raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
-        response = self.http_session.post(
+        return data
+
+    def _estimate_tokens(self, input: Union[List[str], str], params: Optional[str]) -> int:
+        """
+        Estimate the prompt and completion tokens of a call, for rate limiting.
+
+        :param str input: Input string or list of input strings
+        :param str params: Input params string
+        :returns: the estimated number of tokens
+        :type: int
+        """
+        inputs = [input] if isinstance(input, str) else input
+        max_tokens = json.loads(params).get('max_tokens_to_generate') if params else None
+        if isinstance(max_tokens, dict):
+            max_tokens = max_tokens.get('value')
+        return sum(estimate_tokens(item) for item in inputs) + int(max_tokens or 0) * len(inputs)
+
+    def nlp_predict(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+        stream: bool = False,
+    ) -> Dict:
+        """
+        NLP predict using inline input string.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
+        data = self._get_payload(input, params)
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self._estimate_tokens(input, params))
+        response = request_with_retries(
+            self.http_session,
+            'POST',
             self._get_full_url(f'{project}/{endpoint}'),
+            self.retry_policy,
             headers={'key': key},
             json=data,
         )
@@ -168,33 +239,15 @@ class SSEndpointHandler:
         :returns: Prediction results
         :type: dict
         """
-        if 'api/predict/nlp' in self.api_base_uri:
-            if isinstance(input, str):
-                input = [input]
-            if params:
-                data = {'inputs': input, 'params': json.loads(params)}
-            else:
-                data = {'inputs': input}
-        elif 'api/v2/predict/generic' in self.api_base_uri:
-            if isinstance(input, str):
-                input = [input]
-            items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(input)]
-            if params:
-                data = {'items': items, 'params': json.loads(params)}
-            else:
-                data = {'items': items}
-        elif 'api/predict/generic' in self.api_base_uri:
-            if isinstance(input, list):
-                input = input[0]
-            if params:
-                data = {'instance': input, 'params': json.loads(params)}
-            else:
-                data = {'instance': input}
-        else:
-            raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
+        data = self._get_payload(input, params, stream=True)
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self._estimate_tokens(input, params))
         # Streaming output
-        response = self.http_session.post(
+        response = request_with_retries(
+            self.http_session,
+            'POST',
             self._get_full_url(f'stream/{project}/{endpoint}'),
+            self.retry_policy,
             headers={'key': key},
             json=data,
             stream=True,
@@ -202,6 +255,96 @@ class SSEndpointHandler:
         for chunk in self._process_streaming_response(response):
             yield chunk
 
+    async def anlp_predict(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+    ) -> Dict:
+        """
+        Asynchronous NLP predict using inline input string, over the shared aiohttp connection pool.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
+        data = self._get_payload(input, params)
+        if self.rate_limiter:
+            await self.rate_limiter.aacquire(self._estimate_tokens(input, params))
+        session = get_shared_async_session()
+        async with await arequest_with_retries(
+            session,
+            'POST',
+            self._get_full_url(f'{project}/{endpoint}'),
+            self.retry_policy,
+            headers={'key': key},
+            json=data,
+        ) as response:
+            result: Dict[str, Any] = {}
+            try:
+                result = await response.json(content_type=None)
+            except Exception as e:
+                result['detail'] = str(e)
+            if 'status_code' not in result:
+                result['status_code'] = response.status
+            return result
+
+    async def anlp_predict_stream(
+        self,
+        project: str,
+        endpoint: str,
+        key: str,
+        input: Union[List[str], str],
+        params: Optional[str] = '',
+    ) -> AsyncIterator[Dict]:
+        """
+        Asynchronous streaming NLP predict using inline input string, over the shared aiohttp connection pool.
+
+        :param str project: Project ID in which the endpoint exists
+        :param str endpoint: Endpoint ID
+        :param str key: API Key
+        :param str input_str: Input string
+        :param str params: Input params string
+        :returns: Prediction results
+        :type: dict
+        """
+        data = self._get_payload(input, params, stream=True)
+        if self.rate_limiter:
+            await self.rate_limiter.aacquire(self._estimate_tokens(input, params))
+        session = get_shared_async_session()
+        async with await arequest_with_retries(
+            session,
+            'POST',
+            self._get_full_url(f'stream/{project}/{endpoint}'),
+            self.retry_policy,
+            headers={'key': key},
+            json=data,
+        ) as response:
+            if 'api/predict/nlp' in self.api_base_uri:
+                parser = SSEParser()
+                async for event in aiter_sse_events(response.content, parser):
+                    yield {'event': event.event, 'data': event.data, 'status_code': response.status}
+                _log_parse_stats(parser.stats)
+            elif 'api/v2/predict/generic' in self.api_base_uri or 'api/predict/generic' in self.api_base_uri:
+                try:
+                    async for line in response.content:
+                        if not line.strip():
+                            continue
+                        chunk = loads_json(line)
+                        if 'status_code' not in chunk:
+                            chunk['status_code'] = response.status
+                        yield chunk
+                except Exception as e:
+                    raise RuntimeError(f'Error processing streaming response: {e}')
+            else:
+                raise ValueError(f'handling of endpoint uri: {self.api_base_uri} not implemented')
+
 
 class SambaStudio(LLM):
     """
@@ -263,6 +406,27 @@ class SambaStudio(LLM):
     streaming: Optional[bool] = False
     """Streaming flag to get streamed response."""
 
+    max_batch_size: int = 8
+    """max number of prompts packed in a single request to generic v2 endpoints"""
+
+    max_concurrent_batches: int = 4
+    """max number of batch requests in flight at the same time"""
+
+    max_retries: int = 3
+    """max number of retries of a call failing with a connection error, a timeout, a 429 or a 5xx status"""
+
+    connect_timeout: float = 10.0
+    """seconds to wait for a connection to be established"""
+
+    read_timeout: float = 120.0
+    """seconds to wait for response bytes before failing"""
+
+    requests_per_minute: Optional[float] = None
+    """client side max requests per minute of the api key, shared by every wrapper and process using it"""
+
+    tokens_per_minute: Optional[float] = None
+    """client side max estimated prompt and completion tokens per minute of the api key"""
+
     class Config:
         """Configuration for this pydantic object."""
 
@@ -301,6 +465,21 @@ class SambaStudio(LLM):
         values['sambastudio_api_key'] = get_from_dict_or_env(values, 'sambastudio_api_key', 'SAMBASTUDIO_API_KEY')
         return values
 
+    def _get_retry_policy(self) -> RetryPolicy:
+        """Get the timeouts and retries policy of the calls to the endpoint."""
+        return RetryPolicy(
+            max_retries=self.max_retries, connect_timeout=self.connect_timeout, read_timeout=self.read_timeout
+        )
+
+    def _get_endpoint_handler(self) -> SSEndpointHandler:
+        """Get the endpoint handler, with the retry policy and rate limiter of this model."""
+        return SSEndpointHandler(
+            self.sambastudio_base_url,
+            self.sambastudio_base_uri,
+            self._get_retry_policy(),
+            get_rate_limiter(self.sambastudio_api_key, self.requests_per_minute, self.tokens_per_minute),
+        )
+
     def _get_tuning_params(self, stop: Optional[List[str]]) -> str:
         """
         Get the tuning parameters to use when calling the LLM.
@@ -327,28 +506,19 @@ class SambaStudio(LLM):
         tuning_params = json.dumps(tuning_params_dict)
         return tuning_params
 
-    def _handle_nlp_predict(self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str) -> str:
+    def _process_completion_response(self, response: Dict) -> str:
         """
-        Perform an NLP prediction using the SambaStudio endpoint handler.
+        Check the status of an NLP prediction response and extract its completion.
 
         Args:
-            sdk: The SSEndpointHandler to use for the prediction.
-            prompt: The prompt to use for the prediction.
-            tuning_params: The tuning parameters to use for the prediction.
+            response: The response dict returned by the SambaStudio endpoint handler.
 
         Returns:
             The prediction result.
 
         Raises:
-            ValueError: If the prediction fails.
+            RuntimeError: If the prediction failed.
         """
-        response = sdk.nlp_predict(
-            self.sambastudio_project_id,
-            self.sambastudio_endpoint_id,
-            self.sambastudio_api_key,
-            prompt,
-            tuning_params,
-        )
         if response['status_code'] != 200:
             optional_detail = response.get('detail')
             if optional_detail:
@@ -370,6 +540,113 @@ class SambaStudio(LLM):
         else:
             raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri} not implemented')
 
+    def _handle_nlp_predict(self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str) -> str:
+        """
+        Perform an NLP prediction using the SambaStudio endpoint handler.
+
+        Args:
+            sdk: The SSEndpointHandler to use for the prediction.
+            prompt: The prompt to use for the prediction.
+            tuning_params: The tuning parameters to use for the prediction.
+
+        Returns:
+            The prediction result.
+
+        Raises:
+            ValueError: If the prediction fails.
+        """
+        response = sdk.nlp_predict(
+            self.sambastudio_project_id,
+            self.sambastudio_endpoint_id,
+            self.sambastudio_api_key,
+            prompt,
+            tuning_params,
+        )
+        return self._process_completion_response(response)
+
+    def _process_batch_response(self, response: Dict, batch_size: int) -> List[str]:
+        """
+        Check the status of a generic v2 batch prediction response and extract its completions.
+
+        Args:
+            response: The response dict returned by the SambaStudio endpoint handler.
+            batch_size: The number of prompts sent in the batch.
+
+        Returns:
+            The completions, in the order of the prompts of the batch.
+
+        Raises:
+            RuntimeError: If the prediction failed or an item is missing.
+        """
+        if response['status_code'] != 200:
+            raise RuntimeError(
+                f"Sambanova /complete call failed with status code "
+                f"{response['status_code']}.\n Details: {response.get('detail', response)}"
+            )
+        # items are not guaranteed to come back in request order, so they are mapped back by id
+        completions = {item['id']: item['value']['completion'] for item in response['items']}
+        try:
+            return [completions[f'item{i}'] for i in range(batch_size)]
+        except KeyError as e:
+            raise RuntimeError(f'Sambanova /complete response is missing {e} of a batch of {batch_size} items')
+
+    def _split_batches(self, prompts: List[str]) -> List[List[str]]:
+        """Split prompts in consecutive batches of at most max_batch_size prompts."""
+        batch_size = max(1, self.max_batch_size)
+        return [prompts[i : i + batch_size] for i in range(0, len(prompts), batch_size)]
+
+    def _use_batching(self, prompts: List[str]) -> bool:
+        """Whether prompts are packed in batch requests, only generic v2 endpoints take several items per call."""
+        return not self.streaming and len(prompts) > 1 and 'api/v2/predict/generic' in self.sambastudio_base_uri
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Call out to Sambanova's complete endpoint for a list of prompts.
+
+        On generic v2 endpoints the prompts are packed in batches of max_batch_size items,
+        sent concurrently, up to max_concurrent_batches requests at a time.
+        Other endpoints and streaming calls are handled one prompt at a time.
+
+        Args:
+            prompts: The prompts to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The LLMResult with one generation per prompt.
+        """
+        if not self._use_batching(prompts):
+            return super()._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        if stop is not None:
+            raise Exception('stop not implemented')
+        tuning_params = self._get_tuning_params(stop)
+        # the handler and its pooled requests session are shared by the batch threads, as the sessions of
+        # get_shared_session are, so concurrent batches reuse the same keep-alive connections
+        ss_endpoint = self._get_endpoint_handler()
+
+        def predict_batch(batch: List[str]) -> List[str]:
+            response = ss_endpoint.nlp_predict(
+                self.sambastudio_project_id,
+                self.sambastudio_endpoint_id,
+                self.sambastudio_api_key,
+                batch,
+                tuning_params,
+            )
+            return self._process_batch_response(response, len(batch))
+
+        batches = self._split_batches(prompts)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrent_batches, len(batches)))) as executor:
+                completions = [completion for batch in executor.map(predict_batch, batches) for completion in batch]
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+        return LLMResult(generations=[[Generation(text=completion)] for completion in completions])
+
     def _handle_completion_requests(self, prompt: Union[List[str], str], stop: Optional[List[str]]) -> str:
         """
         Perform a prediction using the SambaStudio endpoint handler.
@@ -384,10 +661,50 @@ class SambaStudio(LLM):
         Raises:
             ValueError: If the prediction fails.
         """
-        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri)
+        ss_endpoint = self._get_endpoint_handler()
         tuning_params = self._get_tuning_params(stop)
         return self._handle_nlp_predict(ss_endpoint, prompt, tuning_params)
 
+    def _process_stream_chunk(self, chunk: Dict) -> GenerationChunk:
+        """
+        Check the status of a streamed response chunk and extract its text.
+
+        Args:
+            chunk: The chunk dict returned by the SambaStudio endpoint handler.
+
+        Returns:
+            The GenerationChunk of the streamed text.
+        """
+        if chunk['status_code'] != 200:
+            error = chunk.get('error')
+            if error:
+                optional_code = error.get('code')
+                optional_details = error.get('details')
+                optional_message = error.get('message')
+                raise ValueError(
+                    f"Sambanova /complete call failed with status code "
+                    f"{chunk['status_code']}.\n"
+                    f"Message: {optional_message}\n"
+                    f"Details: {optional_details}\n"
+                    f"Code: {optional_code}\n"
+                )
+            else:
+                raise RuntimeError(
+                    f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+                )
+        if 'api/predict/nlp' in self.sambastudio_base_uri:
+            text = loads_json(chunk['data'])['stream_token']
+        elif 'api/v2/predict/generic' in self.sambastudio_base_uri:
+            text = chunk['result']['items'][0]['value']['stream_token']
+        elif 'api/predict/generic' in self.sambastudio_base_uri:
+            if len(chunk['result']['responses']) > 0:
+                text = chunk['result']['responses'][0]['stream_token']
+            else:
+                text = ''
+        else:
+            raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri}' f'not implemented')
+        return GenerationChunk(text=text)
+
     def _handle_nlp_predict_stream(
         self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str
     ) -> Iterator[GenerationChunk]:
@@ -409,36 +726,7 @@ class SambaStudio(LLM):
             prompt,
             tuning_params,
         ):
-            if chunk['status_code'] != 200:
-                error = chunk.get('error')
-                if error:
-                    optional_code = error.get('code')
-                    optional_details = error.get('details')
-                    optional_message = error.get('message')
-                    raise ValueError(
-                        f"Sambanova /complete call failed with status code "
-                        f"{chunk['status_code']}.\n"
-                        f"Message: {optional_message}\n"
-                        f"Details: {optional_details}\n"
-                        f"Code: {optional_code}\n"
-                    )
-                else:
-                    raise RuntimeError(
-                        f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
-                    )
-            if 'api/predict/nlp' in self.sambastudio_base_uri:
-                text = json.loads(chunk['data'])['stream_token']
-            elif 'api/v2/predict/generic' in self.sambastudio_base_uri:
-                text = chunk['result']['items'][0]['value']['stream_token']
-            elif 'api/predict/generic' in self.sambastudio_base_uri:
-                if len(chunk['result']['responses']) > 0:
-                    text = chunk['result']['responses'][0]['stream_token']
-                else:
-                    text = ''
-            else:
-                raise ValueError(f'handling of endpoint uri: {self.sambastudio_base_uri}' f'not implemented')
-            generated_chunk = GenerationChunk(text=text)
-            yield generated_chunk
+            yield self._process_stream_chunk(chunk)
 
     def _stream(
         self,
@@ -456,7 +744,7 @@ class SambaStudio(LLM):
         Returns:
             The string generated by the model.
         """
-        ss_endpoint = SSEndpointHandler(self.sambastudio_base_url, self.sambastudio_base_uri)
+        ss_endpoint = self._get_endpoint_handler()
         tuning_params = self._get_tuning_params(stop)
         try:
             if self.streaming:
@@ -522,6 +810,139 @@ class SambaStudio(LLM):
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
 
+    async def _ahandle_nlp_predict_stream(
+        self, sdk: SSEndpointHandler, prompt: Union[List[str], str], tuning_params: str
+    ) -> AsyncIterator[GenerationChunk]:
+        """
+        Perform an asynchronous streaming request to the LLM.
+
+        Args:
+            sdk: The SVEndpointHandler to use for the prediction.
+            prompt: The prompt to use for the prediction.
+            tuning_params: The tuning parameters to use for the prediction.
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        async for chunk in sdk.anlp_predict_stream(
+            self.sambastudio_project_id,
+            self.sambastudio_endpoint_id,
+            self.sambastudio_api_key,
+            prompt,
+            tuning_params,
+        ):
+            yield self._process_stream_chunk(chunk)
+
+    async def _astream(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        ss_endpoint = self._get_endpoint_handler()
+        tuning_params = self._get_tuning_params(stop)
+        try:
+            if self.streaming:
+                async for chunk in self._ahandle_nlp_predict_stream(ss_endpoint, prompt, tuning_params):
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text)
+                    yield chunk
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
+    async def _acall(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        if stop is not None:
+            raise Exception('stop not implemented')
+        try:
+            if self.streaming:
+                completion = ''
+                async for chunk in self._astream(prompt=prompt, stop=stop, run_manager=run_manager, **kwargs):
+                    completion += chunk.text
+                return completion
+            ss_endpoint = self._get_endpoint_handler()
+            response = await ss_endpoint.anlp_predict(
+                self.sambastudio_project_id,
+                self.sambastudio_endpoint_id,
+                self.sambastudio_api_key,
+                prompt,
+                self._get_tuning_params(stop),
+            )
+            return self._process_completion_response(response)
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Asynchronously call out to Sambanova's complete endpoint for a list of prompts.
+
+        Same batching as _generate, with the batches sent as concurrent coroutines.
+
+        Args:
+            prompts: The prompts to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The LLMResult with one generation per prompt.
+        """
+        if not self._use_batching(prompts):
+            return await super()._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        if stop is not None:
+            raise Exception('stop not implemented')
+        tuning_params = self._get_tuning_params(stop)
+        ss_endpoint = self._get_endpoint_handler()
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_batches))
+
+        async def predict_batch(batch: List[str]) -> List[str]:
+            async with semaphore:
+                response = await ss_endpoint.anlp_predict(
+                    self.sambastudio_project_id,
+                    self.sambastudio_endpoint_id,
+                    self.sambastudio_api_key,
+                    batch,
+                    tuning_params,
+                )
+            return self._process_batch_response(response, len(batch))
+
+        try:
+            batch_completions = await asyncio.gather(*(predict_batch(batch) for batch in self._split_batches(prompts)))
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+        completions = [completion for batch in batch_completions for completion in batch]
+        return LLMResult(generations=[[Generation(text=completion)] for completion in completions])
+
 
 class SambaNovaCloud(LLM):
     """
@@ -543,6 +964,10 @@ class SambaNovaCloud(LLM):
             stop_tokens = list of stop tokens
             model = model name
         )
+
+    The usage and latency of every call are recorded in
+    ``utils.model_wrappers.usage_metrics.USAGE_METRICS``, tag the calls of a
+    feature with ``llm.invoke(prompt, feature='feature name')``.
     """
 
     sambanova_url: str = ''
@@ -575,6 +1000,30 @@ class SambaNovaCloud(LLM):
     stream_options: dict = {'include_usage': True}
     """stream options, include usage to get generation metrics"""
 
+    keep_alive: bool = True
+    """reuse pooled keep-alive connections across calls and threads, if False a new connection is opened per call"""
+
+    pool_maxsize: int = 10
+    """max number of keep-alive connections kept in the shared pool"""
+
+    async_pool_limit: int = 100
+    """max number of simultaneous connections, so of concurrent streams, of the shared asyncio pool"""
+
+    connect_timeout: float = 10.0
+    """seconds to wait for a connection to be established"""
+
+    read_timeout: float = 120.0
+    """seconds to wait between streamed bytes before failing"""
+
+    max_retries: int = 3
+    """max number of retries of a call failing with a connection error, a timeout, a 429 or a 5xx status"""
+
+    requests_per_minute: Optional[float] = None
+    """client side max requests per minute of the api key, shared by every wrapper and process using it"""
+
+    tokens_per_minute: Optional[float] = None
+    """client side max estimated prompt and completion tokens per minute of the api key"""
+
     class Config:
         """Configuration for this pydantic object."""
 
@@ -610,34 +1059,24 @@ class SambaNovaCloud(LLM):
         values['sambanova_api_key'] = get_from_dict_or_env(values, 'sambanova_api_key', 'SAMBANOVA_API_KEY')
         return values
 
-    def _handle_nlp_predict_stream(
-        self,
-        prompt: Union[List[str], str],
-        stop: List[str],
-    ) -> Iterator[GenerationChunk]:
+    def _get_payload(self, prompt: Union[List[str], str], stop: Optional[List[str]]) -> Dict[str, Any]:
         """
-        Perform a streaming request to the LLM.
+        Build the chat completions request body.
 
         Args:
-            prompt: The prompt to use for the prediction.
+            prompt: The prompt to use for the prediction, a json list of messages or a plain string.
             stop: list of stop tokens
 
         Returns:
-            An iterator of GenerationChunks.
+            The request body.
         """
-        try:
-            import sseclient
-        except ImportError:
-            raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
         try:
             formatted_prompt = json.loads(prompt)
         except:
             formatted_prompt = [{'role': 'user', 'content': prompt}]
-
-        http_session = requests.Session()
         if not stop:
             stop = self.stop_tokens
-        data = {
+        return {
             'messages': formatted_prompt,
             'max_tokens': self.max_tokens,
             'stop': stop,
@@ -648,53 +1087,250 @@ class SambaNovaCloud(LLM):
             'stream': self.stream_api,
             'stream_options': self.stream_options,
         }
-        # Streaming output
-        response = http_session.post(
-            self.sambanova_url,
-            headers={'Authorization': f'Bearer {self.sambanova_api_key}', 'Content-Type': 'application/json'},
-            json=data,
-            stream=True,
+
+    def _get_retry_policy(self) -> RetryPolicy:
+        """Get the timeouts and retries policy of the calls to the endpoint."""
+        return RetryPolicy(
+            max_retries=self.max_retries, connect_timeout=self.connect_timeout, read_timeout=self.read_timeout
+        )
+
+    def _get_rate_limiter(self) -> Optional[TokenBucketRateLimiter]:
+        """Get the rate limiter of the api key, None if it has no limits."""
+        return get_rate_limiter(self.sambanova_api_key, self.requests_per_minute, self.tokens_per_minute)
+
+    def _estimate_tokens(self, prompt: Union[List[str], str]) -> int:
+        """Estimate the prompt and completion tokens of a call, for rate limiting."""
+        return estimate_tokens(prompt if isinstance(prompt, str) else json.dumps(prompt)) + self.max_tokens
+
+    def _get_headers(self) -> Dict[str, str]:
+        """Return the request headers."""
+        return {'Authorization': f'Bearer {self.sambanova_api_key}', 'Content-Type': 'application/json'}
+
+    def _record_usage(
+        self,
+        feature: str,
+        usage: Dict[str, Any],
+        start_time: float,
+        first_token_time: float,
+        completion_chunks: int,
+        parse_stats: Optional[ParseStats] = None,
+    ) -> CallMetrics:
+        """
+        Record the usage and latency of a completed call in the usage metrics registry.
+
+        Args:
+            feature: feature of the app the call was made for.
+            usage: usage event of the stream, empty if the endpoint sent none.
+            start_time: perf_counter time the request was sent at.
+            first_token_time: perf_counter time of the first content chunk, 0 if none was received.
+            completion_chunks: number of content chunks received.
+            parse_stats: stats of the parser of the stream, to record the time spent parsing it.
+
+        Returns:
+            The recorded CallMetrics.
+        """
+        end_time = time.perf_counter()
+        metrics = CallMetrics.from_usage(
+            self.model,
+            feature,
+            usage,
+            time_to_first_token=(first_token_time or end_time) - start_time,
+            total_latency=end_time - start_time,
+            completion_chunks=completion_chunks,
         )
+        if parse_stats is not None:
+            metrics.parse_seconds = parse_stats.parse_seconds
+            metrics.max_chunk_parse_seconds = parse_stats.max_chunk_parse_seconds
+            _log_parse_stats(parse_stats)
+        USAGE_METRICS.record(metrics)
+        return metrics
+
+    def _handle_nlp_predict_stream(
+        self,
+        prompt: Union[List[str], str],
+        stop: List[str],
+        feature: str = 'default',
+    ) -> Iterator[GenerationChunk]:
+        """
+        Perform a streaming request to the LLM.
 
-        client = sseclient.SSEClient(response)
-        close_conn = False
+        Args:
+            prompt: The prompt to use for the prediction.
+            stop: list of stop tokens
+            feature: feature of the app the call is made for, to tag its usage metrics
 
+        Returns:
+            An iterator of GenerationChunks.
+        """
+        if self.keep_alive:
+            http_session = get_shared_session(pool_maxsize=self.pool_maxsize)
+        else:
+            http_session = requests.Session()
+        rate_limiter = self._get_rate_limiter()
+        usage: Dict[str, Any] = {}
+        parser = SSEParser()
+        response: Optional[requests.Response] = None
+        try:
+            if rate_limiter:
+                rate_limiter.acquire(self._estimate_tokens(prompt))
+            # timed from before the request, so latencies include connection, queueing and retries
+            start_time, first_token_time, completion_chunks = time.perf_counter(), 0.0, 0
+            # Streaming output
+            response = request_with_retries(
+                http_session,
+                'POST',
+                self.sambanova_url,
+                self._get_retry_policy(),
+                headers=self._get_headers(),
+                json=self._get_payload(prompt, stop),
+                stream=True,
+            )
+            for generated_chunk in self._process_stream_events(response, usage, parser):
+                if not first_token_time:
+                    first_token_time = time.perf_counter()
+                completion_chunks += 1
+                yield generated_chunk
+        except Exception:
+            USAGE_METRICS.record_error(self.model, feature)
+            raise
+        finally:
+            # release the connection back to the pool, also when the caller stops consuming early
+            if response is not None:
+                response.close()
+            if not self.keep_alive:
+                http_session.close()
+        self._record_usage(feature, usage, start_time, first_token_time, completion_chunks, parser.stats)
+
+    def _process_stream_events(
+        self,
+        response: requests.Response,
+        usage: Optional[Dict[str, Any]] = None,
+        parser: Optional[SSEParser] = None,
+    ) -> Iterator[GenerationChunk]:
+        """
+        Parse the server sent events of a streaming response into GenerationChunks.
+
+        Args:
+            response: the streaming response
+            usage: dict updated with the usage event of the stream, if any
+            parser: parser of the stream, to read its stats once the stream is consumed
+
+        Returns:
+            An iterator of GenerationChunks.
+        """
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
             )
 
-        for event in client.events():
-            if event.event == 'error_event':
-                close_conn = True
-            chunk = {
-                'event': event.event,
-                'data': event.data,
-                'status_code': response.status_code,
-            }
+        for event in iter_sse_events(response.iter_content(chunk_size=None), parser):
+            generated_chunk = self._parse_stream_event(
+                {'event': event.event, 'data': event.data, 'status_code': response.status_code}, usage
+            )
+            if generated_chunk is not None:
+                yield generated_chunk
 
-            if chunk.get('error'):
-                raise RuntimeError(
-                    f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
-                )
+    def _parse_stream_event(
+        self, chunk: Dict[str, Any], usage: Optional[Dict[str, Any]] = None
+    ) -> Optional[GenerationChunk]:
+        """
+        Parse a single server sent event of a streaming response.
 
-            try:
-                # check if the response is a final event in that case event data response is '[DONE]'
-                if chunk['data'] != '[DONE]':
-                    data = json.loads(chunk['data'])
-                    if data.get('error'):
-                        raise RuntimeError(
-                            f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
-                        )
-                    # check if the response is a final response with usage stats (not includes content)
-                    if data.get('usage') is None:
-                        # check is not "end of text" response
-                        if data['choices'][0]['finish_reason'] is None:
-                            text = data['choices'][0]['delta']['content']
-                            generated_chunk = GenerationChunk(text=text)
-                            yield generated_chunk
-            except Exception as e:
-                raise Exception(f'Error getting content chunk raw streamed response: {chunk}')
+        Args:
+            chunk: dict with the `event`, `data` and `status_code` of the event
+            usage: dict updated with the usage stats of the final usage event
+
+        Returns:
+            The GenerationChunk with the generated text, or None for events carrying no content.
+        """
+        if chunk.get('error'):
+            raise RuntimeError(
+                f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+            )
+
+        try:
+            # check if the response is a final event in that case event data response is '[DONE]'
+            if chunk['data'] != '[DONE]':
+                data = loads_json(chunk['data'])
+                if data.get('error'):
+                    raise RuntimeError(
+                        f"Sambanova /complete call failed with status code " f"{chunk['status_code']}." f"{chunk}."
+                    )
+                # check if the response is a final response with usage stats (not includes content)
+                if data.get('usage') is None:
+                    # check is not "end of text" response
+                    if data['choices'][0]['finish_reason'] is None:
+                        text = data['choices'][0]['delta']['content']
+                        return GenerationChunk(text=text)
+                elif usage is not None:
+                    usage.update(data['usage'])
+        except Exception as e:
+            raise Exception(f'Error getting content chunk raw streamed response: {chunk}')
+        return None
+
+    async def _ahandle_nlp_predict_stream(
+        self,
+        prompt: Union[List[str], str],
+        stop: List[str],
+        feature: str = 'default',
+    ) -> AsyncIterator[GenerationChunk]:
+        """
+        Perform an asynchronous streaming request to the LLM.
+
+        Args:
+            prompt: The prompt to use for the prediction.
+            stop: list of stop tokens
+            feature: feature of the app the call is made for, to tag its usage metrics
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('could not import aiohttp library' 'Please install it with `pip install aiohttp`.')
+
+        if self.keep_alive:
+            http_session = get_shared_async_session(self.async_pool_limit)
+        else:
+            http_session = aiohttp.ClientSession()
+        rate_limiter = self._get_rate_limiter()
+        usage: Dict[str, Any] = {}
+        parser = SSEParser()
+        try:
+            if rate_limiter:
+                await rate_limiter.aacquire(self._estimate_tokens(prompt))
+            start_time, first_token_time, completion_chunks = time.perf_counter(), 0.0, 0
+            async with await arequest_with_retries(
+                http_session,
+                'POST',
+                self.sambanova_url,
+                self._get_retry_policy(),
+                headers=self._get_headers(),
+                json=self._get_payload(prompt, stop),
+            ) as response:
+                if response.status != 200:
+                    raise RuntimeError(
+                        f'Sambanova /complete call failed with status code '
+                        f'{response.status}.'
+                        f'{await response.text()}.'
+                    )
+                async for event in aiter_sse_events(response.content, parser):
+                    generated_chunk = self._parse_stream_event(
+                        {'event': event.event, 'data': event.data, 'status_code': response.status}, usage
+                    )
+                    if generated_chunk is not None:
+                        if not first_token_time:
+                            first_token_time = time.perf_counter()
+                        completion_chunks += 1
+                        yield generated_chunk
+        except Exception:
+            USAGE_METRICS.record_error(self.model, feature)
+            raise
+        finally:
+            if not self.keep_alive:
+                await http_session.close()
+        self._record_usage(feature, usage, start_time, first_token_time, completion_chunks, parser.stats)
 
     def _stream(
         self,
@@ -713,7 +1349,7 @@ class SambaNovaCloud(LLM):
             The string generated by the model.
         """
         try:
-            for chunk in self._handle_nlp_predict_stream(prompt, stop):
+            for chunk in self._handle_nlp_predict_stream(prompt, stop, kwargs.get('feature', 'default')):
                 if run_manager:
                     run_manager.on_llm_new_token(chunk.text)
                 yield chunk
@@ -768,3 +1404,49 @@ class SambaNovaCloud(LLM):
         except Exception as e:
             # Handle any errors raised by the inference endpoint
             raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
+    async def _astream(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            An async iterator of GenerationChunks.
+        """
+        try:
+            async for chunk in self._ahandle_nlp_predict_stream(prompt, stop, kwargs.get('feature', 'default')):
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text)
+                yield chunk
+        except Exception as e:
+            # Handle any errors raised by the inference endpoint
+            raise ValueError(f'Error raised by the inference endpoint: {e}') from e
+
+    async def _acall(
+        self,
+        prompt: Union[List[str], str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Asynchronously call out to Sambanova's complete endpoint.
+
+        Args:
+            prompt: The prompt to pass into the model.
+            stop: Optional list of stop words to use when generating.
+
+        Returns:
+            The string generated by the model.
+        """
+        completion = ''
+        async for chunk in self._astream(prompt=prompt, stop=stop, run_manager=run_manager, **kwargs):
+            completion += chunk.text
+        return completion
@@ -0,0 +1,157 @@
+"""Coalescing of concurrent single text embedding calls into batched requests."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.model_wrappers.usage_metrics import Histogram
+
+
+class _PendingBatch:
+    """Texts waiting to be embedded together, and their results once the batch is done"""
+
+    def __init__(self) -> None:
+        self.texts: Dict[str, float] = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Dict[str, List[float]] = {}
+        self.error: Optional[Exception] = None
+
+
+class QueryMicrobatcher:
+    """
+    Embeds single texts through batched calls, with an in-memory LRU of recent results.
+
+    The first caller finding no open batch opens one. When no other batch is being
+    embedded it is dispatched right away, so isolated calls never wait. Otherwise it stays
+    open, while the concurrent callers add their text to it, until the batch being embedded
+    is done, `window` seconds passed or `max_batch_size` distinct texts joined it. The
+    opening caller then embeds the whole batch in one call and every caller picks its own
+    vector from the results. Identical texts of a batch are only embedded once, and recent
+    results are served from the LRU without waiting.
+
+    Queueing delay (seconds from joining a batch to its dispatch) and batch size
+    distributions are kept in `queue_delay` and `batch_size` histograms.
+    """
+
+    def __init__(
+        self,
+        embed_batch_fn: Callable[[List[str]], List[List[float]]],
+        window: float = 0.005,
+        max_batch_size: int = 32,
+        cache_size: int = 1024,
+    ):
+        """
+        :param embed_batch_fn: function embedding a list of texts in a single request
+        :param float window: max seconds a batch stays open for other callers to join while another batch is embedded
+        :param int max_batch_size: max number of distinct texts of a batch
+        :param int cache_size: max number of results kept in the LRU, 0 to disable it
+        """
+        self.embed_batch_fn = embed_batch_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache_size = cache_size
+        self.queue_delay = Histogram()
+        self.batch_size = Histogram()
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._open_batch: Optional[_PendingBatch] = None
+        self._batches_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        embedding = self._cache.get(text)
+        if embedding is not None:
+            self._cache.move_to_end(text)
+        return embedding
+
+    def _cache_put(self, results: Dict[str, List[float]]) -> None:
+        if not self.cache_size:
+            return
+        for text, embedding in results.items():
+            self._cache[text] = embedding
+            self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Embed a single text, joining the batch currently open if any.
+
+        :param str text: text to embed
+        :returns: the embedding of the text
+        :rtype: List[float]
+        """
+        with self._lock:
+            embedding = self._cache_get(text)
+            if embedding is not None:
+                self.hits += 1
+                return list(embedding)
+            self.misses += 1
+            batch = self._open_batch
+            is_leader = batch is None
+            if is_leader:
+                batch = self._open_batch = _PendingBatch()
+                self._batches_in_flight += 1
+            batch.texts.setdefault(text, time.perf_counter())
+            # callers only queue up behind a batch being embedded, the endpoint is called right away when idle
+            if len(batch.texts) >= self.max_batch_size or self._batches_in_flight == 1:
+                # no caller can join a closed batch, the next ones open a new one
+                self._open_batch = None
+                batch.full.set()
+
+        if not is_leader:
+            batch.done.wait()
+        else:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open_batch is batch:
+                    self._open_batch = None
+            self._run_batch(batch)
+
+        if batch.error is not None:
+            raise batch.error
+        if text not in batch.results:
+            raise RuntimeError('embedding batch interrupted before its results were available')
+        return list(batch.results[text])
+
+    def _run_batch(self, batch: _PendingBatch) -> None:
+        """Embed a closed batch and wake up its callers"""
+        dispatch_time = time.perf_counter()
+        texts = list(batch.texts)
+        for joined_at in batch.texts.values():
+            self.queue_delay.observe(dispatch_time - joined_at)
+        self.batch_size.observe(len(texts))
+        try:
+            batch.results = dict(zip(texts, self.embed_batch_fn(texts)))
+            with self._lock:
+                self._cache_put(batch.results)
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self._batches_in_flight -= 1
+                if self._open_batch is not None and self._batches_in_flight == 1:
+                    # only the open batch is left, it is dispatched without waiting the rest of its window
+                    self._open_batch.full.set()
+                    self._open_batch = None
+            batch.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return LRU counters and the queueing delay and batch size distributions.
+
+        :returns: dict of statistics
+        :rtype: dict
+        """
+        with self._lock:
+            cached = len(self._cache)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': cached,
+            'queue_delay': self.queue_delay.summary(),
+            'batch_size': self.batch_size.summary(),
+        }
@@ -0,0 +1,214 @@
+"""Client side rate limiting of the calls made with a Sambanova API key."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks available (Windows), buckets are then only shared by the threads of a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), 'sambanova_rate_limits')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of tokens of a text, about 4 characters per token.
+
+    :param str text: the text
+    :returns: the estimated number of tokens
+    :rtype: int
+    """
+    return len(text) // 4 + 1
+
+
+class TokenBucketRateLimiter:
+    """
+    Requests per minute and tokens per minute limits of an API key.
+
+    Each limit is a token bucket holding up to a minute worth of budget and refilled
+    continuously. The buckets state lives in a small file, named after a hash of the
+    API key, that is locked while being updated, so every thread and every process
+    of the host using the same key and state directory draws from the same budget.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        state_dir: str = DEFAULT_STATE_DIR,
+    ):
+        """
+        :param str api_key: API key the limits apply to, never written to disk
+        :param float requests_per_minute: max requests per minute, None for no limit
+        :param float tokens_per_minute: max estimated prompt and completion tokens per minute, None for no limit
+        :param str state_dir: directory of the buckets state files
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        os.makedirs(state_dir, exist_ok=True)
+        key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        self.state_path = os.path.join(state_dir, f'{key_hash}.json')
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, float]]:
+        """Yield the buckets state, holding the thread and file locks, and save it back on exit"""
+        with self._lock, open(self.state_path, 'a+') as state_file:
+            if fcntl is not None:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                try:
+                    state = json.loads(state_file.read())
+                except ValueError:
+                    # new or corrupted state file, start with full buckets
+                    state = {}
+                yield state
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+                state_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _refill(state: Dict[str, float], name: str, per_minute: float, now: float) -> float:
+        """Return the current level of a bucket, refilled for the time elapsed since its last update"""
+        level = state.get(name, per_minute)
+        elapsed = max(0.0, now - state.get('updated_at', now))
+        return min(per_minute, level + elapsed * per_minute / 60)
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        Take one request and some tokens from the buckets if they are available.
+
+        :param int tokens: estimated tokens of the request
+        :returns: 0 if the budget was taken, otherwise the seconds to wait before it is available
+        :rtype: float
+        """
+        limits: Tuple[Tuple[str, Optional[float], float], ...] = (
+            ('requests', self.requests_per_minute, 1),
+            ('tokens', self.tokens_per_minute, tokens),
+        )
+        with self._locked_state() as state:
+            now = time.time()
+            levels = {}
+            wait = 0.0
+            for name, per_minute, amount in limits:
+                if per_minute:
+                    # a request bigger than a whole bucket would never fit, it waits for a full bucket instead
+                    amount = min(amount, per_minute)
+                    levels[name] = self._refill(state, name, per_minute, now)
+                    if levels[name] < amount:
+                        wait = max(wait, (amount - levels[name]) * 60 / per_minute)
+            if wait == 0.0:
+                for name, per_minute, amount in limits:
+                    if per_minute:
+                        levels[name] -= min(amount, per_minute)
+            state.update(levels)
+            state['updated_at'] = now
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request and some tokens can be taken from the buckets.
+
+        :param int tokens: estimated tokens of the request
+        :returns: the seconds spent waiting
+        :rtype: float
+        """
+        start_time = time.perf_counter()
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                break
+            time.sleep(wait)
+        waited = time.perf_counter() - start_time
+        if waited > 1:
+            logger.info(f'Rate limited, waited {waited:.1f}s')
+        return waited
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """
+        Asynchronous counterpart of `acquire`, waiting without blocking the event loop.
+
+        :param int tokens: estimated tokens of the request
+        :returns: the seconds spent waiting
+        :rtype: float
+        """
+        start_time = time.perf_counter()
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                break
+            await asyncio.sleep(wait)
+        waited = time.perf_counter() - start_time
+        if waited > 1:
+            logger.info(f'Rate limited, waited {waited:.1f}s')
+        return waited
+
+
+_rate_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def configure_rate_limit(
+    api_key: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    state_dir: str = DEFAULT_STATE_DIR,
+) -> TokenBucketRateLimiter:
+    """
+    Set the limits of an API key for every wrapper of the process using it.
+
+    :param str api_key: the API key
+    :param float requests_per_minute: max requests per minute, None for no limit
+    :param float tokens_per_minute: max estimated tokens per minute, None for no limit
+    :param str state_dir: directory of the buckets state files, shared by the processes using the key
+    :returns: the rate limiter of the key
+    :rtype: TokenBucketRateLimiter
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(api_key)
+        if (
+            limiter is None
+            or limiter.requests_per_minute != requests_per_minute
+            or limiter.tokens_per_minute != tokens_per_minute
+            or os.path.dirname(limiter.state_path) != state_dir
+        ):
+            limiter = TokenBucketRateLimiter(api_key, requests_per_minute, tokens_per_minute, state_dir)
+            _rate_limiters[api_key] = limiter
+        return limiter
+
+
+def get_rate_limiter(
+    api_key: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None
+) -> Optional[TokenBucketRateLimiter]:
+    """
+    Return the rate limiter of an API key.
+
+    Limits given here, e.g. from a wrapper fields, override the ones configured for the key.
+
+    :param str api_key: the API key
+    :param float requests_per_minute: max requests per minute, None to use the configured limit
+    :param float tokens_per_minute: max estimated tokens per minute, None to use the configured limit
+    :returns: the rate limiter, or None if the key has no limits
+    :rtype: TokenBucketRateLimiter
+    """
+    if requests_per_minute or tokens_per_minute:
+        return configure_rate_limit(api_key, requests_per_minute, tokens_per_minute)
+    return _rate_limiters.get(api_key)
@@ -0,0 +1,331 @@
+"""Retries, timeouts and circuit breaking for the Sambanova model wrappers HTTP calls."""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the endpoint while its circuit breaker is open"""
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How a call to an endpoint is timed out and retried.
+
+    Connection errors, timeouts and responses with a status in `retry_statuses` are
+    retried up to `max_retries` times. The wait before every retry is the `Retry-After`
+    header of the response when present, capped at `backoff_max` so a server can not block
+    a caller for hours, and a full jitter exponential backoff otherwise, so clients failing
+    together do not retry in lockstep.
+    """
+
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Connect and read timeouts, as taken by requests"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retrying.
+
+        :param int attempt: number of the failed attempt, starting at 0
+        :param float retry_after: delay asked by the server, if any, capped at backoff_max
+        :returns: the delay in seconds
+        :rtype: float
+        """
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a `Retry-After` header, given either in seconds or as an HTTP date.
+
+    :param str value: the header value
+    :returns: the delay in seconds, or None if missing or invalid
+    :rtype: float
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass
+class EndpointMetrics:
+    """Counters of the calls made to an endpoint"""
+
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    retries: int = 0
+    rejected: int = 0
+    state: str = 'closed'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single endpoint.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are
+    rejected without reaching the endpoint. Once `recovery_timeout` seconds have passed
+    a single trial call is let through (half open): its success closes the circuit
+    again, and its failure reopens it for another `recovery_timeout`. A trial cancelled
+    by its caller lets the next call through as a new trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.metrics = EndpointMetrics()
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self.metrics.state
+
+    def allow_request(self) -> bool:
+        """Return whether a call can be made now, counting it as a request or a rejection"""
+        with self._lock:
+            if self.metrics.state == 'open' and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.metrics.state = 'half_open'
+                self._trial_in_flight = False
+            if self.metrics.state == 'open' or (self.metrics.state == 'half_open' and self._trial_in_flight):
+                self.metrics.rejected += 1
+                return False
+            if self.metrics.state == 'half_open':
+                self._trial_in_flight = True
+            self.metrics.requests += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.metrics.successes += 1
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            self.metrics.state = 'closed'
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.metrics.failures += 1
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.metrics.state == 'half_open' or self._consecutive_failures >= self.failure_threshold:
+                if self.metrics.state != 'open':
+                    logger.warning(f'Circuit opened after {self._consecutive_failures} consecutive failures')
+                self.metrics.state = 'open'
+                self._opened_at = time.monotonic()
+
+    def record_busy(self) -> None:
+        """Record a rate limited call, the endpoint is reachable so a half open circuit closes again"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.metrics.state == 'half_open':
+                self.metrics.state = 'closed'
+
+    def record_abandoned(self) -> None:
+        """Record a call cancelled before completing, it says nothing of the endpoint but frees the half open trial"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.metrics.retries += 1
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    Return the process-wide circuit breaker of an endpoint.
+
+    :param str endpoint: endpoint key, usually the request url
+    :returns: the circuit breaker shared by every caller of the endpoint
+    :rtype: CircuitBreaker
+    """
+    breaker = _circuit_breakers.get(endpoint)
+    if breaker is None:
+        with _circuit_breakers_lock:
+            breaker = _circuit_breakers.setdefault(endpoint, CircuitBreaker())
+    return breaker
+
+
+def get_resilience_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Return the call counters and circuit state of every endpoint called so far.
+
+    :returns: dict of endpoint to its metrics
+    :rtype: dict
+    """
+    with _circuit_breakers_lock:
+        breakers = dict(_circuit_breakers)
+    return {endpoint: asdict(breaker.metrics) for endpoint, breaker in breakers.items()}
+
+
+def _is_failure(status: int) -> bool:
+    """Server errors count against the circuit, rate limiting only means the endpoint is busy"""
+    return status >= 500
+
+
+def request_with_retries(
+    session: requests.Session,
+    method: str,
+    url: str,
+    policy: Optional[RetryPolicy] = None,
+    endpoint: Optional[str] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send an HTTP request through the circuit breaker of its endpoint, retrying transient failures.
+
+    For streaming requests, only establishing the response is retried, never a partially
+    consumed stream. The last response is returned when retries are exhausted on a
+    retryable status, so the caller error handling reports it as before.
+
+    :param requests.Session session: session sending the request
+    :param str method: HTTP method
+    :param str url: request url
+    :param RetryPolicy policy: retry and timeout policy, defaults to RetryPolicy()
+    :param str endpoint: circuit breaker key, defaults to the url
+    :param kwargs: extra arguments of `session.request`
+    :returns: the response
+    :rtype: requests.Response
+    :raises CircuitOpenError: if the endpoint circuit is open
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(endpoint or url)
+    kwargs.setdefault('timeout', policy.timeout)
+    for attempt in range(policy.max_retries + 1):
+        if not breaker.allow_request():
+            raise CircuitOpenError(f'circuit open for {endpoint or url}, failing fast')
+        retry_after = None
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure()
+            if attempt == policy.max_retries:
+                raise
+            logger.warning(f'{method} {url} failed with {e!r}, retrying')
+        except Exception:
+            # any other error still settles the call, so a half open circuit never waits for a lost trial
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # cancelled or interrupted by the caller
+            breaker.record_abandoned()
+            raise
+        else:
+            if response.status_code not in policy.retry_statuses:
+                breaker.record_success()
+                return response
+            if _is_failure(response.status_code):
+                breaker.record_failure()
+            else:
+                breaker.record_busy()
+            if attempt == policy.max_retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            response.close()
+            logger.warning(f'{method} {url} returned status {response.status_code}, retrying')
+        breaker.record_retry()
+        time.sleep(policy.backoff(attempt, retry_after))
+    raise AssertionError('unreachable')
+
+
+async def arequest_with_retries(
+    session: Any,
+    method: str,
+    url: str,
+    policy: Optional[RetryPolicy] = None,
+    endpoint: Optional[str] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Asynchronous counterpart of `request_with_retries` for aiohttp sessions.
+
+    The caller owns the returned response and must release it once consumed.
+
+    :param aiohttp.ClientSession session: session sending the request
+    :param str method: HTTP method
+    :param str url: request url
+    :param RetryPolicy policy: retry and timeout policy, defaults to RetryPolicy()
+    :param str endpoint: circuit breaker key, defaults to the url
+    :param kwargs: extra arguments of `session.request`
+    :returns: the response
+    :rtype: aiohttp.ClientResponse
+    :raises CircuitOpenError: if the endpoint circuit is open
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('could not import aiohttp library' 'Please install it with `pip install aiohttp`.')
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(endpoint or url)
+    kwargs.setdefault('timeout', aiohttp.ClientTimeout(connect=policy.connect_timeout, sock_read=policy.read_timeout))
+    for attempt in range(policy.max_retries + 1):
+        if not breaker.allow_request():
+            raise CircuitOpenError(f'circuit open for {endpoint or url}, failing fast')
+        retry_after = None
+        try:
+            response = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            if attempt == policy.max_retries:
+                raise
+            logger.warning(f'{method} {url} failed with {e!r}, retrying')
+        except Exception:
+            # any other error still settles the call, so a half open circuit never waits for a lost trial
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # cancelled or interrupted by the caller
+            breaker.record_abandoned()
+            raise
+        else:
+            if response.status not in policy.retry_statuses:
+                breaker.record_success()
+                return response
+            if _is_failure(response.status):
+                breaker.record_failure()
+            else:
+                breaker.record_busy()
+            if attempt == policy.max_retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            response.release()
+            logger.warning(f'{method} {url} returned status {response.status}, retrying')
+        breaker.record_retry()
+        await asyncio.sleep(policy.backoff(attempt, retry_after))
+    raise AssertionError('unreachable')
@@ -0,0 +1,169 @@
+"""Incremental server sent events parser for the Sambanova streaming APIs."""
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(data: Any) -> Any:
+    """
+    Decode a JSON document, with orjson when it is installed and the standard library otherwise.
+
+    :param data: JSON document as str or bytes
+    :returns: the decoded object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@dataclass
+class ServerSentEvent:
+    """A dispatched server sent event, with the same `event` and `data` attributes as sseclient events"""
+
+    event: str = 'message'
+    data: str = ''
+    id: Optional[str] = None
+
+
+@dataclass
+class ParseStats:
+    """Counters of the work done by a parser, parse times exclude the time spent waiting for the network"""
+
+    chunks: int = 0
+    events: int = 0
+    bytes: int = 0
+    parse_seconds: float = 0.0
+    last_chunk_parse_seconds: float = 0.0
+    max_chunk_parse_seconds: float = 0.0
+
+    @property
+    def mean_chunk_parse_seconds(self) -> float:
+        return self.parse_seconds / self.chunks if self.chunks else 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.parse_seconds if self.parse_seconds else 0.0
+
+
+class SSEParser:
+    """
+    Incremental parser of a server sent events stream.
+
+    Raw bytes are fed as they are read from the connection, in chunks of any size.
+    Only the complete lines of the buffer are decoded, in a single pass per chunk, and
+    the trailing partial line is kept for the next chunk, so events split across reads
+    are reassembled without reading the stream byte by byte.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = b''
+        self._event = 'message'
+        self._data_lines: List[str] = []
+        self._id: Optional[str] = None
+        self.stats = ParseStats()
+
+    def feed(self, chunk: bytes) -> List[ServerSentEvent]:
+        """
+        Parse a chunk of the stream.
+
+        :param bytes chunk: raw bytes read from the stream
+        :returns: the events completed by this chunk
+        :rtype: List[ServerSentEvent]
+        """
+        start_time = time.perf_counter()
+        events: List[ServerSentEvent] = []
+        buffer = self._buffer + chunk if self._buffer else chunk
+        end = buffer.rfind(b'\n')
+        if end == -1:
+            self._buffer = buffer
+        else:
+            # a newline byte is always a utf-8 character boundary, so the complete lines decode safely
+            self._buffer = buffer[end + 1 :]
+            for line in buffer[:end].decode('utf-8').split('\n'):
+                self._process_line(line[:-1] if line.endswith('\r') else line, events)
+
+        elapsed = time.perf_counter() - start_time
+        self.stats.chunks += 1
+        self.stats.events += len(events)
+        self.stats.bytes += len(chunk)
+        self.stats.parse_seconds += elapsed
+        self.stats.last_chunk_parse_seconds = elapsed
+        self.stats.max_chunk_parse_seconds = max(self.stats.max_chunk_parse_seconds, elapsed)
+        return events
+
+    def flush(self) -> List[ServerSentEvent]:
+        """
+        Dispatch the event still pending at the end of the stream, if any.
+
+        :returns: the pending event, if the stream did not end with a blank line
+        :rtype: List[ServerSentEvent]
+        """
+        events: List[ServerSentEvent] = []
+        if self._buffer:
+            line = self._buffer.decode('utf-8').rstrip('\r')
+            self._buffer = b''
+            self._process_line(line, events)
+        self._process_line('', events)
+        self.stats.events += len(events)
+        return events
+
+    def _process_line(self, line: str, events: List[ServerSentEvent]) -> None:
+        """Apply a single line of the stream, appending the event it completes, if any"""
+        if not line:
+            if self._data_lines:
+                events.append(ServerSentEvent(self._event, '\n'.join(self._data_lines), self._id))
+            self._event, self._data_lines = 'message', []
+        elif line[0] == ':':
+            # comment lines are used as keep-alive pings
+            return
+        else:
+            field, _, value = line.partition(':')
+            if value[:1] == ' ':
+                value = value[1:]
+            if field == 'data':
+                self._data_lines.append(value)
+            elif field == 'event':
+                self._event = value
+            elif field == 'id':
+                self._id = value
+
+
+def iter_sse_events(chunks: Iterable[bytes], parser: Optional[SSEParser] = None) -> Iterator[ServerSentEvent]:
+    """
+    Parse server sent events from a stream of byte chunks.
+
+    :param chunks: iterable of raw byte chunks, e.g. `requests.Response.iter_content(chunk_size=None)`
+    :param SSEParser parser: optional parser to use, to read its stats once the stream is consumed
+    :returns: an iterator of the parsed events
+    """
+    parser = parser or SSEParser()
+    for chunk in chunks:
+        if chunk:
+            yield from parser.feed(chunk)
+    yield from parser.flush()
+
+
+async def aiter_sse_events(stream: Any, parser: Optional[SSEParser] = None) -> AsyncIterator[ServerSentEvent]:
+    """
+    Parse server sent events from an asynchronous stream of byte chunks.
+
+    :param stream: an aiohttp `StreamReader`, read chunk by chunk as data arrives,
+        or any async iterable of raw byte chunks
+    :param SSEParser parser: optional parser to use, to read its stats once the stream is consumed
+    :returns: an async iterator of the parsed events
+    """
+    parser = parser or SSEParser()
+    chunks = stream.iter_any() if hasattr(stream, 'iter_any') else stream
+    async for chunk in chunks:
+        if chunk:
+            for event in parser.feed(chunk):
+                yield event
+    for event in parser.flush():
+        yield event
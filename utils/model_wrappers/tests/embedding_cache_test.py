@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Embedding Cache Test Script
+
+This script tests the persistent embedding cache of the model wrappers using unittest.
+
+Test cases:
+    test_vectors_round_trip_as_float32: checks stored vectors are returned at float32 precision
+    test_put_many_counts_only_new_rows: checks replaced keys do not grow the store size
+    test_least_recently_used_entries_are_evicted: checks eviction keeps the most recently used entries
+    test_recent_hits_are_read_only: checks hits only refresh last use times older than the resolution
+    test_cached_embeddings_only_embed_misses: checks the wrapped model only embeds texts not cached yet
+    test_instructions_do_not_share_vectors: checks documents and queries are cached under different keys
+
+Usage:
+    python utils/model_wrappers/tests/embedding_cache_test.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers import embedding_cache
+from utils.model_wrappers.embedding_cache import LAST_USED_RESOLUTION, CachedEmbeddings, EmbeddingStore
+
+
+class _CountingEmbeddings:
+    """Embeds each text as [len(text), 0.5], recording the texts it was called with"""
+
+    embed_instruction = 'passage: '
+    query_instruction = 'query: '
+
+    def __init__(self) -> None:
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.embedded.append(text)
+        return [float(len(text)), 0.5]
+
+
+class EmbeddingCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_path = os.path.join(cache_dir.name, 'embeddings.sqlite')
+        self.now = 1000.0
+        patcher = mock.patch.object(embedding_cache.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def last_used(self, store: EmbeddingStore, key: str) -> float:
+        return store._connection.execute('SELECT last_used FROM embeddings WHERE key = ?', (key,)).fetchone()[0]
+
+    def test_vectors_round_trip_as_float32(self) -> None:
+        store = EmbeddingStore(self.cache_path)
+        store.put_many({'a': [0.1, 0.2]})
+        self.assertEqual(store.get_many(['a', 'b']), {'a': embedding_cache._round_to_float32([0.1, 0.2])})
+
+    def test_put_many_counts_only_new_rows(self) -> None:
+        store = EmbeddingStore(self.cache_path)
+        store.put_many({str(i): [float(i)] for i in range(5)})
+        store.put_many({str(i): [float(i)] for i in range(3, 8)})
+        store.put_many({str(i): [float(i)] for i in range(8)})
+        self.assertEqual(store._size, 8)
+        self.assertEqual(len(store), 8)
+        self.assertEqual(EmbeddingStore(self.cache_path)._size, 8)
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        store = EmbeddingStore(self.cache_path, max_entries=10)
+        for i in range(10):
+            self.now += LAST_USED_RESOLUTION + 1
+            store.put_many({str(i): [float(i)]})
+        # the oldest entry is used again, so it outlives the ones written after it
+        self.now += LAST_USED_RESOLUTION + 1
+        store.get_many(['0'])
+        self.now += 1
+        store.put_many({'10': [10.0]})
+        self.assertEqual(len(store), 9)
+        self.assertEqual(set(store.get_many([str(i) for i in range(11)])), {'0', '10'} | {str(i) for i in range(3, 10)})
+
+    def test_recent_hits_are_read_only(self) -> None:
+        store = EmbeddingStore(self.cache_path)
+        store.put_many({'a': [1.0]})
+        self.now += LAST_USED_RESOLUTION
+        store.get_many(['a'])
+        self.assertEqual(self.last_used(store, 'a'), 1000.0)
+        self.now += 1
+        store.get_many(['a'])
+        self.assertEqual(self.last_used(store, 'a'), self.now)
+
+    def test_cached_embeddings_only_embed_misses(self) -> None:
+        model = _CountingEmbeddings()
+        embeddings = CachedEmbeddings(model, model_id='test/model', cache_path=self.cache_path)
+        self.assertEqual(embeddings.embed_documents(['a', 'bb', 'a']), [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]])
+        self.assertEqual(model.embedded, ['a', 'bb'])
+        embeddings.embed_documents(['bb', 'ccc'])
+        self.assertEqual(model.embedded, ['a', 'bb', 'ccc'])
+        self.assertEqual((embeddings.hits, embeddings.misses), (2, 3))
+        # a new wrapper of the same cache file serves the stored vectors
+        reopened = CachedEmbeddings(_CountingEmbeddings(), model_id='test/model', cache_path=self.cache_path)
+        self.assertEqual(reopened.embed_documents(['ccc']), embeddings.embed_documents(['ccc']))
+        self.assertEqual(reopened.embeddings.embedded, [])
+
+    def test_instructions_do_not_share_vectors(self) -> None:
+        model = _CountingEmbeddings()
+        embeddings = CachedEmbeddings(model, model_id='test/model', cache_path=self.cache_path)
+        embeddings.embed_documents(['photosynthesis'])
+        embeddings.embed_query('photosynthesis')
+        embeddings.embed_query('photosynthesis')
+        self.assertEqual(model.embedded, ['photosynthesis', 'photosynthesis'])
+        other_model = CachedEmbeddings(_CountingEmbeddings(), model_id='other/model', cache_path=self.cache_path)
+        other_model.embed_query('photosynthesis')
+        self.assertEqual(other_model.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
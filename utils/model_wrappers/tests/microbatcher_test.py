@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Query Microbatcher Test Script
+
+This script tests the coalescing of concurrent embedding calls of the model wrappers using unittest.
+
+Test cases:
+    test_isolated_call_is_not_delayed: checks a call made while the endpoint is idle is dispatched right away
+    test_concurrent_calls_are_coalesced: checks calls made during a batch are embedded together, once per text
+    test_errors_reach_every_caller: checks a failed batch raises its error in every caller of the batch
+    test_recent_results_are_cached: checks repeated texts are served from the LRU
+    test_lru_evicts_oldest_results: checks the LRU keeps at most cache_size results
+
+Usage:
+    python utils/model_wrappers/tests/microbatcher_test.py
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.microbatcher import QueryMicrobatcher
+
+TIMEOUT = 5.0
+
+
+class _BlockingEmbedder:
+    """Embeds each text as [len(text)], holding the first batch until released"""
+
+    def __init__(self, fail_after_first: bool = False) -> None:
+        self.batches: List[List[str]] = []
+        self.first_batch_started = threading.Event()
+        self.release_first_batch = threading.Event()
+        self.fail_after_first = fail_after_first
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.first_batch_started.set()
+            self.release_first_batch.wait(TIMEOUT)
+        elif self.fail_after_first:
+            raise ValueError('endpoint error')
+        return [[float(len(text))] for text in texts]
+
+
+class QueryMicrobatcherTestCase(unittest.TestCase):
+    def _embed_concurrently(self, batcher: QueryMicrobatcher, embedder: _BlockingEmbedder, texts: List[str]) -> Dict:
+        """Embeds one text while the others are sent concurrently, returning each caller result or error"""
+        outcomes: Dict = {}
+
+        def embed(index: int, text: str) -> None:
+            try:
+                outcomes[index] = batcher.embed(text)
+            except Exception as e:
+                outcomes[index] = e
+
+        first = threading.Thread(target=embed, args=(-1, 'first'))
+        first.start()
+        self.assertTrue(embedder.first_batch_started.wait(TIMEOUT))
+        threads = [threading.Thread(target=embed, args=(i, text)) for i, text in enumerate(texts)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + TIMEOUT
+        while batcher.misses < len(texts) + 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        embedder.release_first_batch.set()
+        for thread in [first] + threads:
+            thread.join(TIMEOUT)
+        return outcomes
+
+    def test_isolated_call_is_not_delayed(self) -> None:
+        embedder = _BlockingEmbedder()
+        embedder.release_first_batch.set()
+        batcher = QueryMicrobatcher(embedder, window=60.0)
+        start_time = time.perf_counter()
+        self.assertEqual(batcher.embed('alone'), [5.0])
+        self.assertLess(time.perf_counter() - start_time, 1.0)
+        self.assertEqual(batcher.embed('again'), [5.0])
+        self.assertEqual(embedder.batches, [['alone'], ['again']])
+
+    def test_concurrent_calls_are_coalesced(self) -> None:
+        embedder = _BlockingEmbedder()
+        batcher = QueryMicrobatcher(embedder, window=60.0)
+        outcomes = self._embed_concurrently(batcher, embedder, ['a', 'bb', 'a', 'ccc'])
+        self.assertEqual(outcomes, {-1: [5.0], 0: [1.0], 1: [2.0], 2: [1.0], 3: [3.0]})
+        self.assertEqual(len(embedder.batches), 2)
+        self.assertEqual(sorted(embedder.batches[1]), ['a', 'bb', 'ccc'])
+        self.assertEqual(batcher.stats()['batch_size']['count'], 2)
+
+    def test_errors_reach_every_caller(self) -> None:
+        embedder = _BlockingEmbedder(fail_after_first=True)
+        batcher = QueryMicrobatcher(embedder, window=60.0)
+        outcomes = self._embed_concurrently(batcher, embedder, ['a', 'bb', 'ccc'])
+        self.assertEqual(outcomes[-1], [5.0])
+        for i in range(3):
+            self.assertIsInstance(outcomes[i], ValueError)
+        # failed texts are not cached, the next call embeds them again
+        self.assertRaises(ValueError, batcher.embed, 'a')
+
+    def test_recent_results_are_cached(self) -> None:
+        embedder = _BlockingEmbedder()
+        embedder.release_first_batch.set()
+        batcher = QueryMicrobatcher(embedder)
+        batcher.embed('photosynthesis')
+        self.assertEqual(batcher.embed('photosynthesis'), [14.0])
+        self.assertEqual(len(embedder.batches), 1)
+        self.assertEqual((batcher.hits, batcher.misses), (1, 1))
+
+    def test_lru_evicts_oldest_results(self) -> None:
+        embedder = _BlockingEmbedder()
+        embedder.release_first_batch.set()
+        batcher = QueryMicrobatcher(embedder, cache_size=2)
+        for text in ['a', 'b', 'a', 'c', 'b']:
+            batcher.embed(text)
+        self.assertEqual(embedder.batches, [['a'], ['b'], ['c'], ['b']])
+        self.assertEqual(batcher.stats()['cached'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
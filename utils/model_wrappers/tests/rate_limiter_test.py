@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Test Script
+
+This script tests the client side token bucket rate limiter of the model wrappers using unittest.
+
+Test cases:
+    test_requests_bucket_empties_and_refills: checks requests are refused on an empty bucket until it refills
+    test_tokens_bucket: checks the wait for tokens is computed from the missing budget
+    test_oversize_request_waits_for_a_full_bucket: checks a request larger than the bucket waits for a full one
+    test_state_is_shared_by_limiters_of_the_same_key: checks limiters of the same key draw from the same budget
+    test_no_limits: checks limiters without limits never wait
+    test_estimate_tokens: checks the rough token estimate
+
+Usage:
+    python utils/model_wrappers/tests/rate_limiter_test.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers import rate_limiter
+from utils.model_wrappers.rate_limiter import TokenBucketRateLimiter, estimate_tokens
+
+
+class TokenBucketRateLimiterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.state_dir = state_dir.name
+        self.now = 1000.0
+        patcher = mock.patch.object(rate_limiter.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def limiter(self, **kwargs: float) -> TokenBucketRateLimiter:
+        return TokenBucketRateLimiter('test-key', state_dir=self.state_dir, **kwargs)
+
+    def test_requests_bucket_empties_and_refills(self) -> None:
+        limiter = self.limiter(requests_per_minute=60)
+        for _ in range(60):
+            self.assertEqual(limiter.try_acquire(), 0.0)
+        self.assertAlmostEqual(limiter.try_acquire(), 1.0)
+        self.now += 0.5
+        self.assertAlmostEqual(limiter.try_acquire(), 0.5)
+        self.now += 0.5
+        self.assertEqual(limiter.try_acquire(), 0.0)
+        # the bucket never holds more than a minute worth of requests
+        self.now += 3600
+        for _ in range(60):
+            self.assertEqual(limiter.try_acquire(), 0.0)
+        self.assertGreater(limiter.try_acquire(), 0.0)
+
+    def test_tokens_bucket(self) -> None:
+        limiter = self.limiter(tokens_per_minute=600)
+        self.assertEqual(limiter.try_acquire(500), 0.0)
+        # 100 tokens left, 200 missing at 10 tokens per second
+        self.assertAlmostEqual(limiter.try_acquire(300), 20.0)
+        self.now += 20
+        self.assertEqual(limiter.try_acquire(300), 0.0)
+
+    def test_oversize_request_waits_for_a_full_bucket(self) -> None:
+        limiter = self.limiter(tokens_per_minute=600)
+        self.assertEqual(limiter.try_acquire(5000), 0.0)
+        self.assertAlmostEqual(limiter.try_acquire(5000), 60.0)
+        self.now += 30
+        self.assertAlmostEqual(limiter.try_acquire(5000), 30.0)
+        self.now += 30
+        self.assertEqual(limiter.try_acquire(5000), 0.0)
+
+    def test_state_is_shared_by_limiters_of_the_same_key(self) -> None:
+        first = self.limiter(requests_per_minute=2)
+        second = self.limiter(requests_per_minute=2)
+        self.assertEqual(first.try_acquire(), 0.0)
+        self.assertEqual(second.try_acquire(), 0.0)
+        self.assertGreater(first.try_acquire(), 0.0)
+        other_key = TokenBucketRateLimiter('other-key', requests_per_minute=2, state_dir=self.state_dir)
+        self.assertEqual(other_key.try_acquire(), 0.0)
+
+    def test_no_limits(self) -> None:
+        limiter = self.limiter()
+        for _ in range(100):
+            self.assertEqual(limiter.try_acquire(10**6), 0.0)
+
+    def test_estimate_tokens(self) -> None:
+        self.assertEqual(estimate_tokens(''), 1)
+        self.assertEqual(estimate_tokens('x' * 400), 101)
+
+
+if __name__ == '__main__':
+    unittest.main()
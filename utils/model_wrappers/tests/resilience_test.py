@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Resilience Test Script
+
+This script tests the retry policy and the circuit breaker of the model wrappers using unittest.
+
+Test cases:
+    test_backoff_is_jittered_and_capped: checks the exponential backoff stays within its bounds
+    test_retry_after_is_capped: checks a server Retry-After can not exceed backoff_max
+    test_parse_retry_after: checks Retry-After headers in seconds, as dates and invalid ones
+    test_circuit_opens_after_threshold: checks consecutive failures open the circuit
+    test_half_open_trial_success_closes: checks a successful trial closes the circuit
+    test_half_open_trial_failure_reopens: checks a failed trial reopens the circuit
+    test_half_open_lets_a_single_trial_through: checks concurrent calls are rejected during the trial
+    test_trial_raising_unexpected_error_reopens: checks a trial failing with any error does not stay in flight
+    test_cancelled_trial_frees_the_circuit: checks a trial interrupted by the caller lets a new trial through
+    test_open_circuit_fails_fast: checks an open circuit raises without calling the endpoint
+
+Usage:
+    python utils/model_wrappers/tests/resilience_test.py
+"""
+
+import email.utils
+import os
+import sys
+import time
+import unittest
+from typing import Any, List
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers import resilience
+from utils.model_wrappers.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+    request_with_retries,
+)
+
+
+class _Interrupted(BaseException):
+    """Stands for a caller interruption such as KeyboardInterrupt or a task cancellation"""
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.headers: dict = {}
+
+    def close(self) -> None:
+        pass
+
+
+class _FakeSession:
+    """Session returning or raising the given outcomes in turn"""
+
+    def __init__(self, outcomes: List[Any]) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method: str, url: str, **kwargs: Any) -> _FakeResponse:
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return _FakeResponse(outcome)
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def test_backoff_is_jittered_and_capped(self) -> None:
+        policy = RetryPolicy(backoff_base=0.5, backoff_max=4.0)
+        for attempt in range(10):
+            delay = policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(4.0, 0.5 * 2**attempt))
+
+    def test_retry_after_is_capped(self) -> None:
+        policy = RetryPolicy(backoff_max=30.0)
+        self.assertEqual(policy.backoff(0, retry_after=2.0), 2.0)
+        self.assertEqual(policy.backoff(0, retry_after=3600.0), 30.0)
+
+    def test_parse_retry_after(self) -> None:
+        self.assertEqual(parse_retry_after('7'), 7.0)
+        self.assertEqual(parse_retry_after('-3'), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(in_a_minute), 60.0, delta=2.0)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 1000.0
+        patcher = mock.patch.object(resilience.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30.0)
+
+    def _open(self) -> None:
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+
+    def test_circuit_opens_after_threshold(self) -> None:
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.metrics.rejected, 1)
+
+    def test_half_open_trial_success_closes(self) -> None:
+        self._open()
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_half_open_trial_failure_reopens(self) -> None:
+        self._open()
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_open_lets_a_single_trial_through(self) -> None:
+        self._open()
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, 'half_open')
+
+    def test_trial_raising_unexpected_error_reopens(self) -> None:
+        self._open()
+        self.now += 30.0
+        session = _FakeSession([ValueError('bad payload')])
+        with mock.patch.object(resilience, 'get_circuit_breaker', return_value=self.breaker):
+            with self.assertRaises(ValueError):
+                request_with_retries(session, 'POST', 'http://endpoint')
+            self.assertEqual(self.breaker.state, 'open')
+            self.now += 30.0
+            session.outcomes.append(200)
+            self.assertEqual(request_with_retries(session, 'POST', 'http://endpoint').status_code, 200)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_cancelled_trial_frees_the_circuit(self) -> None:
+        self._open()
+        self.now += 30.0
+        session = _FakeSession([_Interrupted(), 200])
+        with mock.patch.object(resilience, 'get_circuit_breaker', return_value=self.breaker):
+            with self.assertRaises(_Interrupted):
+                request_with_retries(session, 'POST', 'http://endpoint')
+            self.assertEqual(self.breaker.state, 'half_open')
+            self.assertEqual(request_with_retries(session, 'POST', 'http://endpoint').status_code, 200)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.metrics.failures, 3)
+
+    def test_open_circuit_fails_fast(self) -> None:
+        self._open()
+        session = _FakeSession([])
+        with mock.patch.object(resilience, 'get_circuit_breaker', return_value=self.breaker):
+            with self.assertRaises(CircuitOpenError):
+                request_with_retries(session, 'POST', 'http://endpoint')
+        self.assertEqual(session.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+SSE Parser Test Script
+
+This script tests the incremental server sent events parser of the model wrappers using unittest.
+
+Test cases:
+    test_events_split_across_chunks: checks events are reassembled whatever the chunk boundaries
+    test_multibyte_characters_split_across_chunks: checks utf-8 characters cut between chunks decode
+    test_done_event: checks the [DONE] terminator is dispatched as a data event
+    test_error_event: checks named error events keep their event type and data
+    test_multiline_data_comments_and_ids: checks data lines are joined, comments skipped and ids kept
+    test_flush_dispatches_unterminated_event: checks the last event is dispatched without a trailing blank line
+    test_async_iteration: checks async byte streams yield the same events
+    test_stats: checks the chunk, event and byte counters
+
+Usage:
+    python utils/model_wrappers/tests/sse_parser_test.py
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from typing import AsyncIterator, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.sse_parser import SSEParser, ServerSentEvent, aiter_sse_events, iter_sse_events, loads_json
+
+STREAM = (
+    b'data: {"choices": [{"delta": {"content": "Hello"}}]}\r\n\r\n'
+    b': keep-alive\n\n'
+    b'data: {"choices": [{"delta": {"content": " world"}}]}\n\n'
+    b'data: [DONE]\n\n'
+)
+
+
+def split_every(data: bytes, size: int) -> List[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class SSEParserTestCase(unittest.TestCase):
+    def test_events_split_across_chunks(self) -> None:
+        expected = list(iter_sse_events([STREAM]))
+        self.assertEqual(len(expected), 3)
+        for size in (1, 2, 3, 7, 16, 64):
+            self.assertEqual(list(iter_sse_events(split_every(STREAM, size))), expected, f'chunks of {size} bytes')
+        contents = [loads_json(event.data)['choices'][0]['delta']['content'] for event in expected[:2]]
+        self.assertEqual(contents, ['Hello', ' world'])
+
+    def test_multibyte_characters_split_across_chunks(self) -> None:
+        stream = 'data: {"content": "photosynthèse ☀"}\n\n'.encode('utf-8')
+        events = list(iter_sse_events(split_every(stream, 1)))
+        self.assertEqual(loads_json(events[0].data), {'content': 'photosynthèse ☀'})
+
+    def test_done_event(self) -> None:
+        events = list(iter_sse_events([STREAM]))
+        self.assertEqual(events[-1], ServerSentEvent('message', '[DONE]'))
+
+    def test_error_event(self) -> None:
+        stream = b'event: error\ndata: {"error": "model overloaded"}\n\ndata: [DONE]\n\n'
+        events = list(iter_sse_events(split_every(stream, 5)))
+        self.assertEqual(events[0].event, 'error')
+        self.assertEqual(loads_json(events[0].data), {'error': 'model overloaded'})
+        # the event type only applies to the event it was sent with
+        self.assertEqual(events[1].event, 'message')
+
+    def test_multiline_data_comments_and_ids(self) -> None:
+        stream = b': ping\nid: 7\ndata: first line\ndata:second line\n\n'
+        events = list(iter_sse_events([stream]))
+        self.assertEqual(events, [ServerSentEvent('message', 'first line\nsecond line', '7')])
+
+    def test_flush_dispatches_unterminated_event(self) -> None:
+        parser = SSEParser()
+        self.assertEqual(parser.feed(b'data: last'), [])
+        self.assertEqual(parser.flush(), [ServerSentEvent('message', 'last')])
+        self.assertEqual(parser.flush(), [])
+
+    def test_async_iteration(self) -> None:
+        async def chunks() -> AsyncIterator[bytes]:
+            for chunk in split_every(STREAM, 9):
+                yield chunk
+
+        async def collect() -> List[ServerSentEvent]:
+            return [event async for event in aiter_sse_events(chunks())]
+
+        self.assertEqual(asyncio.run(collect()), list(iter_sse_events([STREAM])))
+
+    def test_stats(self) -> None:
+        parser = SSEParser()
+        list(iter_sse_events(split_every(STREAM, 10), parser))
+        self.assertEqual(parser.stats.chunks, len(split_every(STREAM, 10)))
+        self.assertEqual(parser.stats.events, 3)
+        self.assertEqual(parser.stats.bytes, len(STREAM))
+        self.assertGreaterEqual(parser.stats.max_chunk_parse_seconds, parser.stats.last_chunk_parse_seconds)
+        self.assertGreaterEqual(parser.stats.parse_seconds, parser.stats.max_chunk_parse_seconds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Usage Metrics Test Script
+
+This script tests the usage and latency metrics of the model wrappers using unittest.
+
+Test cases:
+    test_percentiles: checks nearest rank percentiles, counts and sums of a histogram
+    test_percentiles_cover_recent_samples: checks percentiles only cover the most recent samples
+    test_client_timings_are_kept: checks server reported timings never replace the client measured ones
+    test_missing_usage_falls_back_to_client_counts: checks the streamed chunks stand in for missing token counts
+    test_registry_aggregates_per_label: checks calls, errors and tokens are counted per model and feature
+    test_prometheus_escapes_labels: checks label values are escaped in the Prometheus exposition
+
+Usage:
+    python utils/model_wrappers/tests/usage_metrics_test.py
+"""
+
+import json
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.usage_metrics import CallMetrics, Histogram, UsageMetricsRegistry
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_percentiles(self) -> None:
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(0.5), 0.0)
+        for value in range(1, 101):
+            histogram.observe(float(value))
+        self.assertEqual(histogram.percentile(0.5), 50.0)
+        self.assertEqual(histogram.percentile(0.99), 99.0)
+        self.assertEqual(histogram.percentile(1.0), 100.0)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['sum'], 5050.0)
+        self.assertEqual(summary['mean'], 50.5)
+        self.assertEqual(summary['max'], 100.0)
+        self.assertEqual(summary['p90'], 90.0)
+
+    def test_percentiles_cover_recent_samples(self) -> None:
+        histogram = Histogram(max_samples=10)
+        for value in range(1, 101):
+            histogram.observe(float(value))
+        self.assertEqual(histogram.percentile(0.0), 91.0)
+        self.assertEqual(histogram.count, 100)
+
+
+class CallMetricsTestCase(unittest.TestCase):
+    def test_client_timings_are_kept(self) -> None:
+        usage = {
+            'prompt_tokens': 10,
+            'completion_tokens': 40,
+            'total_tokens': 50,
+            'time_to_first_token': 0.2,
+            'total_latency': 1.0,
+            'completion_tokens_per_sec': 50.0,
+        }
+        metrics = CallMetrics.from_usage('llama', 'lesson', usage, 0.5, 2.0, completion_chunks=38)
+        self.assertEqual(metrics.time_to_first_token, 0.5)
+        self.assertEqual(metrics.total_latency, 2.0)
+        self.assertEqual(metrics.server_time_to_first_token, 0.2)
+        self.assertEqual(metrics.server_total_latency, 1.0)
+        self.assertEqual(metrics.completion_tokens, 40)
+        self.assertEqual(metrics.completion_tokens_per_sec, 50.0)
+
+    def test_missing_usage_falls_back_to_client_counts(self) -> None:
+        metrics = CallMetrics.from_usage('llama', 'lesson', {}, 0.5, 2.5, completion_chunks=30)
+        self.assertEqual(metrics.completion_tokens, 30)
+        self.assertEqual(metrics.total_tokens, 30)
+        self.assertEqual(metrics.completion_tokens_per_sec, 15.0)
+        self.assertEqual(metrics.server_total_latency, 0.0)
+
+
+class UsageMetricsRegistryTestCase(unittest.TestCase):
+    def test_registry_aggregates_per_label(self) -> None:
+        registry = UsageMetricsRegistry()
+        registry.record(CallMetrics('llama', 'lesson', prompt_tokens=10, completion_tokens=20, total_latency=1.0))
+        registry.record(CallMetrics('llama', 'lesson', prompt_tokens=5, completion_tokens=5, total_latency=3.0))
+        registry.record(CallMetrics('llama', 'quiz', prompt_tokens=1, completion_tokens=1))
+        registry.record_error('llama', 'lesson')
+        entries = {entry['feature']: entry for entry in registry.snapshot()}
+        self.assertEqual(entries['lesson']['calls'], 2)
+        self.assertEqual(entries['lesson']['errors'], 1)
+        self.assertEqual(entries['lesson']['prompt_tokens'], 15)
+        self.assertEqual(entries['lesson']['completion_tokens'], 25)
+        self.assertEqual(entries['lesson']['total_latency']['max'], 3.0)
+        # calls without server timings are left out of the server distributions
+        self.assertEqual(entries['lesson']['server_total_latency']['count'], 0)
+        self.assertEqual(entries['quiz']['calls'], 1)
+        document = json.loads(registry.to_json(include_recent_calls=True))
+        self.assertEqual(len(document['recent_calls']), 3)
+        registry.reset()
+        self.assertEqual(registry.snapshot(), [])
+
+    def test_prometheus_escapes_labels(self) -> None:
+        registry = UsageMetricsRegistry()
+        registry.record(CallMetrics('say "hi"\\now', 'multi\nline', completion_tokens=3, total_latency=1.5))
+        exposition = registry.to_prometheus(prefix='test')
+        labels = 'model="say \\"hi\\"\\\\now",feature="multi\\nline"'
+        self.assertIn(f'test_calls_total{{{labels}}} 1', exposition)
+        self.assertIn(f'test_completion_tokens_total{{{labels}}} 3', exposition)
+        self.assertIn(f'test_total_latency_seconds{{{labels},quantile="0.5"}} 1.5', exposition)
+        self.assertIn(f'test_total_latency_seconds_count{{{labels}}} 1', exposition)
+        self.assertIn('# TYPE test_server_total_latency_seconds summary', exposition)
+        self.assertTrue(exposition.endswith('\n'))
+        self.assertEqual(len(exposition.splitlines()), len([line for line in exposition.splitlines() if line]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,327 @@
+"""In-process usage and latency metrics of the Sambanova model wrappers calls."""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Tuple
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _nearest_rank(sorted_samples: List[float], q: float) -> float:
+    """Return the nearest rank percentile of sorted samples, 0 if there are none"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, math.ceil(q * len(sorted_samples)) - 1))]
+
+
+class Histogram:
+    """
+    Distribution of an observed value.
+
+    The count and sum cover every observation, while percentiles are computed over the
+    `max_samples` most recent ones, which bounds memory in long running processes.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            self._samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        """
+        Return a nearest rank percentile of the recent observations.
+
+        :param float q: quantile between 0 and 1
+        :returns: the percentile, 0 if nothing was observed
+        :rtype: float
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        return _nearest_rank(samples, q)
+
+    def summary(self, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """
+        Return the count, sum, mean, max and percentiles of the distribution.
+
+        :param quantiles: quantiles to report
+        :returns: dict of statistic name to value, percentiles named like `p50`
+        :rtype: dict
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            summary = {
+                'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else 0.0,
+                'max': self.max,
+            }
+        for q in quantiles:
+            summary[f'p{q * 100:g}'] = _nearest_rank(samples, q)
+        return summary
+
+
+@dataclass
+class CallMetrics:
+    """
+    Usage and latency of a single model call.
+
+    Token counts are the ones reported by the server when available. Latencies are client
+    measured, so they include the network and queueing time seen by the app, and the server
+    reported ones are kept apart in the `server_` fields, 0 when not reported.
+    """
+
+    model: str
+    feature: str = 'default'
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    time_to_first_token: float = 0.0
+    total_latency: float = 0.0
+    server_time_to_first_token: float = 0.0
+    server_total_latency: float = 0.0
+    completion_tokens_per_sec: float = 0.0
+    parse_seconds: float = 0.0
+    max_chunk_parse_seconds: float = 0.0
+    timestamp: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_usage(
+        cls,
+        model: str,
+        feature: str,
+        usage: Dict[str, Any],
+        time_to_first_token: float,
+        total_latency: float,
+        completion_chunks: int,
+    ) -> 'CallMetrics':
+        """
+        Build the metrics of a streamed call from the usage event of the stream.
+
+        Client side measurements are used for the token counts and throughput missing in the
+        usage event, e.g. when the endpoint does not support `stream_options`. The server
+        timings of the usage event are kept next to the client ones, never in their place.
+
+        :param str model: model name
+        :param str feature: feature of the app the call was made for
+        :param dict usage: usage event of the stream, may be empty
+        :param float time_to_first_token: client measured seconds to the first streamed chunk
+        :param float total_latency: client measured seconds to the end of the stream
+        :param int completion_chunks: number of streamed content chunks
+        :returns: the call metrics
+        :rtype: CallMetrics
+        """
+        completion_tokens = usage.get('completion_tokens') or completion_chunks
+        decode_time = total_latency - time_to_first_token
+        return cls(
+            model=model,
+            feature=feature,
+            prompt_tokens=usage.get('prompt_tokens') or 0,
+            completion_tokens=completion_tokens,
+            total_tokens=usage.get('total_tokens') or (usage.get('prompt_tokens') or 0) + completion_tokens,
+            time_to_first_token=time_to_first_token,
+            total_latency=total_latency,
+            server_time_to_first_token=usage.get('time_to_first_token') or 0.0,
+            server_total_latency=usage.get('total_latency') or 0.0,
+            completion_tokens_per_sec=usage.get('completion_tokens_per_sec')
+            or (completion_tokens / decode_time if decode_time > 0 else 0.0),
+        )
+
+
+class _LabelMetrics:
+    """Counters and distributions of the calls sharing a (model, feature) label set"""
+
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.time_to_first_token = Histogram(max_samples)
+        self.total_latency = Histogram(max_samples)
+        self.server_time_to_first_token = Histogram(max_samples)
+        self.server_total_latency = Histogram(max_samples)
+        self.completion_tokens_per_sec = Histogram(max_samples)
+        self.parse_seconds = Histogram(max_samples)
+        self.max_chunk_parse_seconds = Histogram(max_samples)
+
+
+class UsageMetricsRegistry:
+    """
+    Aggregates call metrics per model and feature.
+
+    Token counters support cost tracking, time to first token, latency, throughput and
+    stream parsing time distributions support latency tracking, and both can be exported
+    as JSON or in the Prometheus text exposition format.
+    """
+
+    def __init__(self, max_samples: int = 10000, max_recent_calls: int = 100):
+        self.max_samples = max_samples
+        self._labels: Dict[Tuple[str, str], _LabelMetrics] = {}
+        self._recent_calls: Deque[CallMetrics] = deque(maxlen=max_recent_calls)
+        self._lock = threading.Lock()
+
+    def _get_label(self, model: str, feature: str) -> _LabelMetrics:
+        with self._lock:
+            label = self._labels.get((model, feature))
+            if label is None:
+                label = self._labels[(model, feature)] = _LabelMetrics(self.max_samples)
+            return label
+
+    def record(self, metrics: CallMetrics) -> None:
+        """
+        Record a completed call.
+
+        :param CallMetrics metrics: metrics of the call
+        """
+        label = self._get_label(metrics.model, metrics.feature)
+        with self._lock:
+            label.calls += 1
+            label.prompt_tokens += metrics.prompt_tokens
+            label.completion_tokens += metrics.completion_tokens
+            self._recent_calls.append(metrics)
+        label.time_to_first_token.observe(metrics.time_to_first_token)
+        label.total_latency.observe(metrics.total_latency)
+        # only the calls whose usage event reported them
+        if metrics.server_time_to_first_token:
+            label.server_time_to_first_token.observe(metrics.server_time_to_first_token)
+        if metrics.server_total_latency:
+            label.server_total_latency.observe(metrics.server_total_latency)
+        label.completion_tokens_per_sec.observe(metrics.completion_tokens_per_sec)
+        label.parse_seconds.observe(metrics.parse_seconds)
+        label.max_chunk_parse_seconds.observe(metrics.max_chunk_parse_seconds)
+
+    def record_error(self, model: str, feature: str = 'default') -> None:
+        """
+        Record a failed call.
+
+        :param str model: model name
+        :param str feature: feature of the app the call was made for
+        """
+        label = self._get_label(model, feature)
+        with self._lock:
+            label.errors += 1
+
+    def recent_calls(self) -> List[CallMetrics]:
+        """Return the metrics of the most recent calls, oldest first"""
+        with self._lock:
+            return list(self._recent_calls)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Return the aggregated metrics of every (model, feature) label set.
+
+        :returns: list of dicts with the labels, counters and distribution summaries
+        :rtype: list
+        """
+        with self._lock:
+            labels = list(self._labels.items())
+        return [
+            {
+                'model': model,
+                'feature': feature,
+                'calls': label.calls,
+                'errors': label.errors,
+                'prompt_tokens': label.prompt_tokens,
+                'completion_tokens': label.completion_tokens,
+                'time_to_first_token': label.time_to_first_token.summary(),
+                'total_latency': label.total_latency.summary(),
+                'server_time_to_first_token': label.server_time_to_first_token.summary(),
+                'server_total_latency': label.server_total_latency.summary(),
+                'completion_tokens_per_sec': label.completion_tokens_per_sec.summary(),
+                'parse_seconds': label.parse_seconds.summary(),
+                'max_chunk_parse_seconds': label.max_chunk_parse_seconds.summary(),
+            }
+            for (model, feature), label in labels
+        ]
+
+    def to_json(self, include_recent_calls: bool = False) -> str:
+        """
+        Export the aggregated metrics as JSON.
+
+        :param bool include_recent_calls: whether to include the metrics of the most recent calls
+        :returns: the JSON document
+        :rtype: str
+        """
+        document: Dict[str, Any] = {'metrics': self.snapshot()}
+        if include_recent_calls:
+            document['recent_calls'] = [asdict(call) for call in self.recent_calls()]
+        return json.dumps(document)
+
+    def to_prometheus(self, prefix: str = 'sambanova_llm') -> str:
+        """
+        Export the aggregated metrics in the Prometheus text exposition format.
+
+        Counters are exported as `_total` counters and distributions as summaries.
+
+        :param str prefix: prefix of the metric names
+        :returns: the exposition text
+        :rtype: str
+        """
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        for name, help_text in (
+            ('calls', 'Completed model calls'),
+            ('errors', 'Failed model calls'),
+            ('prompt_tokens', 'Prompt tokens of the completed calls'),
+            ('completion_tokens', 'Completion tokens of the completed calls'),
+        ):
+            lines.append(f'# HELP {prefix}_{name}_total {help_text}')
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            for entry in snapshot:
+                lines.append(f'{prefix}_{name}_total{{{_labels(entry)}}} {entry[name]}')
+        for name, help_text in (
+            ('time_to_first_token', 'Client measured seconds to the first streamed token'),
+            ('total_latency', 'Client measured seconds to the end of the call'),
+            ('server_time_to_first_token', 'Server reported seconds to the first token'),
+            ('server_total_latency', 'Server reported seconds to the end of the call'),
+            ('completion_tokens_per_sec', 'Completion tokens per second of decoding'),
+            ('parse_seconds', 'Seconds spent parsing the server sent events of a streamed call'),
+            ('max_chunk_parse_seconds', 'Longest parse of a single network chunk of a streamed call'),
+        ):
+            suffix = '_seconds' if name.endswith(('time_to_first_token', 'total_latency')) else ''
+            metric = f'{prefix}_{name}{suffix}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} summary')
+            for entry in snapshot:
+                summary = entry[name]
+                for q in DEFAULT_QUANTILES:
+                    lines.append(f'{metric}{{{_labels(entry)},quantile="{q:g}"}} {summary[f"p{q * 100:g}"]}')
+                lines.append(f'{metric}_sum{{{_labels(entry)}}} {summary["sum"]}')
+                lines.append(f'{metric}_count{{{_labels(entry)}}} {summary["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """Drop every recorded metric"""
+        with self._lock:
+            self._labels.clear()
+            self._recent_calls.clear()
+
+
+def _labels(entry: Dict[str, Any]) -> str:
+    """Format the label set of a snapshot entry, escaping label values as Prometheus expects"""
+
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return f'model="{escape(entry["model"])}",feature="{escape(entry["feature"])}"'
+
+
+# registry shared by every wrapper of the process
+USAGE_METRICS = UsageMetricsRegistry()
+
+
+def get_usage_metrics() -> UsageMetricsRegistry:
+    """Return the process-wide usage metrics registry"""
+    return USAGE_METRICS
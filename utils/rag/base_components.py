@@ -102,7 +102,8 @@ class BaseComponents:
             type=self.configs['embedding_model']["type"],
             batch_size=self.configs['embedding_model']["batch_size"],
             coe=self.configs['embedding_model']["coe"],
-            select_expert=self.configs['embedding_model']["select_expert"]
+            select_expert=self.configs['embedding_model']["select_expert"],
+            cache_dir=self.configs['embedding_model'].get("cache_dir"),
             ) 
 
     def _display_image(self, image_bytes: bytes, width: int = 512) -> None:
@@ -280,8 +280,19 @@ class VectorDb():
         embedding_type="cpu",
         batch_size= None,
         coe = None,
-        select_expert = None
+        select_expert = None,
+        embedding_workers = None,
+        threads_per_worker = None
     ):
+        """Loads files, splits them in chunks, embeds the chunks and stores them in a vector db
+
+        Args:
+            embedding_workers (int, optional): number of worker processes embedding the chunks of a local
+                (cpu or cpu_fast) embedding model, each with its own copy of the model. Defaults to None,
+                chunks are embedded in the calling process.
+            threads_per_worker (int, optional): intra-op threads of each embedding worker. Defaults to None,
+                the cores are split evenly between the workers.
+        """
 
         docs = self.load_files(input_path, recursive=recursive, load_txt=load_txt, load_pdf=load_pdf, urls=urls)
 
@@ -290,14 +301,26 @@ class VectorDb():
         else:
             chunks = self.get_token_chunks(docs, chunk_size, chunk_overlap, tokenizer)
 
-        embeddings = APIGateway.load_embedding_model(
-            type=embedding_type,
-            batch_size=batch_size,
-            coe=coe,
-            select_expert=select_expert
-        )
+        if embedding_workers and embedding_type in ("cpu", "cpu_fast"):
+            from utils.model_wrappers.embedding_pool import LocalEmbeddingPool
+
+            # the workers are shut down once the chunks are embedded, queries run in this process
+            with LocalEmbeddingPool(
+                embedding_type,
+                workers=embedding_workers,
+                threads_per_worker=threads_per_worker,
+                batch_size=batch_size,
+            ) as embeddings:
+                vector_store = self.create_vector_store(chunks, embeddings, db_type, output_db)
+        else:
+            embeddings = APIGateway.load_embedding_model(
+                type=embedding_type,
+                batch_size=batch_size,
+                coe=coe,
+                select_expert=select_expert
+            )
 
-        vector_store = self.create_vector_store(chunks, embeddings, db_type, output_db)
+            vector_store = self.create_vector_store(chunks, embeddings, db_type, output_db)
 
         return vector_store
 